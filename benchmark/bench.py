@@ -0,0 +1,179 @@
+"""Simulation performance benchmarks of the testbenches.
+
+    $ python benchmark/bench.py [--sizes 1000 10000 100000] [--scl-cycles 20 50]
+                                [--testbench testbench ...] [--simulator ghdl-llvm ...]
+                                [--threshold 0.1] [--update-baseline]
+
+every workload is a fixed-seed run of n random register writes/reads through one of the
+testbenches (cocotb_sim on i2c_controller and i2c_controller_axi, pyuvm_sim on
+i2c_controller) with a given scl_cycles, on every simulator found (see
+sim_common/simulators.py: I2C_SIMULATOR=auto picks from the build time, startup time
+and cycles/s recorded here). the wall time, simulated cycles per second, cpu time and
+peak rss of the simulator process (the python testbench runs inside it) are written to
+benchmark/results.json and compared with benchmark/baseline.json: a workload that got
+slower than the baseline by more than the threshold fails the run. --update-baseline
+stores the results as the new baseline instead. baselines only make sense on the
+machine they were recorded on, none is committed.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "sim_common"))
+
+import runner  # noqa: E402
+import simulators  # noqa: E402
+
+RUNS_DIR = os.path.join(HERE, "runs")
+RESULTS = os.path.join(HERE, "results.json")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+SEED = 1
+CLOCK_NS = 10
+
+# testbench module -> cocotb test case and its environment for n transactions at scl_cycles
+WORKLOADS = {
+    "testbench": ("test_benchmark", lambda n, scl: {"I2C_BENCH_TRANSACTIONS": str(n),
+                                                    "I2C_BENCH_SCL_CYCLES": str(scl)}),
+    "testbench_axi": ("test_benchmark", lambda n, scl: {"I2C_BENCH_TRANSACTIONS": str(n),
+                                                        "I2C_BENCH_SCL_CYCLES": str(scl)}),
+    # a burst of 1 to 4 bytes per transaction, the lock-step reference model check is off,
+    # it is not part of the testbench throughput
+    "testbench_pyuvm": ("test_benchmark", lambda n, scl: {"I2C_BENCH_TRANSACTIONS": str(n),
+                                                          "I2C_BENCH_SCL_CYCLES": str(scl),
+                                                          "I2C_LOCKSTEP": "0"}),
+}
+
+
+def workload_id(module, transactions, scl_cycles, simulator):
+    return f"{module}-n{transactions}-scl{scl_cycles}-{simulator}"
+
+
+def run(module, transactions, scl_cycles, simulator):
+    """Run one workload, returns its record (passed False and no timing when it did not run)."""
+    testcase, env = WORKLOADS[module]
+    toplevel = runner.TESTBENCHES[module][1]
+    name = workload_id(module, transactions, scl_cycles, simulator.name)
+    record = {
+        "id": name,
+        "testbench": module,
+        "toplevel": toplevel,
+        "transactions": transactions,
+        "scl_cycles": scl_cycles,
+        "simulator": simulator.name,
+        "seed": SEED,
+    }
+    stats = {}
+    try:
+        build_dir = runner.build_cached(toplevel, simulator=simulator)
+        results = runner.simulate(module, build_dir, os.path.join(RUNS_DIR, name),
+                                  seed=SEED, testcase=testcase, env=env(transactions, scl_cycles),
+                                  logger=lambda msg: None, stats=stats)
+        test_wall, sim_ns = runner.case_times(results)[testcase]
+    except (runner.SimulationError, KeyError) as e:
+        return dict(record, passed=False, error=str(e) or f"no {testcase} in the results")
+    cycles = sim_ns / CLOCK_NS
+    return dict(record, **{
+        "simulator_version": simulator.version().splitlines()[0],
+        "build_s": runner.build_info(build_dir)["build_s"],
+        "passed": not runner.failures(results),
+        "wall_s": stats["wall_s"],              # whole simulator process, start-up included
+        "test_wall_s": test_wall,
+        "sim_cycles": cycles,
+        "cycles_per_s": cycles / test_wall if test_wall else 0.0,
+        "transactions_per_s": transactions / test_wall if test_wall else 0.0,
+        "cpu_s": stats["cpu_s"],
+        "max_rss_mb": stats["max_rss_mb"],
+    })
+
+
+def compare(records, baseline, threshold):
+    """Lines of the comparison with the baseline and the ids of the regressions."""
+    base = {r["id"]: r for r in baseline.get("results", [])}
+    lines, regressions = [], []
+    for record in records:
+        old = base.get(record["id"])
+        if not record.get("cycles_per_s"):
+            lines.append(f"{record['id']}: no timing (failed)")
+            continue
+        if old is None or not old.get("cycles_per_s"):
+            lines.append(f"{record['id']}: {record['cycles_per_s']:.0f} cycles/s (no baseline)")
+            continue
+        change = record["cycles_per_s"] / old["cycles_per_s"] - 1
+        lines.append(f"{record['id']}: {record['cycles_per_s']:.0f} cycles/s, baseline "
+                     f"{old['cycles_per_s']:.0f} ({100*change:+.1f} %), wall {record['wall_s']:.1f} s "
+                     f"(baseline {old['wall_s']:.1f} s), peak rss {record['max_rss_mb']:.0f} MB")
+        if change < -threshold:
+            regressions.append(record["id"])
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation performance benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="transactions per workload")
+    parser.add_argument("--scl-cycles", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--testbench", nargs="+", choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+    parser.add_argument("--simulator", nargs="+", help="simulators to run on (default: all found)")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown of cycles/s against the baseline that fails the run")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    found = simulators.available()
+    if not found:
+        print("no simulator found, nothing to benchmark")
+        return 1
+    sims = [simulators.get(name) for name in args.simulator] if args.simulator else list(found.values())
+
+    records = []
+    for simulator, module, transactions, scl_cycles in itertools.product(sims, args.testbench, args.sizes,
+                                                                         args.scl_cycles):
+        record = run(module, transactions, scl_cycles, simulator)
+        if "error" in record:
+            print(f"{record['id']}: did not run, {record['error']}")
+        else:
+            print(f"{record['id']}: {record['wall_s']:.1f} s wall, {record['cycles_per_s']:.0f} cycles/s, "
+                  f"{record['cpu_s']:.1f} s cpu, {record['max_rss_mb']:.0f} MB peak rss"
+                  + ("" if record["passed"] else ", FAILED"))
+        records.append(record)
+
+    report = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "results": records,
+    }
+    with open(RESULTS, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0 if all(r["passed"] for r in records) else 1
+
+    regressions = []
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            lines, regressions = compare(records, json.load(f), args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"slower than the baseline by more than {100*args.threshold:.0f} %: {', '.join(regressions)}")
+    else:
+        print(f"no baseline ({args.baseline}), run with --update-baseline to record one")
+    failed = [r["id"] for r in records if not r["passed"]]
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
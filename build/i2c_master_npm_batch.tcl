@@ -12,8 +12,10 @@ file mkdir $outputDir
 #
 
 read_vhdl ../rtl/i2c_registers.vhd
+read_vhdl ../rtl/i2c_fifo.vhd
 read_vhdl ../rtl/i2c_bit_controller.vhd
 read_vhdl ../rtl/i2c_byte_controller.vhd
+read_vhdl ../rtl/i2c_burst_controller.vhd
 read_vhdl ../rtl/i2c_controller.vhd
 set_property file_type {VHDL 2008} [ get_files [ glob ../rtl/*.vhd ] ]
 
@@ -1,54 +1,36 @@
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer,RisingEdge,FallingEdge,ClockCycles
-from cocotb.result import TestFailure
+from cocotb.utils import get_sim_time
+from cocotb.regression import TestFactory
+import os
 import random
-from cocotb_coverage.coverage import CoverPoint,coverage_db
-from cocotb.binary import BinaryValue
-
-covered_valued = []
-
-global recv 
-
-full = False
-def notify():
-	global full
-	full = True
-
-async def slave_read_sda(dut,recv_array):
-	global full
-	global recv
-	while (full != True):
-		await RisingEdge(dut.S_AXI_ACLK)
-		if(int(dut.i2c_byte_controller.w_cnt.value) >0 and dut.i2c_byte_controller.w_state ==4 and dut.i2c_bit_controller.w_scl.value == 1 and dut.i2c_bit_controller.w_scl_r.value == 0):
-			recv_array[int(dut.i2c_byte_controller.w_cnt.value)] = dut.io_sda.value
-		elif(int(dut.i2c_byte_controller.w_cnt.value) == 0 and dut.i2c_byte_controller.w_state ==4 and dut.i2c_bit_controller.w_scl.value == 1 and dut.i2c_bit_controller.w_scl_r.value == 0):
-			recv_array[0] = dut.io_sda.value
-			s = ""
-			for i in recv_array:
-				s = str(i)+s  				# the order of concatenation is important
-			recv = BinaryValue(value=s,binaryRepresentation=0)
-
-
-
-async def slave_write_sda(dut,recv_array):
-	global full
-	while (full != True):
-		await RisingEdge(dut.S_AXI_ACLK)
-		if(int(dut.i2c_byte_controller.w_cnt.value) >0 and dut.i2c_byte_controller.w_state ==3 and dut.i2c_bit_controller.w_scl.value == 0 and dut.i2c_bit_controller.w_scl_r.value == 0):
-			dut.f_sda.value = recv_array[int(dut.i2c_byte_controller.w_cnt.value)]
-		elif(int(dut.i2c_byte_controller.w_cnt.value) == 0 and dut.i2c_byte_controller.w_state ==3 and dut.i2c_bit_controller.w_scl.value == 0 and dut.i2c_bit_controller.w_scl_r.value == 0):
-			dut.f_sda.value = recv_array[0]
-		elif(dut.i2c_byte_controller.w_state !=3):
-			dut.f_sda.value = 1
-
-# at_least = value is superfluous, just shows how you can determine the amount of times that
-# a bin must be hit to considered covered
-@CoverPoint("top.i_data",xf = lambda x : x, bins = list(range(2**4,2**5)), at_least=1)
-def number_cover(x):
-	covered_valued.append(int(x))
+import time
+from axil_master import AxiLiteMaster
+from i2c_bus import I2cBus,I2cTarget
+from i2c_host import I2cHost
+from i2c_monitor import I2cMonitor
+from latency import LatencyProbe
+from pin_trace import record as record_trace
+from stimulus import CoverageDirectedGenerator
+import stress
+from txn_coverage import TransactionCoverage
+
+# coverage of the frames the bus model answered (address, r/w, length, data, ack, scl_cycles ...),
+# the goal is top.i_data: every byte of 16..31 written to a target at least once
+coverage = TransactionCoverage("i_data",range(2**4,2**5),at_least=1)
+
+def sample_coverage(bus,scl_cycles=20):
+	"""Count the frames on the bus since the last call in the coverage model"""
+	coverage.sample_transactions(bus.transactions,scl_cycles)
+	bus.transactions.clear()
+
+axil = None 		# axi-lite master of the running test, made by reset()
+host = None 		# I2cHost of the running test (register sequences, host latency), made by reset()
 
 async def reset(dut,cycles=1):
+	record_trace(dut)		# pin-level trace of the test with I2C_TRACE=1
+	global axil,host
 	dut.S_AXI_ARESETN.value = 0
 	dut.S_AXI_AWVALID.value = 0
 	dut.S_AXI_AWADDR.value = 0
@@ -62,236 +44,426 @@ async def reset(dut,cycles=1):
 	await ClockCycles(dut.S_AXI_ACLK,cycles)
 	dut.S_AXI_ARESETN.value = 1
 	await RisingEdge(dut.S_AXI_ACLK)
+	axil = AxiLiteMaster(dut)
+	host = I2cHost(dut,axil,dut.S_AXI_ACLK)
 	dut._log.info("the core was reset")
 
 @cocotb.test()
 async def test_tx(dut):
 	"""Check results and coverage for i2c controller transmission and reception"""
-	data_rx = [0]*8
 	idx = 0
-
-	global recv
+	target_address = 80 		#(x50)
 
 	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
-	await reset(dut,5)	
-	cocotb.start_soon(slave_read_sda(dut,data_rx))
-	cocotb.start_soon(slave_write_sda(dut,data_rx))
-
-
-	expected_value = 0
-	rx_data = 0
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(target_address)])
+	bus.start()
 
 	# 					REGISTER MAP
 
 	# 			Address 		| 		Functionality
 	#			   0 			|	system clock cycles to make scl (lower byte)
 	#			   1 			|	system clock cycles to make scl (upper byte)
-	#			   2 			|	control transfer register (ctr)
-	#			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0') 
+	#			   2 			|	control transfer register (ctr), bit 7 enable, bit 6 fifo mode
+	#			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0')
+	#			   4 			|	command register (cr)
+	#			   5 			|	bytes to read in a fifo mode burst
+	#			   6/7 			|	tx/rx fifo level (read only)
+	#			   8/9 			|	tx/rx fifo threshold
+	#			  10 			|	sequencer descriptor queue (address, pointer length, write length, read length)
+	#			  11 			|	status (RxACK, busy, al, tx empty, rx not empty, burst, tip, irq)
+	#			  12/13 		|	interrupt enable/flags (done, al, nack, tx/rx threshold), flags clear on writing '1'
 
 
 
 
 	# initialization
-	# set the enable bit of control regsiter(ctr)(02) 
+	# set the enable bit of control regsiter(ctr)(02)
 	# write the upper and lower part of the value required for the scl period to registers 0 and 1
 
 	# how to write data to slave
 	# set slave address and read/write(0) bit to transmit register (txr)(3)
-	# set the start and write fields in command register (cr)(4) , make sure the cmd is done(msg_done)
-	# set in-slave  memory/register address in txr 
+	# set the start and write fields in command register (cr)(4) , wait for the done interrupt (o_irq)
+	# set in-slave  memory/register address in txr
 	# set the write bit in command register and wait for the cmd to be done
-	# set the data to be transferred in txr 
+	# set the data to be transferred in txr
 	# set the write bit in command register and wait for the cmd to be done
-	# repeat the last two steps as longs as one wants to transmit data
-	
-	#how to read data to slave
-	# the procedure is simplified here to just issuing a read command by setting the 
-	# read bit in command register and sending it over the bus. normally both the slave address
-	# and the in-slave register/memory address have to be first exchanged as well.
+	# repeat the last two steps as longs as one wants to transmit data, set the stop bit with the last one
+
+	#how to read data from slave
+	# write the slave address and the in-slave memory/register address as above (no stop)
+	# set slave address and read/write(1) bit to txr
+	# set the start and write fields in cr (repeated start) and wait for the cmd to be done
+	# set the read bit in cr and wait for the cmd to be done, then read the received byte
+	# from the receive register (3). the last byte is read with the ack(nack) and stop bits set
+
+
+	await host.setup_core()
+
+	t_start = time.perf_counter()
+	sim_start = get_sim_time(units="ns")
+
+	# draw the data straight from the uncovered bins of top.i_data
+	gen = CoverageDirectedGenerator.from_cover_item(coverage["i_data"])
+	while not gen.done:
+		data = gen.draw()
+		pointer = random.randrange(256)
+		await host.i2c_write(target_address,pointer,[data])
+		rx_data = await host.i2c_read(target_address,pointer,1)
+
+		# check that the byte stored by the target on the bus and the byte the master
+		# read back from it both match the transmitted data
+		assert not (bus.targets[target_address].mem[pointer] != data),"Different expected to actual target data"
+		assert not (rx_data[0] != data),"Different expected to actual read data"
+		gen.sample(data)
+		idx +=1
 
+	wall = time.perf_counter() - t_start
+	clocks = (get_sim_time(units="ns") - sim_start) / 10
+	dut._log.info("%d transactions, %.2f ms wall time and %.1f bus model wake-ups per transaction (%.0f system clocks per transaction)",
+		idx, 1e3*wall/idx, bus.wakeups/idx, clocks/idx)
+	sample_coverage(bus)
+	bus.stop()
 
-	dut.S_AXI_AWVALID.value = 1
-	dut.S_AXI_AWADDR.value = 0
-	dut.S_AXI_WVALID.value = 1
-	dut.S_AXI_WDATA.value = 20          #lsbyte of scl clock cycles (e.g Fsys = 100 MHz Fi2c = 1MHz, F = 100/(5*1) = 20)
-	dut.S_AXI_BREADY.value = 1         #F is the frequency of the clock in i2c_bit_controller that generates scl
-	await RisingEdge(dut.S_AXI_ACLK)
-	await RisingEdge(dut.S_AXI_BVALID)
-	dut.S_AXI_AWVALID.value = 0
-	dut.S_AXI_WVALID.value = 0
+	coverage.report(cocotb.log.info)
+	coverage.export_xml("coverage.xml")
 
-	# dut.i_addr.value = 0
-	# dut.i_stb.value = 1
-	# dut.i_we.value = 1
-	# dut.i_data.value = 20 		
-								
+@cocotb.test()
+async def test_multi_target(dut):
+	"""Random multi-byte write/read traffic to several targets sharing the bus"""
+	addresses = [80,81,104] 		#(x50, x51, x68)
+	absent = 32 					#(x20) no device with this address on the bus
+	transactions = int(os.environ.get("I2C_TRANSACTIONS",50))
 
-	await RisingEdge(dut.S_AXI_ACLK)
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(address) for address in addresses])
+	bus.start()
+	await host.setup_core()
+
+	assert not (await host.probe(absent)),"Missing target acknowledged its address"
+	expected = {address : bytearray(256) for address in addresses}
+
+	# cycles spent in register/handshake overhead vs on the wire
+	latency = LatencyProbe(dut,10)
+	latency.start()
+
+	for _ in range(transactions):
+		address = random.choice(addresses)
+		pointer = random.randrange(256)
+		length = random.randint(1,4)
+		if(random.random() < 0.5):
+			payload = [random.randrange(256) for _ in range(length)]
+			await host.i2c_write(address,pointer,payload)
+			for i,byte in enumerate(payload):
+				expected[address][(pointer+i) % 256] = byte
+		else:
+			rx_data = await host.i2c_read(address,pointer,length)
+			exp_data = [expected[address][(pointer+i) % 256] for i in range(length)]
+			assert not (rx_data != exp_data),"Different expected to actual read data"
+
+	for address in addresses:
+		assert not (bus.targets[address].mem != expected[address]),"Different expected to actual target memory"
+	sample_coverage(bus)
+	bus.stop()
+
+	latency.stop()
+	summary = latency.summary()
+	for name,stats in summary.items():
+		if stats["count"]:
+			dut._log.info("%s: %d samples, p50 %.0f, p90 %.0f, p99 %.0f, max %.0f cycles",
+				name, stats["count"], stats["p50"], stats["p90"], stats["p99"], stats["max"])
+	overhead = sum(latency.samples["done_to_cmd"])
+	dut._log.info("%.1f %% of the command time is host/handshake overhead",
+		100*overhead/(overhead + sum(latency.samples["cmd_to_done"])))
+	latency.dump_json("latency_axi.json")
+	latency.dump_csv("latency_axi.csv")
+
+# minimum data setup time, scl low and high time (ns) of the i2c specification
+I2C_TIMING = {100000 : (250,4700,4000), 400000 : (100,1300,600), 1000000 : (50,500,260)}
 
-	dut.S_AXI_AWVALID.value = 1
-	dut.S_AXI_AWADDR.value = 1
-	dut.S_AXI_WVALID.value = 1 
-	dut.S_AXI_WDATA.value = 0            #msbyte of scl clock cycles
-	dut.S_AXI_BREADY.value = 1
-	await RisingEdge(dut.S_AXI_ACLK)
-	await RisingEdge(dut.S_AXI_BVALID)
-	dut.S_AXI_AWVALID.value = 0
-	dut.S_AXI_WVALID.value = 0
-			
+@cocotb.test()
+async def test_bus_throughput(dut):
+	"""Measure scl frequency, duty cycle, setup/hold margins and throughput on the bus at 1 MHz, 400 kHz and 100 kHz"""
+	target_address = 80 		#(x50)
+	f_clk = 100000000 			#(10 ns clock period)
 
-	await RisingEdge(dut.S_AXI_ACLK)
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(target_address)])
+	bus.start()
+	monitor = I2cMonitor(dut)
+	monitor.start()
+
+	for f_scl,(t_su,t_low,t_high) in I2C_TIMING.items():
+		scl_cycles = f_clk // (5*f_scl)
+		await host.write_reg(2,0) 			#disable the core to restart the scl divider
+		await host.setup_core(scl_cycles)
+		monitor.reset()
+
+		pointer = random.randrange(256)
+		payload = [random.randrange(256) for _ in range(4)]
+		await host.i2c_write(target_address,pointer,payload)
+		rx_data = await host.i2c_read(target_address,pointer,len(payload))
+		assert not (rx_data != payload),"Different expected to actual read data"
+
+		# the transfers rebuilt from the pins: write, then pointer write and repeated START read
+		t = monitor.transactions
+		assert not ([(x.address,x.read) for x in t] != [(target_address,False),(target_address,False),(target_address,True)]),"Unexpected transactions on the bus"
+		assert not (t[0].data != [pointer] + payload or not all(t[0].acks) or not t[0].stop),"Unexpected write transaction on the bus"
+		assert not (t[1].data != [pointer] or t[1].stop or not t[2].repeated),"Unexpected repeated START on the bus"
+		assert not (t[2].data != payload or t[2].acks != [True]*(len(payload)-1) + [False] or not t[2].stop),"Unexpected read transaction on the bus"
+
+		stats = monitor.stats()
+		dut._log.info("scl_cycles %d: scl %.1f kHz (expected %.1f kHz), duty %.2f, min setup %d ns, min hold %d ns, %.0f bytes/s (%.0f data bytes/s)",
+			scl_cycles, stats["scl_hz"]/1e3, f_scl/1e3, stats["duty"], stats["setup_min_ns_master"],
+			stats["hold_min_ns_master"], stats["bytes_per_s"], stats["data_bytes_per_s"])
+		assert not (abs(stats["scl_hz"] - f_scl) > 0.01*f_scl),"Scl frequency differs from the programmed one"
+		assert not (stats["setup_min_ns_master"] < t_su),"Data setup time violation"
+		assert not (stats["low_min_ns"] < t_low or stats["high_min_ns"] < t_high),"Scl low/high time violation"
+		sample_coverage(bus,scl_cycles)
+
+	monitor.stop()
+	bus.stop()
 
-	dut.S_AXI_AWVALID.value = 1
-	dut.S_AXI_AWADDR.value = 2        #enable the core (wen for bit_controller)
-	dut.S_AXI_WVALID.value = 1
-	dut.S_AXI_WDATA.value = 128      #(x80)
-	dut.S_AXI_BREADY.value = 1
-	await RisingEdge(dut.S_AXI_ACLK)
-	await RisingEdge(dut.S_AXI_BVALID)
-	dut.S_AXI_AWVALID.value = 0
-	dut.S_AXI_WVALID.value = 0
+@cocotb.test()
+async def test_axil_throughput(dut):
+	"""Check that axil_regs sustains one write and one read per clock with back to back (pipelined) transactions"""
+	transactions = 64
+	latency = 2 			# clocks from the first beat presented to the last response, on top of one per transaction
 
-	await RisingEdge(dut.S_AXI_ACLK)
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+
+	# scl divider and txr only, the core stays disabled
+	writes = [(random.choice([0,1,3]),random.randrange(256)) for _ in range(transactions)]
+	sim_start = get_sim_time(units="ns")
+	await axil.burst_write(writes)
+	write_clocks = (get_sim_time(units="ns") - sim_start) / 10
+
+	last = {addr : data for addr,data in writes}
+	expected_cycles = (last.get(1,0) << 8) | last.get(0,0)
+	assert not (axil.writes != transactions),"Missing write responses"
+	assert not (int(dut.w_clk_cycles.value) != expected_cycles),"Different expected to actual scl clock cycles"
+	assert not (int(dut.w_txr.value) != last.get(3,0)),"Different expected to actual txr"
+
+	# the receive register does not change while the core is idle
+	rd_data = int(dut.w_rd_data.value)
+	sim_start = get_sim_time(units="ns")
+	rx_data = await axil.burst_read([3]*transactions)
+	read_clocks = (get_sim_time(units="ns") - sim_start) / 10
+	assert not (axil.reads != transactions),"Missing read responses"
+	assert not (any((x & 255) != rd_data for x in rx_data)),"Different expected to actual read data"
+
+	# writes and reads at the same time
+	sim_start = get_sim_time(units="ns")
+	write_burst = cocotb.start_soon(axil.burst_write([(3,x) for x in range(transactions)]))
+	rx_data = await axil.burst_read([3]*transactions)
+	await write_burst
+	both_clocks = (get_sim_time(units="ns") - sim_start) / 10
+	assert not (int(dut.w_txr.value) != transactions-1),"Different expected to actual txr"
+	assert not (any((x & 255) != rd_data for x in rx_data)),"Different expected to actual read data"
+
+	dut._log.info("%d writes in %d clocks (%.2f writes/clock), %d reads in %d clocks (%.2f reads/clock), %d writes and reads in %d clocks",
+		transactions, write_clocks, transactions/write_clocks, transactions, read_clocks, transactions/read_clocks,
+		transactions, both_clocks)
+	assert not (write_clocks > transactions + latency),"Less than one write per clock"
+	assert not (read_clocks > transactions + latency),"Less than one read per clock"
+	assert not (both_clocks > transactions + latency),"Less than one write and one read per clock"
 
-	while(full != True):
-
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 3         #write txr
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = 0           #7 bit address, '1' (read from slave) / '0' (write to slave)
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-			
-
-		await RisingEdge(dut.S_AXI_ACLK)
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 4
-		dut.S_AXI_WVALID.value = 1 
-		dut.S_AXI_WDATA.value = 144             #START condition, WRITE condition
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-
-
-		if(idx >0):
-			#check that the rx part of the master works correctly 
-			await RisingEdge(dut.i2c_byte_controller.o_msg_done) 
-			
-			dut.S_AXI_ARVALID.value = 1
-			dut.S_AXI_ARADDR.value = 3
-			dut.S_AXI_RREADY.value = 1
-
-			await FallingEdge(dut.S_AXI_RVALID)
-			dut.S_AXI_ARVALID.value = 0
-
-			await RisingEdge(dut.S_AXI_ACLK)
-			assert not (data != dut.o_data.value),"Different expected to actual read data"
-
-		await RisingEdge(dut.w_tip)
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 3
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = 0           # set in-slave register/memory address
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-			
-
-		await RisingEdge(dut.S_AXI_ACLK)
-
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 4
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = 16         #WRITE condition
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-	
-		await RisingEdge(dut.S_AXI_ACLK)
-
-
-		#wait for write of address an r/w bit to be done
-		await RisingEdge(dut.i2c_byte_controller.o_msg_done) 
-
-		await RisingEdge(dut.w_tip)
-	
-			
-		data = random.randint(2**4,2**5)
-		while(data in covered_valued):
-			data = random.randint(2**4,2**5)
-		
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 3
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = data     #set data to be written to previosuly provided address
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-	
-
-		await RisingEdge(dut.S_AXI_ACLK)
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 4
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = 86     #WRITE condition, STOP condition
-		# # dut.i_data.value = 16  #(x10) 		#WRITE condition
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-		
-		await RisingEdge(dut.S_AXI_ACLK)
-
-		#wait for write of in-slave register/memory address to be done
-		await RisingEdge(dut.i2c_byte_controller.o_msg_done)
-
-
-
-		await RisingEdge(dut.w_tip)
-
-
-		dut.S_AXI_AWVALID.value = 1
-		dut.S_AXI_AWADDR.value = 4
-		dut.S_AXI_WVALID.value = 1
-		dut.S_AXI_WDATA.value = 224   #(xe0)	#START, READ, STOP conditions
-		dut.S_AXI_BREADY.value = 1
-		await RisingEdge(dut.S_AXI_ACLK)
-		await RisingEdge(dut.S_AXI_BVALID)
-		dut.S_AXI_AWVALID.value = 0
-		dut.S_AXI_WVALID.value = 0
-
-		await RisingEdge(dut.S_AXI_ACLK)
-		
-		await RisingEdge(dut.i2c_byte_controller.o_msg_done)
-
-
-		# check that the data received by a trivial i2c receiver logic matches
-		# the transmitted data
-		assert not (recv.integer != data),"Different expected to actual read data"
-		coverage_db["top.i_data"].add_threshold_callback(notify, 100)
-		number_cover(data)
-		idx +=1
+@cocotb.test()
+async def test_fifo_throughput(dut):
+	"""Measure bytes/s of the same write and read transfers with one command per byte and with the tx/rx fifos"""
+	target_address = 80 		#(x50)
+	length = 14 				# address, pointer and payload fill the tx fifo (FIFO_DEPTH = 16)
 
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(target_address)])
+	bus.start()
+	await host.setup_core()
+
+	for latency in (0,int(os.environ.get("I2C_HOST_LATENCY",200))):
+		host.latency = latency
+		bytes_per_s = {}
+		for fifo in (False,True):
+			await host.write_reg(2,192 if fifo else 128) 	#(xc0) enable, fifo mode / (x80) enable
+			pointer = random.randrange(256)
+			payload = [random.randrange(256) for _ in range(length)]
+
+			sim_start = get_sim_time(units="ns")
+			if fifo:
+				await host.fifo_write(target_address,pointer,payload)
+				rx_data = await host.fifo_read(target_address,pointer,length)
+			else:
+				await host.i2c_write(target_address,pointer,payload)
+				rx_data = await host.i2c_read(target_address,pointer,length)
+			elapsed = (get_sim_time(units="ns") - sim_start)*1e-9
+
+			mem = bus.targets[target_address].mem
+			assert not ([mem[(pointer+i) % 256] for i in range(length)] != payload),"Different expected to actual target data"
+			assert not (rx_data != payload),"Different expected to actual read data"
+			bytes_per_s[fifo] = 2*length/elapsed
+
+		dut._log.info("host latency %d clocks: %.0f bytes/s with one command per byte, %.0f bytes/s with the fifos (x%.2f)",
+			latency, bytes_per_s[False], bytes_per_s[True], bytes_per_s[True]/bytes_per_s[False])
+		# without any host latency both are bound by the bus
+		if latency:
+			assert not (bytes_per_s[True] <= bytes_per_s[False]),"No throughput gain with the fifos"
+
+	host.latency = 0
+	await host.write_reg(2,128)
+	sample_coverage(bus)
+	bus.stop()
 
-	coverage_db.report_coverage(cocotb.log.info,bins=True)
-	coverage_db.export_to_xml(filename="coverage.xml")
+@cocotb.test()
+async def test_sequencer(dut):
+	"""Write-then-read register transactions run by the command sequencer, against one command per byte"""
+	addresses = [80,81] 		#(x50, x51)
+	absent = 32 				#(x20)
+	length = 8
 
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(address) for address in addresses])
+	bus.start()
+	monitor = I2cMonitor(dut)
+	monitor.start()
+	await host.setup_core()
+	await host.write_reg(2,192) 		#(xc0) enable, fifo mode
+
+	# a descriptor without bytes only addresses the target
+	await host.seq_transfer(absent,[],[],0)
+	assert not ((await host.read_reg(11)) & 128 == 0),"Missing target acknowledged its address"
+
+	# descriptors queue up: write to one target and read the other one back to back
+	monitor.reset()
+	pointer = random.randrange(256)
+	payload = [random.randrange(256) for _ in range(length)]
+	await axil.burst_write([(3,byte) for byte in [pointer] + payload + [pointer]] +
+		[(10,byte) for byte in (addresses[0],1,length,0) + (addresses[1],1,0,length)])
+	await host.wait_irq()
+	await host.wait_irq()
+	assert not (await host.read_reg(10) != 0),"Descriptors left in the queue"
+	rx_data = [x & 255 for x in await axil.burst_read([3]*length)]
+	mem = bus.targets[addresses[0]].mem
+	assert not ([mem[(pointer+i) % 256] for i in range(length)] != payload),"Different expected to actual target data"
+	mem = bus.targets[addresses[1]].mem
+	assert not (rx_data != [mem[(pointer+i) % 256] for i in range(length)]),"Different expected to actual read data"
+
+	# write, then pointer write and repeated START read, one STOP each
+	t = monitor.transactions
+	assert not ([(x.address,x.read) for x in t] != [(addresses[0],False),(addresses[1],False),(addresses[1],True)]),"Unexpected transactions on the bus"
+	assert not (t[0].data != [pointer] + payload or not t[0].stop),"Unexpected write transaction on the bus"
+	assert not (t[1].data != [pointer] or t[1].stop or not t[2].repeated),"Unexpected repeated START on the bus"
+	assert not (t[2].acks != [True]*(length-1) + [False] or not t[2].stop),"Unexpected read transaction on the bus"
+
+	# the same register write and read with one command per byte and with the sequencer
+	for latency in (0,int(os.environ.get("I2C_HOST_LATENCY",200))):
+		host.latency = latency
+		elapsed = {}
+		for seq in (False,True):
+			await host.write_reg(2,192 if seq else 128)
+			pointer = random.randrange(256)
+			payload = [random.randrange(256) for _ in range(length)]
+
+			sim_start = get_sim_time(units="ns")
+			if seq:
+				await host.seq_transfer(addresses[0],[pointer],payload,0)
+				rx_data = await host.seq_transfer(addresses[0],[pointer],[],length)
+			else:
+				await host.i2c_write(addresses[0],pointer,payload)
+				rx_data = await host.i2c_read(addresses[0],pointer,length)
+			elapsed[seq] = get_sim_time(units="ns") - sim_start
+			assert not (rx_data != payload),"Different expected to actual read data"
+
+		dut._log.info("host latency %d clocks: %.0f ns with one command per byte, %.0f ns with the sequencer (x%.2f)",
+			latency, elapsed[False], elapsed[True], elapsed[False]/elapsed[True])
+		if latency:
+			assert not (elapsed[True] >= elapsed[False]),"No latency gain with the sequencer"
+
+	host.latency = 0
+	await host.write_reg(2,128)
+	sample_coverage(bus)
+	monitor.stop()
+	bus.stop()
 
+@cocotb.test()
+async def test_clock_stretching(dut):
+	"""Data and throughput loss with a target that stretches scl after every byte (see sim_common/stress.py)"""
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	await stress.clock_stretching(dut,host,sample_coverage)
+
+@cocotb.test()
+async def test_arbitration(dut):
+	"""Arbitration with a second master on the bus and the recovery times of the loser (see sim_common/stress.py)"""
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	await stress.arbitration(dut,host,sample_coverage)
+
+@cocotb.test(skip = "I2C_BENCH_TRANSACTIONS" not in os.environ)
+async def test_benchmark(dut):
+	"""Fixed workload of the benchmark suite (benchmark/bench.py): I2C_BENCH_TRANSACTIONS random
+	register writes/reads of 1 to 4 bytes to a single target with I2C_BENCH_SCL_CYCLES"""
+	target_address = 80 		#(x50)
+	transactions = int(os.environ["I2C_BENCH_TRANSACTIONS"])
+	scl_cycles = int(os.environ.get("I2C_BENCH_SCL_CYCLES",20))
+
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(target_address)])
+	bus.start()
+	await host.setup_core(scl_cycles)
+	expected = bytearray(256)
+
+	for _ in range(transactions):
+		pointer = random.randrange(256)
+		length = random.randint(1,4)
+		if(random.random() < 0.5):
+			payload = [random.randrange(256) for _ in range(length)]
+			await host.i2c_write(target_address,pointer,payload)
+			for i,byte in enumerate(payload):
+				expected[(pointer+i) % 256] = byte
+		else:
+			rx_data = await host.i2c_read(target_address,pointer,length)
+			assert not (rx_data != [expected[(pointer+i) % 256] for i in range(length)]),"Different expected to actual read data"
+
+	sample_coverage(bus,scl_cycles)
+	bus.stop()
+
+async def run_scenario(dut,scl_cycles=20,length=4,read_ratio=0.5):
+	"""Random register writes/reads of length bytes to a target, one scenario of the session: the core
+	is reset and reprogrammed and the bus model is new for every scenario, the coverage accumulates"""
+	target_address = 80 		#(x50)
+	transactions = int(os.environ.get("I2C_SCENARIO_TRANSACTIONS",8))
+
+	cocotb.start_soon(Clock(dut.S_AXI_ACLK, 10, units="ns").start())
+	await reset(dut,5)
+	bus = I2cBus(dut,[I2cTarget(target_address)])
+	bus.start()
+	await host.setup_core(scl_cycles)
+	expected = bytearray(256)
+
+	for _ in range(transactions):
+		pointer = random.randrange(256)
+		if(random.random() < read_ratio):
+			rx_data = await host.i2c_read(target_address,pointer,length)
+			assert not (rx_data != [expected[(pointer+i) % 256] for i in range(length)]),"Different expected to actual read data"
+		else:
+			payload = [random.randrange(2**4,2**5) for _ in range(length)]
+			await host.i2c_write(target_address,pointer,payload)
+			for i,byte in enumerate(payload):
+				expected[(pointer+i) % 256] = byte
+
+	assert not (bus.targets[target_address].mem != expected),"Different expected to actual target memory"
+	sample_coverage(bus,scl_cycles)
+	bus.stop()
+	coverage.export_xml("coverage.xml")
+
+# every combination is a test of its own, all of them in one simulation
+scenarios = TestFactory(run_scenario)
+scenarios.add_option("scl_cycles",[20,50])
+scenarios.add_option("length",[1,4,16])
+scenarios.add_option("read_ratio",[0.0,0.5,1.0])
+scenarios.generate_tests()
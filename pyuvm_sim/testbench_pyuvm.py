@@ -1,66 +1,108 @@
 from cocotb.triggers import FallingEdge,RisingEdge
-from cocotb_coverage import crv
 from cocotb.clock import Clock
+from cocotb.utils import get_sim_time
 from pyuvm import *
+import os
 import random
 import cocotb
 import pyuvm
 from utils import I2cBfm
-from cocotb_coverage.coverage import CoverPoint,coverage_db
 from cocotb.binary import BinaryValue
+from cocotb.regression import TestFactory
+from stimulus import CoverageDirectedGenerator, StimulusPlan
+from i2c_model import Lockstep
+from i2c_monitor import I2cMonitor
+from scoreboard import StreamingComparator
+from txn_coverage import TransactionCoverage
+from pin_trace import record as record_trace
+from profiler import profiled
 
 # g_sys_clk = int(cocotb.top.g_sys_clk)
 # period_ns = 10**9 / g_sys_clk
 # g_data_width = int(cocotb.top.g_data_width)
-covered_values = []
-
-
-full = False
-def notify():
-    global full
-    full = True
-
-# global recv 
 
 # at_least = value is superfluous, just shows how you can determine the amount of times that
 # a bin must be hit to considered covered
 # even if g_data_with is >8, do not exercize full range as it is extremelly comp. heavy
-@CoverPoint("top.i_tx_data",xf = lambda x : x, bins = list(range(2**4,2**5)), at_least=1)
-def number_cover(x):
-    pass
+# the bursts are sampled over the whole transaction space (address, r/w, length, data,
+# ack, scl_cycles ...), only top.i_tx_data is a goal
+coverage = TransactionCoverage("i_tx_data", range(2**4,2**5), at_least=1)
+
+
+MAX_BURST = int(os.environ.get("I2C_BURST_LEN",32))    # longest payload of a burst
+BURSTS = int(os.environ.get("I2C_BURSTS",8))            # bursts of the test (at least)
+SCL_CYCLES = tuple(int(x) for x in os.environ.get("I2C_SCL_CYCLES","20,20").split(","))   # prescaler range
+
+
+class Scenario:
+    """Parameters and state of one test of the session, a new one for every test so that
+    any number of them can run in one simulation (set in the ConfigDB as SCENARIO)"""
 
+    def __init__(self, scl_cycles=SCL_CYCLES, burst_len=MAX_BURST, read_ratio=0.25, bursts=BURSTS, seed=None):
+        self.scl_cycles = scl_cycles
+        self.burst_len = burst_len
+        self.read_ratio = read_ratio
+        self.bursts = bursts
+        self.seed = cocotb.RANDOM_SEED if seed is None else seed
+        self.covered_values = set()     # payload bytes sent
+        self.full = False               # top.i_tx_data fully covered
 
-class crv_inputs(crv.Randomized):
-    def __init__(self,tx_data):
-        crv.Randomized.__init__(self)
-        self.tx_data = tx_data
-        self.add_rand("tx_data",list(range(2**4,2**5)))
+    def notify(self):
+        self.full = True
+
+    def __str__(self):
+        return (f"scl_cycles {self.scl_cycles}, bursts of up to {self.burst_len} bytes, "
+                f"{100*self.read_ratio:.0f} % reads")
 
 # Sequence classes
-class SeqItem(uvm_sequence_item):
+class BurstItem(uvm_sequence_item):
+    """One START...STOP frame to a target: the payload of a write or the length of a read.
+    rx_data holds the bytes the driver read back (the payload looped back through sda,
+    all ones for a read as nobody drives sda)"""
 
-    def __init__(self, name,i_tx_data):
+    def __init__(self, name, address=0, read=False, payload=None, length=0, scl_cycles=20):
         super().__init__(name)
-        self.i_crv = crv_inputs(i_tx_data)
+        self.address = address
+        self.read = read
+        self.payload = payload or []
+        self.length = len(self.payload) if payload else length
+        self.scl_cycles = scl_cycles
+        self.rx_data = []
 
-    def randomize_operands(self):
-        self.i_crv.randomize()
+    def expected(self):
+        return [255]*self.length if self.read else list(self.payload)
 
-    def randomize(self):
-        self.randomize_operands()
+    def randomize(self, transfer):
+        # the operands come pre-drawn from a StimulusPlan
+        self.address, self.read, self.length, self.payload, self.scl_cycles = transfer
+
+    def __str__(self):
+        return f"{'read' if self.read else 'write'} 0x{self.address:02x} {self.length} bytes"
 
 
 class RandomSeq(uvm_sequence):
 
     async def body(self):
-        while(len(covered_values) != 2**4):
-            data_tr = SeqItem("data_tr", None)
-            await self.start_item(data_tr)
-            data_tr.randomize_operands()
-            while(data_tr.i_crv.tx_data in covered_values):
-                data_tr.randomize_operands()
-            covered_values.append(data_tr.i_crv.tx_data)
-            await self.finish_item(data_tr)
+        # the first payload bytes are drawn straight from the bins of top.i_tx_data that are
+        # still uncovered (a bin is retired when it is scheduled, the coverage itself is
+        # sampled on the results)
+        scenario = ConfigDB().get(None, "", "SCENARIO")
+        gen = CoverageDirectedGenerator.from_cover_item(coverage["i_tx_data"])
+        plan = iter(StimulusPlan(seed=scenario.seed, read_ratio=scenario.read_ratio, length=(1,scenario.burst_len),
+                                 data=(2**4,2**5-1), scl_cycles=scenario.scl_cycles))
+        bursts = 0
+        # (a scenario of reads only never covers anything)
+        while (not gen.done and scenario.read_ratio < 1) or bursts < scenario.bursts:
+            burst = BurstItem("burst")
+            await self.start_item(burst)
+            burst.randomize(next(plan))
+            if not burst.read:
+                for i in range(min(len(gen),burst.length)):
+                    burst.payload[i] = gen.draw()
+                    gen.sample(burst.payload[i])
+                scenario.covered_values.update(burst.payload)
+            await self.finish_item(burst)
+            bursts += 1
 
 
 class TestAllSeq(uvm_sequence):
@@ -72,66 +114,104 @@ class TestAllSeq(uvm_sequence):
 
 class Driver(uvm_driver):
     def build_phase(self):
-        self.ap = uvm_analysis_port("ap", self)
+        self.req_ap = uvm_analysis_port("req_ap", self)     # items as they are driven
+        self.ap = uvm_analysis_port("ap", self)             # items with the data read back
 
     def start_of_simulation_phase(self):
         self.bfm = I2cBfm()
+        self.frames = 0
+        self.payload_bytes = 0
+        self.busy_ns = 0
 
     async def launch_tb(self):
+        record_trace(self.bfm.dut)     # pin-level trace of the test with I2C_TRACE=1
         await self.bfm.reset()
         self.bfm.start_bfm()
 
-    async def run_phase(self):
-        await self.launch_tb()
-        await self.bfm.send_data((1,1,0,20))
-
-        await self.bfm.send_data((1,1,1,0))            
-
-        await self.bfm.send_data((1,1,2,128))
+    async def wait_irq(self):
+        # sleep on the interrupt of the core instead of watching its internals
+        if not self.bfm.dut.o_irq.value:
+            await RisingEdge(self.bfm.dut.o_irq)
 
-        while True:
-
-            await self.bfm.send_data((1,1,3,0))
-
-
-            await self.bfm.send_data((1,1,4,144))
-            await RisingEdge(self.bfm.dut.w_tip)
-
-            await self.bfm.send_data((1,1,3,0))
-
-
-            await self.bfm.send_data((1,1,4,16))
+    async def clear_irq(self):
+        await self.bfm.send_batch([(1,1,13,31),(0,0,0,0)])     # write '1' to all the interrupt flags
 
-            await RisingEdge(self.bfm.dut.i2c_byte_controller.o_msg_done)
-            await RisingEdge(self.bfm.dut.w_tip)
+    async def command(self, cr, txr=None):
+        # one message: (data and) command, then sleep until it is done
+        ops = [] if txr is None else [(1,1,3,txr)]
+        await self.bfm.send_batch(ops + [(1,1,4,cr),(0,0,0,0)])
+        await self.wait_irq()
+        await self.clear_irq()
 
+    async def read_rx(self):
+        # a read strobe of one clock, o_data holds the register the clock after
+        await self.bfm.send_batch([(0,1,3,0),(0,0,0,0)])
+        await RisingEdge(self.bfm.dut.i_clk)
+        return int(self.bfm.dut.o_data.value)
 
-            data = await self.seq_item_port.get_next_item()
-            await self.bfm.send_data((1,1,3,data.i_crv.tx_data))
-
-
-
-            await self.bfm.send_data((1,1,4,86))
+    @profiled
+    async def run_phase(self):
+        await self.launch_tb()
+        # prescaler, enable, interrupt on transfer done and arbitration lost
+        await self.bfm.send_batch([(1,1,0,20),(1,1,1,0),(1,1,2,128),(1,1,12,3),(0,0,0,0)])
+        scl_cycles = 20
 
-            await FallingEdge(self.bfm.dut.i2c_byte_controller.o_msg_done)
-            await self.bfm.send_data((0,1,3,0))
+        while True:
+            burst = await self.seq_item_port.get_next_item()
+            self.req_ap.write(burst)
+            if burst.scl_cycles != scl_cycles:
+                # the bus is idle between frames, the prescaler can change
+                scl_cycles = burst.scl_cycles
+                await self.bfm.send_batch([(1,1,0,scl_cycles & 255),(1,1,1,scl_cycles >> 8),(0,0,0,0)])
+
+            # the whole burst is a single frame: START, address, payload, STOP
+            sim_start = get_sim_time(units="ns")
+            await self.command(144, (burst.address << 1) | burst.read)     #(x90) START, WRITE
+            burst.rx_data = []
+            for i in range(burst.length):
+                last = (i == burst.length-1)
+                if burst.read:
+                    await self.command(104 if last else 32)                     #(x68) READ, NACK, STOP / (x20) READ, ACK
+                else:
+                    await self.command(80 if last else 16, burst.payload[i])    #(x50) WRITE, STOP / (x10) WRITE
+                burst.rx_data.append(await self.read_rx())
+            self.busy_ns += get_sim_time(units="ns") - sim_start
+            self.frames += 1
+            self.payload_bytes += burst.length
 
-            result = await self.bfm.get_result()
-            self.ap.write(result)
-            data.result = result
+            self.ap.write(burst)
             self.seq_item_port.item_done()
 
+    def report_phase(self):
+        # sustained throughput of the frames, host (interrupt, register) overhead included
+        if self.busy_ns:
+            self.logger.info(f"{self.frames} frames, {self.payload_bytes} payload bytes in {self.busy_ns/1e3:.1f} us: "
+                             f"{self.payload_bytes/(self.busy_ns*1e-9):.0f} payload bytes/s, "
+                             f"{self.payload_bytes/self.frames:.1f} bytes/frame")
+        sim_us = get_sim_time(units="ns")/1e3
+        if sim_us:
+            self.logger.info(f"bfm woken up {self.bfm.wakeups} times in {sim_us:.1f} us: "
+                             f"{self.bfm.wakeups/sim_us:.2f} callbacks/us"
+                             + (", plus one per clock of the lock-step check (I2C_LOCKSTEP=0 turns it off)"
+                                if lockstep(self) else ""))
+
 
 class Coverage(uvm_subscriber):
 
     def end_of_elaboration_phase(self):
         self.cvg = set()
-
-    def write(self, data):
-        number_cover(data)
-        coverage_db["top.i_tx_data"].add_threshold_callback(notify, 100)
-        if(int(data) not in self.cvg):
-            self.cvg.add(int(data))
+        self.scenario = ConfigDB().get(self, "", "SCENARIO")
+
+    def write(self, burst):
+        # the payload as it came back from the bus (nobody acknowledges on the loopback)
+        data = [int(x) for x in burst.rx_data]
+        coverage.sample(burst.address, burst.read, data, ack=False, scl_cycles=burst.scl_cycles)
+        if burst.read:
+            return
+        new = set(data) - self.cvg
+        self.cvg |= new
+        if new and not self.scenario.full and coverage["i_tx_data"].cover_percentage >= 100:
+            self.scenario.notify()
 
     def report_phase(self):
         try:
@@ -140,28 +220,51 @@ class Coverage(uvm_subscriber):
         except UVMConfigItemNotFound:
             disable_errors = False
         if not disable_errors:
-            if len(set(covered_values) - self.cvg) > 0:
+            if len(self.scenario.covered_values - self.cvg) > 0:
                 self.logger.error(
-                    f"Functional coverage error. Missed: {set(covered_values)-self.cvg}")   
+                    f"Functional coverage error. Missed: {self.scenario.covered_values-self.cvg}")
                 assert False
             else:
                 self.logger.info("Covered all input space")
                 assert True
 
 
+def stop_on_fail(component):
+    # end the test at the first mismatch instead of at check_phase
+    try:
+        return ConfigDB().get(component, "", "STOP_ON_FAIL")
+    except UVMConfigItemNotFound:
+        return bool(int(os.environ.get("I2C_STOP_ON_FAIL",0)))
+
+
+def lockstep(component):
+    # check the rtl against the reference model every clock (on by default, off for throughput
+    # runs: it wakes up on every clock edge and reads ~20 signals per cycle)
+    try:
+        return ConfigDB().get(component, "", "LOCKSTEP")
+    except UVMConfigItemNotFound:
+        return bool(int(os.environ.get("I2C_LOCKSTEP",1)))
+
+
 class Scoreboard(uvm_component):
+    """Compare every burst with the data read back as soon as it is done, only the bursts
+    in flight are kept"""
 
     def build_phase(self):
-        self.data_fifo = uvm_tlm_analysis_fifo("data_fifo", self)
-        self.result_fifo = uvm_tlm_analysis_fifo("result_fifo", self)
-        self.data_get_port = uvm_get_port("data_get_port", self)
-        self.result_get_port = uvm_get_port("result_get_port", self)
-        self.data_export = self.data_fifo.analysis_export
-        self.result_export = self.result_fifo.analysis_export
+        self.comparator = StreamingComparator("bursts", stop_on_fail=stop_on_fail(self), window=16, log=self.logger)
+        # the bursts as they are driven (expected) and with the data read back (actual)
+        self.data_export = uvm_subscriber.uvm_AnalysisImp("data_export", self,
+            lambda burst: self.comparator.add_expected((str(burst), burst.expected())))
+        self.result_export = uvm_subscriber.uvm_AnalysisImp("result_export", self,
+            lambda burst: self.comparator.add_actual((str(burst), list(burst.rx_data))))
 
-    def connect_phase(self):
-        self.data_get_port.connect(self.data_fifo.get_export)
-        self.result_get_port.connect(self.result_fifo.get_export)
+    def start_of_simulation_phase(self):
+        # cycle-accurate reference model of the byte/bit controllers, checked every clock
+        self.golden = Lockstep(cocotb.top, log=self.logger) if lockstep(self) else None
+
+    async def run_phase(self):
+        if self.golden:
+            self.golden.start()
 
     def check_phase(self):
         passed = True
@@ -169,37 +272,27 @@ class Scoreboard(uvm_component):
             self.errors = ConfigDB().get(self, "", "CREATE_ERRORS")
         except UVMConfigItemNotFound:
             self.errors = False
-        while self.result_get_port.can_get():
-            _, actual_result = self.result_get_port.try_get()
-            data_success, data = self.data_get_port.try_get()
-            if not data_success:
-                self.logger.critical(f"result {actual_result} had no command")
-            else:
-                if int(data) == int(actual_result):
-                    self.logger.info("PASSED")
-                    print("i_tx_data is {}, rx_data is {}".format(int(data),int(actual_result)))
-                else:
-                    self.logger.error("FAILED")
-                    print("i_tx_data is {}, rx_data is {}".format(int(data),int(actual_result)))
-                    passed = False
+        if any(self.comparator.pending):
+            self.logger.error(f"bursts left without a result (expected, actual): {self.comparator.pending}")
+            passed = False
+        if self.comparator.mismatches:
+            self.logger.error(f"{self.comparator.mismatches} of {self.comparator.compared} bursts differ, "
+                              f"first: {self.comparator.first_mismatch}")
+            passed = False
+        if self.golden is None:
+            pass
+        elif self.golden.mismatches:
+            self.logger.error(f"{len(self.golden.mismatches)} mismatches against the reference model "
+                              f"in {self.golden.cycles} cycles, first: {self.golden.mismatches[0]}")
+            passed = False
+        else:
+            self.logger.info(f"rtl matched the reference model for {self.golden.cycles} cycles")
         assert passed
 
-
-class Monitor(uvm_component):
-    def __init__(self, name, parent, method_name):
-        super().__init__(name, parent)
-        self.method_name = method_name
-
-    def build_phase(self):
-        self.ap = uvm_analysis_port("ap", self)
-        self.bfm = I2cBfm()
-        self.get_method = getattr(self.bfm, self.method_name)
-
-    async def run_phase(self):
-        while True:
-            datum = await self.get_method()
-            self.logger.debug(f"MONITORED {datum}")
-            self.ap.write(datum)
+    def report_phase(self):
+        summary = self.comparator.summary()
+        self.logger.info(f"{summary['matches']} of {summary['compared']} bursts matched, at most "
+                         f"{summary['max_in_flight']} in flight, {summary.get('per_wall_s',0):.1f} bursts/s")
 
 
 class Env(uvm_env):
@@ -208,26 +301,25 @@ class Env(uvm_env):
         self.seqr = uvm_sequencer("seqr", self)
         ConfigDB().set(None, "*", "SEQR", self.seqr)
         self.driver = Driver.create("driver", self)
-        self.data_mon = Monitor("data_mon", self, "get_data")
         self.coverage = Coverage("coverage", self)
         self.scoreboard = Scoreboard("scoreboard", self)
 
     def connect_phase(self):
         self.driver.seq_item_port.connect(self.seqr.seq_item_export)
-        self.data_mon.ap.connect(self.scoreboard.data_export)
-        self.data_mon.ap.connect(self.coverage.analysis_export)
+        self.driver.req_ap.connect(self.scoreboard.data_export)
         self.driver.ap.connect(self.scoreboard.result_export)
+        self.driver.ap.connect(self.coverage.analysis_export)
 
 
 @pyuvm.test()
 class Test(uvm_test):
-    """Test UART rx-tx loopback with random values"""
+    """Test i2c write/read bursts (sda loopback) with random targets, lengths and values"""
+    scenario = None     # default Scenario unless one is given (see run_scenario)
 
     def build_phase(self):
+        ConfigDB().set(None, "*", "SCENARIO", type(self).scenario or Scenario())
         self.env = Env("env", self)
         self.bfm = I2cBfm()
-        self.data_rx = [0]*8
-        # global recv
 
     def end_of_elaboration_phase(self):
         self.test_all = TestAllSeq.create("test_all")
@@ -237,6 +329,176 @@ class Test(uvm_test):
         cocotb.start_soon(Clock(self.bfm.dut.i_clk, 10, units="ns").start())
         await self.test_all.start()
 
-        coverage_db.report_coverage(cocotb.log.info,bins=True)
-        coverage_db.export_to_xml(filename="coverage.xml")
-        self.drop_objection()
\ No newline at end of file
+        coverage.report(cocotb.log.info)
+        coverage.export_xml("coverage.xml")
+        self.drop_objection()
+
+
+# command sequencer: whole register transactions from descriptors (fifo mode)
+class DescItem(uvm_sequence_item):
+    """Descriptor of the command sequencer, the read data comes back in rx_data"""
+
+    def __init__(self, name, address=0, pointer=None, payload=None, length=0):
+        super().__init__(name)
+        self.address = address
+        self.pointer = pointer or []
+        self.payload = payload or []
+        self.length = length
+        self.rx_data = []
+
+    def randomize(self):
+        # register write, register read, write then read or a bare address probe
+        kind = random.choice(["write", "read", "write_read", "probe"])
+        self.address = random.randrange(8, 120)
+        self.pointer = [] if kind == "probe" else [random.randrange(256)]
+        self.payload = [random.randrange(256) for _ in range(random.randint(1, 4))] if kind in ("write", "write_read") else []
+        self.length = random.randint(1, 4) if kind in ("read", "write_read") else 0
+
+
+class DescSeq(uvm_sequence):
+
+    async def body(self):
+        for _ in range(20):
+            desc = DescItem("desc")
+            await self.start_item(desc)
+            desc.randomize()
+            await self.finish_item(desc)
+
+
+class SeqDriver(Driver):
+
+    @profiled
+    async def run_phase(self):
+        await self.launch_tb()
+        # prescaler, enable and fifo mode, interrupt on transfer done and arbitration lost
+        await self.bfm.send_batch([(1,1,0,20),(1,1,1,0),(1,1,2,192),(1,1,12,3),(0,0,0,0)])
+
+        while True:
+            desc = await self.seq_item_port.get_next_item()
+            # tx fifo then the descriptor, on back to back clocks
+            ops = [(1,1,3,byte) for byte in desc.pointer + desc.payload]
+            ops += [(1,1,10,byte) for byte in (desc.address,len(desc.pointer),len(desc.payload),desc.length)]
+            await self.bfm.send_batch(ops + [(0,0,0,0)])
+            await self.wait_irq()
+            await self.clear_irq()
+            desc.rx_data = [await self.read_rx() for _ in range(desc.length)]
+            self.ap.write(desc)
+            self.seq_item_port.item_done()
+
+
+class SeqScoreboard(uvm_component):
+    """Check the transactions on the bus against the descriptors as they are done.
+
+    sda is looped back and no target answers: every address/write byte is NACKed
+    and the read bytes are all ones.
+    """
+
+    def build_phase(self):
+        self.frames = StreamingComparator("frames", stop_on_fail=stop_on_fail(self), window=16, log=self.logger)
+        self.rx = StreamingComparator("rx fifo", stop_on_fail=stop_on_fail(self), window=16, log=self.logger)
+        self.desc_export = uvm_subscriber.uvm_AnalysisImp("desc_export", self, self.write)
+
+    def start_of_simulation_phase(self):
+        self.golden = Lockstep(cocotb.top, log=self.logger) if lockstep(self) else None
+        self.monitor = I2cMonitor(cocotb.top)
+
+    async def run_phase(self):
+        if self.golden:
+            self.golden.start()
+        self.monitor.start()
+
+    def expected(self, desc):
+        frames = []
+        if desc.pointer or desc.payload or not desc.length:
+            frames.append((False, desc.address, False, desc.pointer + desc.payload, not desc.length))
+        if desc.length:
+            frames.append((bool(frames), desc.address, True, [255]*desc.length, True))
+        return frames
+
+    def write(self, desc):
+        # the descriptor is done (STOP included): its frames are all on the bus
+        for frame in self.expected(desc):
+            self.frames.add_expected(frame)
+        done = [t for t in self.monitor.transactions if t.end is not None]
+        for t in done:
+            self.frames.add_actual((t.repeated, t.address, t.read, t.data, t.stop))
+        del self.monitor.transactions[:len(done)]
+        self.rx.add_expected([255]*desc.length)
+        self.rx.add_actual(desc.rx_data)
+
+    def check_phase(self):
+        passed = True
+        for comparator in (self.frames, self.rx):
+            if comparator.mismatches or any(comparator.pending):
+                self.logger.error(f"{comparator.name}: {comparator.mismatches} mismatches, first: "
+                                  f"{comparator.first_mismatch}, left (expected, actual): {comparator.pending}")
+                passed = False
+        if passed:
+            self.logger.info(f"{self.frames.matches} transactions on the bus matched the descriptors")
+        if self.golden and self.golden.mismatches:
+            self.logger.error(f"{len(self.golden.mismatches)} mismatches against the reference model "
+                              f"in {self.golden.cycles} cycles, first: {self.golden.mismatches[0]}")
+            passed = False
+        assert passed
+
+
+class SeqEnv(uvm_env):
+
+    def build_phase(self):
+        self.seqr = uvm_sequencer("seqr", self)
+        ConfigDB().set(None, "*", "SEQR", self.seqr)
+        self.driver = SeqDriver.create("driver", self)
+        self.scoreboard = SeqScoreboard("scoreboard", self)
+
+    def connect_phase(self):
+        self.driver.seq_item_port.connect(self.seqr.seq_item_export)
+        self.driver.ap.connect(self.scoreboard.desc_export)
+
+
+@pyuvm.test()
+class SequencerTest(uvm_test):
+    """Test random descriptors of the command sequencer"""
+
+    def build_phase(self):
+        self.env = SeqEnv("env", self)
+        self.bfm = I2cBfm()
+
+    def end_of_elaboration_phase(self):
+        self.seq = DescSeq.create("seq")
+
+    async def run_phase(self):
+        self.raise_objection()
+        cocotb.start_soon(Clock(self.bfm.dut.i_clk, 10, units="ns").start())
+        await self.seq.start(ConfigDB().get(None, "", "SEQR"))
+        self.drop_objection()
+
+
+class ScenarioTest(Test):
+    """Test with the Scenario given by run_scenario"""
+
+
+async def run_scenario(dut, scl_cycles=20, burst_len=4, read_ratio=0.25):
+    """Many scenarios in one simulation: each one builds a new uvm tree, resets the core and
+    reprograms its registers, the coverage accumulates in the coverage model"""
+    ScenarioTest.scenario = Scenario((scl_cycles,scl_cycles), burst_len, read_ratio,
+                                     bursts=int(os.environ.get("I2C_SCENARIO_BURSTS",4)),
+                                     seed=random.getrandbits(32))
+    await uvm_root().run_test(ScenarioTest)
+
+
+@cocotb.test(skip="I2C_BENCH_TRANSACTIONS" not in os.environ)
+async def test_benchmark(dut):
+    """Fixed workload of the benchmark suite (benchmark/bench.py): I2C_BENCH_TRANSACTIONS bursts of
+    1 to 4 bytes with I2C_BENCH_SCL_CYCLES (run it with I2C_LOCKSTEP=0 to leave the reference model out)"""
+    scl_cycles = int(os.environ.get("I2C_BENCH_SCL_CYCLES", 20))
+    ScenarioTest.scenario = Scenario((scl_cycles,scl_cycles), 4, 0.5,
+                                     bursts=int(os.environ["I2C_BENCH_TRANSACTIONS"]),
+                                     seed=random.getrandbits(32))
+    await uvm_root().run_test(ScenarioTest)
+
+
+scenarios = TestFactory(run_scenario)
+scenarios.add_option("scl_cycles", [20, 50])
+scenarios.add_option("burst_len", [1, 4, 16])
+scenarios.add_option("read_ratio", [0.0, 0.5, 1.0])
+scenarios.generate_tests()
@@ -1,5 +1,5 @@
 
-from cocotb.triggers import Timer,RisingEdge,FallingEdge,ClockCycles
+from cocotb.triggers import Timer,RisingEdge,FallingEdge,ClockCycles,Edge,Event
 from cocotb.clock import Clock
 from cocotb.queue import QueueEmpty, Queue
 import cocotb
@@ -8,26 +8,28 @@ import random
 from cocotb_coverage import crv 
 from cocotb_coverage.coverage import CoverCross,CoverPoint,coverage_db
 from pyuvm import utility_classes
+from profiler import profiled
 
 
 
 class I2cBfm(metaclass=utility_classes.Singleton):
     def __init__(self):
         self.dut = cocotb.top
-        self.driver_queue = Queue(maxsize=1)
-        self.data_mon_queue = Queue(maxsize=0)
-        self.result_mon_queue = Queue(maxsize=0)
+        # batches of register operations (i_we,i_stb,i_addr,i_data), each with the event
+        # set once its last operation is driven
+        self.driver_queue = Queue(maxsize=0)
+        # number of times the driver and the sda loopback were woken up by the simulator
+        self.wakeups = 0
 
     async def send_data(self, data):
-        await self.driver_queue.put(data)
+        await self.send_batch([data])
 
-    async def get_data(self):
-        data = await self.data_mon_queue.get()
-        return data
-
-    async def get_result(self):
-        result = await self.result_mon_queue.get()
-        return result
+    async def send_batch(self, ops):
+        # the operations are applied on consecutive clocks, returns on the clock edge the
+        # last one is driven (the dut samples it on the next one)
+        done = Event()
+        self.driver_queue.put_nowait((list(ops), done))
+        await done.wait()
 
     async def reset(self):
         await RisingEdge(self.dut.i_clk)
@@ -40,42 +42,42 @@ class I2cBfm(metaclass=utility_classes.Singleton):
         self.dut.i_arstn.value = 1
 
 
+    @profiled
     async def driver_bfm(self):
+        # sleeps on the queue while there is nothing to drive, wakes once per operation
+        edge = RisingEdge(self.dut.i_clk)
         while True:
-            await RisingEdge(self.dut.i_clk)
-            self.dut.f_sda.value = self.dut.io_sda.value
-            try:
-                (i_we,i_stb,i_addr,i_data) = self.driver_queue.get_nowait()
+            ops, done = await self.driver_queue.get()
+            for (i_we,i_stb,i_addr,i_data) in ops:
+                await edge
+                self.wakeups += 1
                 self.dut.i_we.value = i_we
                 self.dut.i_stb.value = i_stb
                 self.dut.i_addr.value = i_addr
                 self.dut.i_data.value = i_data
+            done.set()
 
-            except QueueEmpty:
-                pass
-
-    async def data_mon_bfm(self):
+    @profiled
+    async def sda_loopback(self):
+        # no targets on the bus: the master sees its own sda, resolved when io_sda changes
+        sda = self.dut.io_sda
+        self.dut.f_sda.value = sda.value
         while True:
-            # await RisingEdge(self.dut.o_tx_ready)
-            # await RisingEdge(self.dut.i_addr == 3)
-            await RisingEdge(self.dut.f_is_data_to_tx)
-            i_data = self.dut.i_data.value 
-
-            self.data_mon_queue.put_nowait(i_data)
-
-
-    async def result_mon_bfm(self):
+            await Edge(sda)
+            self.wakeups += 1
+            self.dut.f_sda.value = sda.value
+
+    @profiled
+    async def scl_loopback(self):
+        # no target stretches scl and no other master: f_scl follows io_scl
+        scl = self.dut.io_scl
+        self.dut.f_scl.value = scl.value
         while True:
-            # await RisingEdge(self.dut.o_rx_ready)
-            await RisingEdge(self.dut.f_is_data_to_tx)
-            await FallingEdge(self.dut.i2c_byte_controller.o_msg_done)
-            await RisingEdge(self.dut.i_clk)
-            await RisingEdge(self.dut.i_clk)
-            await RisingEdge(self.dut.i_clk)
-            self.result_mon_queue.put_nowait(self.dut.o_data.value)
-
+            await Edge(scl)
+            self.wakeups += 1
+            self.dut.f_scl.value = scl.value
 
     def start_bfm(self):
         cocotb.start_soon(self.driver_bfm())
-        cocotb.start_soon(self.data_mon_bfm())
-        cocotb.start_soon(self.result_mon_bfm())
\ No newline at end of file
+        cocotb.start_soon(self.sda_loopback())
+        cocotb.start_soon(self.scl_loopback())
\ No newline at end of file
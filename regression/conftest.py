@@ -0,0 +1,78 @@
+"""Seed-sharded regression of all the testbenches.
+
+    $ pytest regression -n auto --seeds 32
+
+the design is elaborated once per top level (or taken from the build cache) before the
+workers start, every (testbench, seed) pair then runs in its own directory under
+regression/runs and the coverage databases of all the runs are merged into
+regression/coverage.xml. the parts of sim_common that need no simulator (backend
+choice, wave trimming) have unit tests here too.
+"""
+
+import glob
+import os
+import shutil
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "sim_common"))
+
+import runner  # noqa: E402
+
+RUNS_DIR = os.path.join(HERE, "runs")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("i2c regression")
+    group.addoption("--seeds", type=int, default=int(os.environ.get("I2C_SEEDS", 4)),
+                    help="number of seeds per testbench")
+    group.addoption("--seed-base", type=int, default=int(os.environ.get("I2C_SEED_BASE", 1)),
+                    help="first seed, the runs use seed-base .. seed-base+seeds-1")
+    group.addoption("--testbench", action="append", choices=sorted(runner.TESTBENCHES),
+                    help="testbench module(s) to run (default: all)")
+
+
+def _is_controller(config):
+    return not hasattr(config, "workerinput")
+
+
+def _testbenches(config):
+    return config.getoption("testbench") or sorted(runner.TESTBENCHES)
+
+
+def build_dir(toplevel):
+    return runner.build_cached(toplevel)
+
+
+def pytest_configure(config):
+    # elaborate every top level once, before xdist starts its workers
+    if not _is_controller(config) or not runner.have_simulator():
+        return
+    if config.option.collectonly:
+        return
+    shutil.rmtree(RUNS_DIR, ignore_errors=True)
+    for toplevel in sorted({runner.TESTBENCHES[m][1] for m in _testbenches(config)}):
+        build_dir(toplevel)
+
+
+def pytest_generate_tests(metafunc):
+    if {"module", "seed"} <= set(metafunc.fixturenames):
+        config = metafunc.config
+        base = config.getoption("seed_base")
+        seeds = range(base, base + config.getoption("seeds"))
+        metafunc.parametrize("module", _testbenches(config))
+        metafunc.parametrize("seed", seeds)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _is_controller(session.config):
+        return
+    files = sorted(glob.glob(os.path.join(RUNS_DIR, "*", "coverage.xml")))
+    merged = os.path.join(HERE, "coverage.xml")
+    coverage = runner.merge_coverage(files, merged, logger=lambda msg: None)
+    if coverage is not None:
+        reporter = session.config.pluginmanager.get_plugin("terminalreporter")
+        if reporter:
+            reporter.write_line(f"merged coverage of {len(files)} runs: {coverage:.2f}% ({merged})")
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+import runner
+from conftest import RUNS_DIR, build_dir
+
+pytestmark = pytest.mark.skipif(not runner.have_simulator(), reason="ghdl not found")
+
+
+def test_seed(module, seed):
+    toplevel = runner.TESTBENCHES[module][1]
+    run_dir = os.path.join(RUNS_DIR, f"{module}_seed{seed}")
+    results = runner.simulate(module, build_dir(toplevel), run_dir, seed=seed)
+    failed = runner.failures(results)
+    wave = runner.replay(module, build_dir(toplevel), run_dir, results, seed=seed) if failed else None
+    assert not failed, (f"{module} failed with RANDOM_SEED={seed}: {', '.join(failed)} (see {run_dir}"
+                        + (f", waves of the failure in {wave})" if wave else ")"))
@@ -0,0 +1,39 @@
+import json
+
+import simulators
+
+
+def record(simulator, build_s, startup_s, cycles_per_s, passed=True):
+    test_wall = 1e6 / cycles_per_s
+    return {"id": f"testbench-n1000-scl20-{simulator}", "simulator": simulator, "passed": passed,
+            "build_s": build_s, "wall_s": startup_s + test_wall, "test_wall_s": test_wall,
+            "cycles_per_s": cycles_per_s}
+
+
+def results_file(tmp_path):
+    # mcode: no build, slow run; llvm: 30 s build, 10x faster run
+    records = [record("ghdl-mcode", 0.0, 1.0, 1e5), record("ghdl-mcode", 0.0, 1.0, 1e5),
+               record("ghdl-llvm", 30.0, 0.5, 1e6), record("ghdl-llvm", 30.0, 0.5, 1e6),
+               # a workload that did not run has no timing and is left out
+               {"id": "testbench_pyuvm-n1000-scl20-nvc", "simulator": "nvc", "passed": False}]
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps({"results": records}))
+    return [str(path)]
+
+
+def test_profiles(tmp_path):
+    profiles = simulators.profiles(results_file(tmp_path))
+    assert set(profiles) == {"ghdl-mcode", "ghdl-llvm"}
+    assert profiles["ghdl-llvm"] == {"build_s": 30.0, "startup_s": 0.5, "cycles_per_s": 1e6}
+
+
+def test_choose_by_run_length(tmp_path):
+    files = results_file(tmp_path)
+    found = {"ghdl-mcode": "mcode", "ghdl-llvm": "llvm", "nvc": "nvc"}
+    # break even: 1 + c/1e5 = 30.5 + c/1e6, c ~ 3.3e6 cycles
+    assert simulators.choose(1e5, found=found, files=files) == "mcode"
+    assert simulators.choose(1e7, found=found, files=files) == "llvm"
+    # a cached llvm build wins short runs too
+    assert simulators.choose(1e5, cached=("ghdl-llvm",), found=found, files=files) == "llvm"
+    # only the simulators found are candidates
+    assert simulators.choose(1e7, found={"ghdl-mcode": "mcode"}, files=files) == "mcode"
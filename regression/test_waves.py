@@ -0,0 +1,47 @@
+import io
+
+from waves import trim_vcd
+
+VCD = """$timescale 1ns $end
+$scope module top $end
+$var wire 1 ! clk $end
+$var wire 8 " data $end
+$upscope $end
+$enddefinitions $end
+#0
+$dumpvars
+0!
+b00000000 "
+$end
+#5
+1!
+#10
+0!
+b00000001 "
+#15
+1!
+$comment mid-window $end
+#20
+0!
+b00000010 "
+"""
+
+
+def trim(start_ns, end_ns):
+    dst = io.StringIO()
+    trim_vcd(io.StringIO(VCD), dst, start_ns, end_ns)
+    return dst.getvalue().split("$enddefinitions $end\n", 1)[1]
+
+
+def test_trim_vcd_window():
+    # the values at the start of the window in one $dumpvars block, then the changes up to its end
+    assert trim(12, 18) == ("#12\n$dumpvars\n0!\nb00000001 \"\n$end\n"
+                            "#15\n1!\n$comment mid-window $end\n")
+
+
+def test_trim_vcd_window_on_a_time_step():
+    assert trim(10, 15) == "#10\n$dumpvars\n1!\nb00000000 \"\n$end\n0!\nb00000001 \"\n#15\n1!\n$comment mid-window $end\n"
+
+
+def test_trim_vcd_no_window():
+    assert trim(None, None) == VCD.split("$enddefinitions $end\n", 1)[1]
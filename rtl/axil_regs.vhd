@@ -37,10 +37,27 @@ entity axil_regs is
 
 			--data read from sdram
 			i_i2c_rd_data : in std_ulogic_vector(7 downto 0);
+			i_done : in std_ulogic;
+			i_busy : in std_ulogic;
+			i_al : in std_ulogic;
+			i_ack : in std_ulogic;
+			i_tx_level : in std_ulogic_vector(7 downto 0);
+			i_rx_level : in std_ulogic_vector(7 downto 0);
+			i_desc_level : in std_ulogic_vector(7 downto 0);
+			i_xfer_done : in std_ulogic;
+			i_nack : in std_ulogic;
+			i_tip : in std_ulogic;
+			i_burst : in std_ulogic;
 
 			--ports for write regs to hierarchy
 			o_scl_cycles : out std_ulogic_vector(15 downto 0);
 			o_txr : out std_ulogic_vector(7 downto 0);
+			o_tx_push : out std_ulogic;
+			o_rx_pop : out std_ulogic;
+			o_rx_len : out std_ulogic_vector(7 downto 0);
+			o_desc : out std_ulogic_vector(7 downto 0);
+			o_desc_push : out std_ulogic;
+			o_irq : out std_ulogic;
 			o_ctr : out std_ulogic_vector(7 downto 0);
 			o_cr : out std_ulogic_vector(7 downto 0));
 end axil_regs;
@@ -61,20 +78,15 @@ architecture rtl of axil_regs is
 
 	signal f_is_data_to_tx : std_ulogic;
 	signal w_tx_reg : std_ulogic_vector(7 downto 0);
+	signal w_tx_thr, w_rx_thr : std_ulogic_vector(7 downto 0);
+	signal w_ier, w_isr, w_flags : std_ulogic_vector(4 downto 0);
+	signal w_status : std_ulogic_vector(7 downto 0);
+	signal w_irq : std_ulogic;
 begin
 
-	manage_w_channel : process(i_clk,i_arst) is
-	begin
-		if(i_arst = '1') then
-			axil_awready <= '0';
-		elsif (rising_edge(i_clk)) then
-			if(axil_awready = '0' and S_AXI_AWVALID = '1' and S_AXI_WVALID = '1' and (S_AXI_BVALID = '0' or S_AXI_BREADY = '1')) then
-				axil_awready <= '1';
-			else
-				axil_awready <= '0';
-			end if;
-		end if;
-	end process; -- manage_w_channel
+	-- a write is accepted in every cycle in which both the address and the data are valid,
+	-- as long as the previous response is not stalled (BVALID and not BREADY)
+	axil_awready <= S_AXI_AWVALID and S_AXI_WVALID and (not axil_bvalid or S_AXI_BREADY);
 
 	S_AXI_AWREADY <= axil_awready;
 	S_AXI_WREADY <= axil_awready;
@@ -91,9 +103,9 @@ begin
 		elsif (rising_edge(i_clk)) then
 			if(axil_write_ready = '1') then
 				axil_bvalid <= '1';
+			elsif (S_AXI_BREADY = '1') then
+				axil_bvalid <= '0';
 			end if;
-		elsif (S_AXI_BREADY = '1') then
-			axil_bvalid <= '0';
 		end if;
 	end process; -- manage_b_channel
 
@@ -101,7 +113,8 @@ begin
 	S_AXI_BRESP <= "00";
 
 
-	axil_arready <= not S_AXI_RVALID;
+	-- a read is accepted in every cycle in which the previous data is not stalled
+	axil_arready <= not axil_read_valid or S_AXI_RREADY;
 	S_AXI_ARREADY <= axil_arready;
 	axil_read_ready <= S_AXI_ARVALID and S_AXI_ARREADY;
 	--axil_raddr <= S_AXI_ARADDR(S_AXI_ARADDR'high downto ADDR_LSB);
@@ -131,48 +144,148 @@ begin
 	-- 			Address 		| 		Functionality
 	--			   0 			|	system clock cycles to make scl (lower byte)
 	--			   1 			|	system clock cycles to make scl (upper byte)
-	--			   2 			|	control transfer register (ctr)
-	--			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0') 
+	--			   2 			|	control transfer register (ctr), bit 7 enable, bit 6 fifo mode
+	--			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0')
+	--						 	|	(push to the tx fifo/pop from the rx fifo in fifo mode)
+	--			   4 			|	command register (cr)
+	--			   5 			|	bytes to read in a fifo mode burst
+	--			   6 			|	tx fifo level (read only)
+	--			   7 			|	rx fifo level (read only)
+	--			   8 			|	tx fifo threshold
+	--			   9 			|	rx fifo threshold
+	--			  10 			|	sequencer descriptor queue, 4 bytes per descriptor (write)/
+	--						 	|	number of queued descriptors (read)
+	--						 	|	address, pointer length, write length, read length
+	--			  11 			|	status (read only)
+	--						 	|	bit 7 RxACK (last ack received, '1' = NACK), bit 6 bus busy,
+	--						 	|	bit 5 arbitration lost (flag), bit 4 tx fifo empty, bit 3 rx fifo not empty,
+	--						 	|	bit 2 burst/descriptor running, bit 1 TIP (transfer in progress), bit 0 irq
+	--			  12 			|	interrupt enable (ier)
+	--			  13 			|	interrupt flags (isr), write '1' to clear
+	--						 	|	bit 0 transfer done (message in direct mode, burst/descriptor in fifo mode),
+	--						 	|	bit 1 arbitration lost, bit 2 NACK to a written address/data byte,
+	--						 	|	bit 3 tx level <= tx threshold, bit 4 rx level >= rx threshold (fifo mode)
 
 
 	--f_is_data_to_tx <= '1' when (S_AXI_WVALID = '1' and S_AXI_AWVALID = '1' and unsigned(axil_waddr) = 0) else '0';
 
+	--interrupt sources, a flag stays set until it is cleared and raises o_irq if enabled
+	w_flags(0) <= i_xfer_done;
+	w_flags(1) <= i_al;
+	w_flags(2) <= i_nack;
+	w_flags(3) <= '1' when (o_ctr(6) = '1' and unsigned(i_tx_level) <= unsigned(w_tx_thr)) else '0';
+	w_flags(4) <= '1' when (o_ctr(6) = '1' and unsigned(i_rx_level) /= 0 and unsigned(i_rx_level) >= unsigned(w_rx_thr)) else '0';
+
+	w_irq <= '1' when ((w_isr and w_ier) /= "00000") else '0';
+	o_irq <= w_irq;
+
+	w_status(7) <= i_ack;
+	w_status(6) <= i_busy;
+	w_status(5) <= w_isr(1);
+	w_status(4) <= '1' when (unsigned(i_tx_level) = 0) else '0';
+	w_status(3) <= '1' when (unsigned(i_rx_level) /= 0) else '0';
+	w_status(2) <= i_burst;
+	w_status(1) <= i_tip;
+	w_status(0) <= w_irq;
+
 	manage_write_regs : process(i_clk,i_arst) is
-		variable loc_addr : std_ulogic_vector(2 downto 0);
+		variable loc_addr : std_ulogic_vector(3 downto 0);
 	begin
 		if(i_arst = '1') then
-			null;
+			o_tx_push <= '0';
+			o_rx_len <= (others => '0');
+			o_desc <= (others => '0');
+			o_desc_push <= '0';
+			w_tx_thr <= (others => '0');
+			w_rx_thr <= (others => '0');
+			w_ier <= (others => '0');
+			w_isr <= (others => '0');
 		elsif (rising_edge(i_clk)) then
-			loc_addr := axil_waddr(2 downto 0);
+			loc_addr := axil_waddr(3 downto 0);
+			o_tx_push <= '0';
+			o_desc_push <= '0';
+
+			--the command is cleared once the controller has taken it (message picked up by the
+			--byte controller or burst accepted), unless it is written again in the same cycle
+			if(i_done = '1' or i_al = '1') then
+				o_cr(7 downto 4) <= "0000";
+			end if;
+
+			if(axil_write_ready = '1' and loc_addr = "1101") then
+				w_isr <= (w_isr and not axil_wdata(4 downto 0)) or w_flags;
+			else
+				w_isr <= w_isr or w_flags;
+			end if;
+
 			if(axil_write_ready = '1') then
 				case loc_addr is 
-					when "000" =>
+					when "0000" =>
 						o_scl_cycles(7 downto 0) <= axil_wdata(7 downto 0);
-					when "001" =>
+					when "0001" =>
 						o_scl_cycles(15 downto 8) <= axil_wdata(7 downto 0);
-					when "010" =>
+					when "0010" =>
 						o_ctr <= axil_wdata(7 downto 0);
-					when "011" =>
+					when "0011" =>
 						o_txr <= axil_wdata(7 downto 0);
-					when "100" =>
+						o_tx_push <= '1';
+					when "0100" =>
 						if(o_ctr(7) = '1') then
 							o_cr <= axil_wdata(7 downto 0);
 						end if;
+					when "0101" =>
+						o_rx_len <= axil_wdata(7 downto 0);
+					when "1000" =>
+						w_tx_thr <= axil_wdata(7 downto 0);
+					when "1001" =>
+						w_rx_thr <= axil_wdata(7 downto 0);
+					when "1010" =>
+						o_desc <= axil_wdata(7 downto 0);
+						o_desc_push <= '1';
+					when "1100" =>
+						w_ier <= axil_wdata(4 downto 0);
 					when others =>
 				end case;
 			end if;
 		end if;
 	end process; -- manage_write_regs
 
+	--the rx fifo pops with the read of its head
+	o_rx_pop <= '1' when (axil_read_ready = '1' and axil_raddr(3 downto 0) = "0011") else '0';
+
+	-- the read data is registered with the address handshake and held while RVALID is stalled
 	manage_read_regs : process(i_clk,i_arst) is
-		variable loc_addr : std_ulogic_vector(2 downto 0);
+		variable loc_addr : std_ulogic_vector(3 downto 0);
 	begin
 		if(i_arst = '1') then
 			axil_rdata <= (others => '0');
 		elsif (rising_edge(i_clk)) then
-			loc_addr := axil_raddr(2 downto 0);
-			if(S_AXI_RREADY = '1' and S_AXI_RVALID = '0' and loc_addr = "011") then
-				axil_rdata(7 downto 0) <= i_i2c_rd_data;
+			loc_addr := axil_raddr(3 downto 0);
+			if(axil_read_ready = '1') then
+				axil_rdata <= (others => '0');
+				case loc_addr is
+					when "0011" =>
+						axil_rdata(7 downto 0) <= i_i2c_rd_data;
+					when "0101" =>
+						axil_rdata(7 downto 0) <= o_rx_len;
+					when "0110" =>
+						axil_rdata(7 downto 0) <= i_tx_level;
+					when "0111" =>
+						axil_rdata(7 downto 0) <= i_rx_level;
+					when "1000" =>
+						axil_rdata(7 downto 0) <= w_tx_thr;
+					when "1001" =>
+						axil_rdata(7 downto 0) <= w_rx_thr;
+					when "1010" =>
+						axil_rdata(7 downto 0) <= i_desc_level;
+					when "1011" =>
+						axil_rdata(7 downto 0) <= w_status;
+					when "1100" =>
+						axil_rdata(7 downto 0) <= "000" & w_ier;
+					when "1101" =>
+						axil_rdata(7 downto 0) <= "000" & w_isr;
+					when others =>
+						null;
+				end case;
 			end if;
 		end if;
 	end process; -- manage_read_regs
@@ -0,0 +1,405 @@
+--module that sits between the host registers and i2c_byte_controller.
+--with the fifo mode off (ctr(6) = '0') the command register and txr go straight to the
+--byte controller, one message per command as before. the command is cleared from cr
+--as soon as the byte controller has picked it up, so the host only writes it once.
+--with the fifo mode on, the bytes written to txr are queued in a tx fifo and the bytes
+--read from the bus in an rx fifo. a single command then runs a whole burst: the
+--messages are issued to the byte controller one after the other without the host.
+--	cr(7) START : the first message of the burst starts with a (repeated) START
+--	cr(4) WRITE : write out the tx fifo, until it runs empty
+--	cr(5) READ  : then read rx_len bytes into the rx fifo (ACK, cr(3) for the last one)
+--	cr(6) STOP  : the last message of the burst ends with a STOP
+--the command is accepted (and cleared from cr) when the burst starts, o_done pulses at
+--its end. turning the fifo mode off flushes both fifos.
+--in fifo mode it also runs whole register transactions from a queue of descriptors,
+--4 bytes each: target address, pointer length, write length, read length.
+--	START, address+W, pointer and write bytes (from the tx fifo),
+--	repeated START, address+R, read bytes (to the rx fifo, NACK on the last one), STOP
+--the write part is skipped without pointer/write bytes, the read part without read
+--bytes (a descriptor with no bytes at all only addresses the target). o_done pulses
+--once at the end of every descriptor.
+--o_nack pulses at the end of a write message (address or data byte) that the target
+--did not acknowledge, in both modes.
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+
+entity i2c_burst_controller is
+	generic(
+		FIFO_DEPTH : natural := 16;
+		DESC_DEPTH : natural := 4);
+	port (
+			--system clock and reset
+			i_clk : in std_ulogic;
+			i_arstn : in std_ulogic;
+
+			--register block
+			i_fifo_en : in std_ulogic;
+			i_cr : in std_ulogic_vector(7 downto 0);
+			i_txr : in std_ulogic_vector(7 downto 0);
+			i_tx_push : in std_ulogic;
+			i_rx_pop : in std_ulogic;
+			i_rx_len : in std_ulogic_vector(7 downto 0);
+			i_desc_push : in std_ulogic;
+			i_desc : in std_ulogic_vector(7 downto 0);
+			o_cr_done : out std_ulogic;
+			o_done : out std_ulogic;
+			o_burst : out std_ulogic;
+			o_rd_data : out std_ulogic_vector(7 downto 0);
+			o_tx_level : out std_ulogic_vector(7 downto 0);
+			o_rx_level : out std_ulogic_vector(7 downto 0);
+			o_desc_level : out std_ulogic_vector(7 downto 0);
+			o_nack : out std_ulogic;
+
+			--byte controller
+			o_start : out std_ulogic;
+			o_stop : out std_ulogic;
+			o_rd : out std_ulogic;
+			o_wr : out std_ulogic;
+			o_ack : out std_ulogic;
+			o_data : out std_ulogic_vector(7 downto 0);
+			i_data : in std_ulogic_vector(7 downto 0);
+			i_msg_done : in std_ulogic;
+			i_tip : in std_ulogic;
+			i_rx_ack : in std_ulogic;
+			i_al : in std_ulogic);
+end i2c_burst_controller;
+
+architecture rtl of i2c_burst_controller is
+	type t_state is (IDLE,DESC,NEXT_MSG,ISSUE,WAIT_DONE);
+	signal w_state : t_state;
+
+	--what the next message of the burst is: from a command (cr) or a step of a descriptor
+	type t_phase is (PH_CMD,PH_ADDR_W,PH_WRITE,PH_ADDR_R,PH_READ,PH_END);
+	signal w_phase : t_phase;
+
+	--accepted command
+	signal w_cmd_start, w_cmd_stop, w_cmd_rd, w_cmd_wr, w_cmd_ack : std_ulogic;
+	signal w_first : std_ulogic;
+	signal w_rd_cnt : unsigned(7 downto 0);
+
+	--descriptor
+	signal w_desc_idx : natural range 0 to 3;
+	signal w_seq_addr : std_ulogic_vector(6 downto 0);
+	signal w_wr_cnt : unsigned(8 downto 0);
+
+	--message issued to the byte controller
+	signal w_msg_start, w_msg_stop, w_msg_rd, w_msg_wr, w_msg_ack : std_ulogic;
+	signal w_is_read : std_ulogic;
+	signal w_own_data : std_ulogic;
+	signal w_msg_data : std_ulogic_vector(7 downto 0);
+
+	signal w_accept, w_burst_done : std_ulogic;
+
+	--message picked up by the byte controller
+	signal w_tip_d, w_pickup, w_wr_msg : std_ulogic;
+
+	--byte received by the last message (the byte controller reloads its shift register
+	--from txr as soon as it is back to idle)
+	signal w_rxr : std_ulogic_vector(7 downto 0);
+
+	signal w_fifo_clr : std_ulogic;
+	signal w_tx_push, w_tx_pop, w_tx_empty : std_ulogic;
+	signal w_rx_push, w_rx_pop, w_rx_full : std_ulogic;
+	signal w_tx_data, w_rx_data : std_ulogic_vector(7 downto 0);
+	signal w_tx_level : std_ulogic_vector(7 downto 0);
+	signal w_desc_push, w_desc_pop : std_ulogic;
+	signal w_desc_data, w_desc_level : std_ulogic_vector(7 downto 0);
+begin
+
+	w_fifo_clr <= not i_fifo_en;
+	w_tx_push <= i_tx_push and i_fifo_en;
+	w_rx_pop <= i_rx_pop and i_fifo_en;
+
+	--a byte leaves the tx fifo/enters the rx fifo when its message is done
+	w_tx_pop <= '1' when (w_state = WAIT_DONE and i_msg_done = '1' and w_is_read = '0' and w_own_data = '0') else '0';
+	w_rx_push <= '1' when (w_state = WAIT_DONE and i_msg_done = '1' and w_is_read = '1') else '0';
+
+	tx_fifo : entity work.i2c_fifo(rtl)
+	generic map(
+		DEPTH => FIFO_DEPTH,
+		WIDTH => 8)
+	port map(
+		i_clk =>i_clk,
+		i_arstn =>i_arstn,
+		i_clr =>w_fifo_clr,
+		i_push =>w_tx_push,
+		i_data =>i_txr,
+		i_pop =>w_tx_pop,
+		o_data =>w_tx_data,
+		o_empty =>w_tx_empty,
+		o_full =>open,
+		o_level =>w_tx_level);
+
+	rx_fifo : entity work.i2c_fifo(rtl)
+	generic map(
+		DEPTH => FIFO_DEPTH,
+		WIDTH => 8)
+	port map(
+		i_clk =>i_clk,
+		i_arstn =>i_arstn,
+		i_clr =>w_fifo_clr,
+		i_push =>w_rx_push,
+		i_data =>i_data,
+		i_pop =>w_rx_pop,
+		o_data =>w_rx_data,
+		o_empty =>open,
+		o_full =>w_rx_full,
+		o_level =>o_rx_level);
+
+	o_tx_level <= w_tx_level;
+
+	w_desc_push <= i_desc_push and i_fifo_en;
+	w_desc_pop <= '1' when (w_state = DESC) else '0';
+
+	desc_fifo : entity work.i2c_fifo(rtl)
+	generic map(
+		DEPTH => 4*DESC_DEPTH,
+		WIDTH => 8)
+	port map(
+		i_clk =>i_clk,
+		i_arstn =>i_arstn,
+		i_clr =>w_fifo_clr,
+		i_push =>w_desc_push,
+		i_data =>i_desc,
+		i_pop =>w_desc_pop,
+		o_data =>w_desc_data,
+		o_empty =>open,
+		o_full =>open,
+		o_level =>w_desc_level);
+
+	--number of whole descriptors queued
+	o_desc_level <= "00" & w_desc_level(7 downto 2);
+
+	-- burst_FSM issues the messages of a burst the way a host does:
+	-- set the command bits, drop them as soon as the byte controller has picked the
+	-- command up (o_tip) and wait for the message to be done
+	burst_FSM : process(i_clk,i_arstn) is
+	begin
+		if(i_arstn = '0') then
+			w_state <= IDLE;
+			w_cmd_start <= '0';
+			w_cmd_stop <= '0';
+			w_cmd_rd <= '0';
+			w_cmd_wr <= '0';
+			w_cmd_ack <= '0';
+			w_first <= '0';
+			w_rd_cnt <= (others => '0');
+			w_phase <= PH_CMD;
+			w_desc_idx <= 0;
+			w_seq_addr <= (others => '0');
+			w_wr_cnt <= (others => '0');
+			w_msg_start <= '0';
+			w_msg_stop <= '0';
+			w_msg_rd <= '0';
+			w_msg_wr <= '0';
+			w_msg_ack <= '0';
+			w_is_read <= '0';
+			w_own_data <= '0';
+			w_msg_data <= (others => '0');
+			w_accept <= '0';
+			w_burst_done <= '0';
+		elsif (rising_edge(i_clk)) then
+			w_accept <= '0';
+			w_burst_done <= '0';
+
+			if(i_fifo_en = '0' or i_al = '1') then
+				--arbitration lost aborts the burst
+				if(w_state /= IDLE) then
+					w_burst_done <= '1';
+				end if;
+				w_state <= IDLE;
+				w_phase <= PH_CMD;
+				w_msg_start <= '0';
+				w_msg_stop <= '0';
+				w_msg_rd <= '0';
+				w_msg_wr <= '0';
+				w_msg_ack <= '0';
+				w_own_data <= '0';
+			else
+				case w_state is
+					when IDLE =>
+						if(i_cr(5) = '1' or i_cr(4) = '1') then
+							w_state <= NEXT_MSG;
+							w_phase <= PH_CMD;
+							w_cmd_start <= i_cr(7);
+							w_cmd_stop <= i_cr(6);
+							w_cmd_rd <= i_cr(5);
+							w_cmd_wr <= i_cr(4);
+							w_cmd_ack <= i_cr(3);
+							w_rd_cnt <= unsigned(i_rx_len);
+							w_first <= '1';
+							w_accept <= '1';
+						elsif(unsigned(w_desc_level) >= 4) then
+							w_state <= DESC;
+							w_desc_idx <= 0;
+						end if;
+					when DESC =>
+						--one byte of the descriptor per clock
+						case w_desc_idx is
+							when 0 =>
+								w_seq_addr <= w_desc_data(6 downto 0);
+							when 1 =>
+								w_wr_cnt <= resize(unsigned(w_desc_data),w_wr_cnt'length);
+							when 2 =>
+								w_wr_cnt <= w_wr_cnt + unsigned(w_desc_data);
+							when 3 =>
+								w_rd_cnt <= unsigned(w_desc_data);
+								w_state <= NEXT_MSG;
+								if(w_wr_cnt = 0 and unsigned(w_desc_data) /= 0) then
+									w_phase <= PH_ADDR_R;
+								else
+									w_phase <= PH_ADDR_W;
+								end if;
+						end case;
+						if(w_desc_idx /= 3) then
+							w_desc_idx <= w_desc_idx +1;
+						end if;
+					when NEXT_MSG =>
+						case w_phase is
+							when PH_CMD =>
+								if(w_cmd_wr = '1' and w_tx_empty = '0') then
+									w_state <= ISSUE;
+									w_msg_wr <= '1';
+									w_msg_start <= w_first and w_cmd_start;
+									--stop with the last byte of the tx fifo, unless there is data to read
+									if(unsigned(w_tx_level) = 1 and (w_cmd_rd = '0' or w_rd_cnt = 0)) then
+										w_msg_stop <= w_cmd_stop;
+									end if;
+									w_is_read <= '0';
+									w_first <= '0';
+								elsif(w_cmd_rd = '1' and w_rd_cnt /= 0) then
+									--wait for room in the rx fifo
+									if(w_rx_full = '0') then
+										w_state <= ISSUE;
+										w_msg_rd <= '1';
+										w_msg_start <= w_first and w_cmd_start;
+										if(w_rd_cnt = 1) then
+											w_msg_stop <= w_cmd_stop;
+											w_msg_ack <= w_cmd_ack;
+										end if;
+										w_rd_cnt <= w_rd_cnt -1;
+										w_is_read <= '1';
+										w_first <= '0';
+									end if;
+								else
+									w_state <= IDLE;
+									w_burst_done <= '1';
+								end if;
+							when PH_ADDR_W =>
+								w_state <= ISSUE;
+								w_msg_wr <= '1';
+								w_msg_start <= '1';
+								w_msg_data <= w_seq_addr & '0';
+								w_own_data <= '1';
+								w_is_read <= '0';
+								if(w_wr_cnt /= 0) then
+									w_phase <= PH_WRITE;
+								elsif(w_rd_cnt /= 0) then
+									w_phase <= PH_ADDR_R;
+								else
+									w_msg_stop <= '1';
+									w_phase <= PH_END;
+								end if;
+							when PH_WRITE =>
+								--pointer and write bytes, waits for the host when the tx fifo runs empty
+								if(w_tx_empty = '0') then
+									w_state <= ISSUE;
+									w_msg_wr <= '1';
+									w_own_data <= '0';
+									w_is_read <= '0';
+									w_wr_cnt <= w_wr_cnt -1;
+									if(w_wr_cnt = 1) then
+										if(w_rd_cnt /= 0) then
+											w_phase <= PH_ADDR_R;
+										else
+											w_msg_stop <= '1';
+											w_phase <= PH_END;
+										end if;
+									end if;
+								end if;
+							when PH_ADDR_R =>
+								w_state <= ISSUE;
+								w_msg_wr <= '1';
+								w_msg_start <= '1';
+								w_msg_data <= w_seq_addr & '1';
+								w_own_data <= '1';
+								w_is_read <= '0';
+								w_phase <= PH_READ;
+							when PH_READ =>
+								if(w_rx_full = '0') then
+									w_state <= ISSUE;
+									w_msg_rd <= '1';
+									w_own_data <= '0';
+									w_is_read <= '1';
+									w_rd_cnt <= w_rd_cnt -1;
+									if(w_rd_cnt = 1) then
+										w_msg_stop <= '1';
+										w_msg_ack <= '1';
+										w_phase <= PH_END;
+									end if;
+								end if;
+							when PH_END =>
+								w_state <= IDLE;
+								w_phase <= PH_CMD;
+								w_burst_done <= '1';
+						end case;
+					when ISSUE =>
+						if(i_tip = '1') then
+							w_state <= WAIT_DONE;
+							w_msg_start <= '0';
+							w_msg_stop <= '0';
+							w_msg_rd <= '0';
+							w_msg_wr <= '0';
+						end if;
+					when WAIT_DONE =>
+						--the ack bit is used by the byte controller until the end of the message
+						if(i_msg_done = '1') then
+							w_state <= NEXT_MSG;
+							w_msg_ack <= '0';
+							w_own_data <= '0';
+						end if;
+					when others =>
+						null;
+				end case;
+			end if;
+		end if;
+	end process; -- burst_FSM
+
+	o_start <= w_msg_start when (i_fifo_en = '1') else i_cr(7);
+	o_stop <= w_msg_stop when (i_fifo_en = '1') else i_cr(6);
+	o_rd <= w_msg_rd when (i_fifo_en = '1') else i_cr(5);
+	o_wr <= w_msg_wr when (i_fifo_en = '1') else i_cr(4);
+	o_ack <= w_msg_ack when (i_fifo_en = '1') else i_cr(3);
+	o_data <= i_txr when (i_fifo_en = '0') else
+			  w_msg_data when (w_own_data = '1') else
+			  w_tx_data;
+
+	-- track_msg keeps the kind of the message in flight, taken when the byte controller
+	-- picks it up (the command bits are still set then), and the byte it received
+	track_msg : process(i_clk,i_arstn) is
+	begin
+		if(i_arstn = '0') then
+			w_tip_d <= '0';
+			w_wr_msg <= '0';
+			w_rxr <= (others => '0');
+		elsif (rising_edge(i_clk)) then
+			w_tip_d <= i_tip;
+			if(w_pickup = '1') then
+				w_wr_msg <= not o_rd;
+			end if;
+			if(i_msg_done = '1') then
+				w_rxr <= i_data;
+			end if;
+		end if;
+	end process; -- track_msg
+
+	w_pickup <= i_tip and not w_tip_d;
+	o_nack <= i_msg_done and w_wr_msg and i_rx_ack;
+
+	o_rd_data <= w_rx_data when (i_fifo_en = '1') else w_rxr;
+	o_cr_done <= w_accept when (i_fifo_en = '1') else w_pickup;
+	o_done <= w_burst_done when (i_fifo_en = '1') else i_msg_done;
+	o_burst <= '0' when (w_state = IDLE) else '1';
+end rtl;
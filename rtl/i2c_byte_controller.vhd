@@ -209,6 +209,9 @@ begin
 							o_tx <= i_ack;
 						end if;
 					when ACK =>
+						--keep driving the ack/nack bit requested for a read
+						--(the bit controller samples it only when it starts the ack symbol)
+						o_tx <= i_ack;
 						if(i_cmd_done = '1') then
 							if(w_stop = '1') then
 								w_state <= STOP;
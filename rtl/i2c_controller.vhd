@@ -3,6 +3,8 @@ use ieee.std_logic_1164.all;
 use ieee.numeric_std.all;
 
 entity i2c_controller is
+	generic(
+		FIFO_DEPTH : natural := 16);
 	port (
 			--system clock and reset
 			i_clk : in std_ulogic;
@@ -11,13 +13,18 @@ entity i2c_controller is
 			--wishbone (slave) interface
 			i_we : in std_ulogic;
 			i_stb : in std_ulogic;
-			i_addr : in std_ulogic_vector(2 downto 0);
+			i_addr : in std_ulogic_vector(3 downto 0);
 			i_data : in std_ulogic_vector(7 downto 0);
 			o_ack : out std_ulogic;
 			o_data : out std_ulogic_vector(7 downto 0);
 
+			--interrupt request (level, active high)
+			o_irq : out std_ulogic;
+
 			--i2c bus
 			io_scl : inout std_ulogic;
+			--scl as resolved on the bus (master, clock-stretching targets, other masters)
+			f_scl : in std_ulogic;
 			f_sda : in std_ulogic;
 			io_sda : inout std_ulogic);
 end i2c_controller;
@@ -36,19 +43,60 @@ architecture rtl of i2c_controller is
 	signal w_sda, w_scl : std_ulogic;
 	signal w_scl_en_n, w_sda_en_n : std_ulogic;
 
+	signal w_fifo_en : std_ulogic;
+	signal w_tx_data, w_reg_rd_data, w_rx_len : std_ulogic_vector(7 downto 0);
+	signal w_tx_push, w_rx_pop : std_ulogic;
+	signal w_tx_level, w_rx_level : std_ulogic_vector(7 downto 0);
+	signal w_desc, w_desc_level : std_ulogic_vector(7 downto 0);
+	signal w_desc_push : std_ulogic;
+	signal w_nack : std_ulogic;
+	signal w_cr_done, w_done, w_burst : std_ulogic;
+
 	signal f_in_transaction : std_ulogic;
 	signal f_is_data_to_tx : std_ulogic;
 begin
-	w_start <= w_cr(7);
-	w_stop <= w_cr(6);
-	w_rd <= w_cr(5);
-	w_wr <= w_cr(4);
-	w_ack_cr <= w_cr(3);
-
 	w_en <= w_ctr(7);
+	w_fifo_en <= w_ctr(6);
 
 	f_in_transaction <= w_cr(5) or w_cr(4);
-	f_is_data_to_tx <= '1' when(i_we = '1' and i_stb = '1' and  i_addr  = "011" and unsigned(i_data) > 15) else '0';
+	f_is_data_to_tx <= '1' when(i_we = '1' and i_stb = '1' and  i_addr  = "0011" and unsigned(i_data) > 15) else '0';
+
+	--command/data of the host registers, directly or through the tx/rx fifos
+	i2c_burst_controller : entity work.i2c_burst_controller(rtl)
+	generic map(
+		FIFO_DEPTH => FIFO_DEPTH)
+	port map(
+		i_clk =>i_clk,
+		i_arstn =>i_arstn,
+
+		i_fifo_en =>w_fifo_en,
+		i_cr =>w_cr,
+		i_txr =>w_txr,
+		i_tx_push =>w_tx_push,
+		i_rx_pop =>w_rx_pop,
+		i_rx_len =>w_rx_len,
+		i_desc_push =>w_desc_push,
+		i_desc =>w_desc,
+		o_cr_done =>w_cr_done,
+		o_done =>w_done,
+		o_burst =>w_burst,
+		o_rd_data =>w_reg_rd_data,
+		o_tx_level =>w_tx_level,
+		o_rx_level =>w_rx_level,
+		o_desc_level =>w_desc_level,
+		o_nack =>w_nack,
+
+		o_start =>w_start,
+		o_stop =>w_stop,
+		o_rd =>w_rd,
+		o_wr =>w_wr,
+		o_ack =>w_ack_cr,
+		o_data =>w_tx_data,
+		i_data =>w_rd_data,
+		i_msg_done =>w_msg_done,
+		i_tip =>w_tip,
+		i_rx_ack =>w_ack,
+		i_al =>w_al);
 
 	i2c_byte_controller : entity work.i2c_byte_controller(rtl)
 	port map(
@@ -59,7 +107,7 @@ begin
 		i_wr =>	w_wr,
 		i_stop =>w_stop,
 		i_ack =>w_ack_cr,
-		i_data =>w_txr,
+		i_data =>w_tx_data,
 		o_data =>w_rd_data,
 
 		i_al =>w_al,
@@ -87,7 +135,7 @@ begin
 		o_al  =>w_al,
 
 		--i2c bus
-		i_scl =>io_scl,
+		i_scl =>f_scl,
 		i_sda =>f_sda,
 		o_scl  =>w_scl,
 		o_sda  =>w_sda,
@@ -102,18 +150,31 @@ begin
 		i_we =>i_we,
 		i_stb => i_stb,
 		i_data =>i_data,
-		i_i2c_rd_data => w_rd_data,
+		i_i2c_rd_data => w_reg_rd_data,
 		o_ack => o_ack,
 		o_data => o_data,
 
 		i_busy =>w_busy,
-		i_done =>w_msg_done,
+		i_done =>w_cr_done,
 		i_al =>w_al,
 		i_ack =>w_ack,
+		i_tx_level =>w_tx_level,
+		i_rx_level =>w_rx_level,
+		i_desc_level =>w_desc_level,
+		i_xfer_done =>w_done,
+		i_nack =>w_nack,
+		i_tip =>w_tip,
+		i_burst =>w_burst,
 
 		o_scl_cycles =>w_clk_cycles,
 		o_txr =>w_txr,
+		o_tx_push =>w_tx_push,
+		o_rx_pop =>w_rx_pop,
+		o_rx_len =>w_rx_len,
+		o_desc =>w_desc,
+		o_desc_push =>w_desc_push,
 		o_ctr =>w_ctr,
+		o_irq =>o_irq,
 		o_cr => w_cr);
 
 	--drive to 1 to avoid issues with cocotb simulation
@@ -0,0 +1,80 @@
+--synchronous first word fall through fifo, used for the tx/rx data of the burst controller.
+--a push when full and a pop when empty are ignored.
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+
+entity i2c_fifo is
+	generic(
+		DEPTH : natural := 16;
+		WIDTH : natural := 8);
+	port (
+			i_clk : in std_ulogic;
+			i_arstn : in std_ulogic;
+			i_clr : in std_ulogic;
+
+			i_push : in std_ulogic;
+			i_data : in std_ulogic_vector(WIDTH -1 downto 0);
+			i_pop : in std_ulogic;
+			o_data : out std_ulogic_vector(WIDTH -1 downto 0);
+
+			o_empty : out std_ulogic;
+			o_full : out std_ulogic;
+			o_level : out std_ulogic_vector(7 downto 0));
+end i2c_fifo;
+
+architecture rtl of i2c_fifo is
+	type t_mem is array (0 to DEPTH -1) of std_ulogic_vector(WIDTH -1 downto 0);
+	signal w_mem : t_mem;
+
+	signal w_wr_ptr, w_rd_ptr : natural range 0 to DEPTH -1;
+	signal w_count : natural range 0 to DEPTH;
+	signal w_push, w_pop : std_ulogic;
+begin
+	assert (DEPTH > 0 and DEPTH < 256) report "i2c_fifo: DEPTH must be 1 to 255" severity failure;
+
+	w_push <= '1' when (i_push = '1' and w_count /= DEPTH) else '0';
+	w_pop <= '1' when (i_pop = '1' and w_count /= 0) else '0';
+
+	manage_fifo : process(i_clk,i_arstn) is
+	begin
+		if(i_arstn = '0') then
+			w_wr_ptr <= 0;
+			w_rd_ptr <= 0;
+			w_count <= 0;
+		elsif (rising_edge(i_clk)) then
+			if(i_clr = '1') then
+				w_wr_ptr <= 0;
+				w_rd_ptr <= 0;
+				w_count <= 0;
+			else
+				if(w_push = '1') then
+					w_mem(w_wr_ptr) <= i_data;
+					if(w_wr_ptr = DEPTH -1) then
+						w_wr_ptr <= 0;
+					else
+						w_wr_ptr <= w_wr_ptr +1;
+					end if;
+				end if;
+				if(w_pop = '1') then
+					if(w_rd_ptr = DEPTH -1) then
+						w_rd_ptr <= 0;
+					else
+						w_rd_ptr <= w_rd_ptr +1;
+					end if;
+				end if;
+				if(w_push = '1' and w_pop = '0') then
+					w_count <= w_count +1;
+				elsif(w_push = '0' and w_pop = '1') then
+					w_count <= w_count -1;
+				end if;
+			end if;
+		end if;
+	end process; -- manage_fifo
+
+	o_data <= w_mem(w_rd_ptr);
+	o_empty <= '1' when (w_count = 0) else '0';
+	o_full <= '1' when (w_count = DEPTH) else '0';
+	o_level <= std_ulogic_vector(to_unsigned(w_count,8));
+end rtl;
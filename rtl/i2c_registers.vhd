@@ -1,5 +1,6 @@
 library ieee;
 use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
 
 entity i2c_registers is
 	port (
@@ -7,7 +8,7 @@ entity i2c_registers is
 			i_arstn : in std_ulogic;
 
 			--wishbone (slave) interface
-			i_addr : in std_ulogic_vector(2 downto 0);
+			i_addr : in std_ulogic_vector(3 downto 0);
 			i_we : in std_ulogic;
 			i_stb : in std_ulogic;
 			i_data : in std_ulogic_vector(7 downto 0);
@@ -20,61 +21,172 @@ entity i2c_registers is
 			i_done : in std_ulogic;
 			i_al : in std_ulogic;
 			i_ack : in std_ulogic;
+			i_tx_level : in std_ulogic_vector(7 downto 0);
+			i_rx_level : in std_ulogic_vector(7 downto 0);
+			i_desc_level : in std_ulogic_vector(7 downto 0);
+			i_xfer_done : in std_ulogic;
+			i_nack : in std_ulogic;
+			i_tip : in std_ulogic;
+			i_burst : in std_ulogic;
 
 			o_scl_cycles : out std_ulogic_vector(15 downto 0);
 			o_txr : out std_ulogic_vector(7 downto 0);
+			o_tx_push : out std_ulogic;
+			o_rx_pop : out std_ulogic;
+			o_rx_len : out std_ulogic_vector(7 downto 0);
+			o_desc : out std_ulogic_vector(7 downto 0);
+			o_desc_push : out std_ulogic;
+			o_irq : out std_ulogic;
 			o_ctr : out std_ulogic_vector(7 downto 0);
 			o_cr : out std_ulogic_vector(7 downto 0));
 end i2c_registers;
 
 architecture rtl of i2c_registers is
+	signal w_tx_thr, w_rx_thr : std_ulogic_vector(7 downto 0);
+	signal w_ier, w_isr, w_flags : std_ulogic_vector(4 downto 0);
+	signal w_status : std_ulogic_vector(7 downto 0);
+	signal w_irq : std_ulogic;
 begin
 	-- 					REGISTER MAP
 
 	-- 			Address 		| 		Functionality
 	--			   0 			|	system clock cycles to make scl (lower byte)
 	--			   1 			|	system clock cycles to make scl (upper byte)
-	--			   2 			|	control transfer register (ctr)
-	--			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0') 
+	--			   2 			|	control transfer register (ctr), bit 7 enable, bit 6 fifo mode
+	--			   3 			|	data transfer register (i_we = '1')/ receive i2c data register (i_we = '0')
+	--						 	|	(push to the tx fifo/pop from the rx fifo in fifo mode)
+	--			   4 			|	command register (cr)
+	--			   5 			|	bytes to read in a fifo mode burst
+	--			   6 			|	tx fifo level (read only)
+	--			   7 			|	rx fifo level (read only)
+	--			   8 			|	tx fifo threshold
+	--			   9 			|	rx fifo threshold
+	--			  10 			|	sequencer descriptor queue, 4 bytes per descriptor (write)/
+	--						 	|	number of queued descriptors (read)
+	--						 	|	address, pointer length, write length, read length
+	--			  11 			|	status (read only)
+	--						 	|	bit 7 RxACK (last ack received, '1' = NACK), bit 6 bus busy,
+	--						 	|	bit 5 arbitration lost (flag), bit 4 tx fifo empty, bit 3 rx fifo not empty,
+	--						 	|	bit 2 burst/descriptor running, bit 1 TIP (transfer in progress), bit 0 irq
+	--			  12 			|	interrupt enable (ier)
+	--			  13 			|	interrupt flags (isr), write '1' to clear
+	--						 	|	bit 0 transfer done (message in direct mode, burst/descriptor in fifo mode),
+	--						 	|	bit 1 arbitration lost, bit 2 NACK to a written address/data byte,
+	--						 	|	bit 3 tx level <= tx threshold, bit 4 rx level >= rx threshold (fifo mode)
 
+	--interrupt sources, a flag stays set until it is cleared and raises o_irq if enabled
+	w_flags(0) <= i_xfer_done;
+	w_flags(1) <= i_al;
+	w_flags(2) <= i_nack;
+	w_flags(3) <= '1' when (o_ctr(6) = '1' and unsigned(i_tx_level) <= unsigned(w_tx_thr)) else '0';
+	w_flags(4) <= '1' when (o_ctr(6) = '1' and unsigned(i_rx_level) /= 0 and unsigned(i_rx_level) >= unsigned(w_rx_thr)) else '0';
+
+	w_irq <= '1' when ((w_isr and w_ier) /= "00000") else '0';
+	o_irq <= w_irq;
+
+	w_status(7) <= i_ack;
+	w_status(6) <= i_busy;
+	w_status(5) <= w_isr(1);
+	w_status(4) <= '1' when (unsigned(i_tx_level) = 0) else '0';
+	w_status(3) <= '1' when (unsigned(i_rx_level) /= 0) else '0';
+	w_status(2) <= i_burst;
+	w_status(1) <= i_tip;
+	w_status(0) <= w_irq;
+
+	--the rx fifo pops with the read of its head
+	o_rx_pop <= '1' when (i_stb = '1' and i_we = '0' and i_addr = "0011") else '0';
 
 	fill_regs : process(i_clk,i_arstn) is
 	begin
 		if(i_arstn = '0') then
 			o_scl_cycles <= (others => '1');
 			o_txr <= (others => '0');
+			o_tx_push <= '0';
+			o_rx_len <= (others => '0');
+			o_desc <= (others => '0');
+			o_desc_push <= '0';
 			o_ctr <= (others => '0');
 			o_cr <= (others => '0');
 			o_ack <= '0';
+			w_tx_thr <= (others => '0');
+			w_rx_thr <= (others => '0');
+			w_ier <= (others => '0');
+			w_isr <= (others => '0');
 		elsif (rising_edge(i_clk)) then
 			o_ack <= '0';
+			o_tx_push <= '0';
+			o_desc_push <= '0';
+
+			--the command is cleared once the controller has taken it (message picked up by the
+			--byte controller or burst accepted), unless it is written again in the same cycle
+			if(i_done ='1' or i_al = '1') then
+				o_cr(7 downto 4) <= "0000";
+			end if;
+
+			if(i_stb = '1' and i_we = '1' and i_addr = "1101") then
+				w_isr <= (w_isr and not i_data(4 downto 0)) or w_flags;
+			else
+				w_isr <= w_isr or w_flags;
+			end if;
 
 			if(i_stb = '1' and i_we = '1') then
 				o_ack <= '1';
-				if(o_ctr(7) = '1' and i_addr = "100") then
+				if(o_ctr(7) = '1' and i_addr = "0100") then
 					o_cr <= i_data;
 				end if;
-				case i_addr is 
-					when "000" => 
+				case i_addr is
+					when "0000" =>
 						o_scl_cycles(7 downto 0) <= i_data;
-					when "001" =>
+					when "0001" =>
 						o_scl_cycles(15 downto 8) <= i_data;
-					when "010" =>
+					when "0010" =>
 						o_ctr <= i_data;
-					when "011" =>
+					when "0011" =>
 						o_txr <= i_data;
+						o_tx_push <= '1';
+					when "0101" =>
+						o_rx_len <= i_data;
+					when "1000" =>
+						w_tx_thr <= i_data;
+					when "1001" =>
+						w_rx_thr <= i_data;
+					when "1010" =>
+						o_desc <= i_data;
+						o_desc_push <= '1';
+					when "1100" =>
+						w_ier <= i_data(4 downto 0);
 					when others =>
 						null;
-				end case; 
-			elsif(i_stb = '1' and i_we = '0' and i_addr = "011") then
+				end case;
+			elsif(i_stb = '1' and i_we = '0') then
 				o_ack <= '1';
-				o_data <= i_i2c_rd_data;
+				case i_addr is
+					when "0011" =>
+						o_data <= i_i2c_rd_data;
+					when "0101" =>
+						o_data <= o_rx_len;
+					when "0110" =>
+						o_data <= i_tx_level;
+					when "0111" =>
+						o_data <= i_rx_level;
+					when "1000" =>
+						o_data <= w_tx_thr;
+					when "1001" =>
+						o_data <= w_rx_thr;
+					when "1010" =>
+						o_data <= i_desc_level;
+					when "1011" =>
+						o_data <= w_status;
+					when "1100" =>
+						o_data <= "000" & w_ier;
+					when "1101" =>
+						o_data <= "000" & w_isr;
+					when others =>
+						o_data <= (others => '0');
+				end case;
 			else
-				if(i_done ='1' or i_al = '1') then
-					o_cr(7 downto 4) <= "0000";
-				end if;
 				o_cr(2 downto 0) <= "000";
 			end if;
 		end if;
 	end process; -- fill_regs
-end rtl;
\ No newline at end of file
+end rtl;
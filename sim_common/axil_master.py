@@ -0,0 +1,152 @@
+"""Pipelined AXI4-Lite master.
+
+the AW, W and AR channels each have their own queue and present a new beat in the
+cycle right after the previous one was accepted, so any number of transactions can be
+outstanding and the slave alone decides the throughput. BREADY and RREADY are held
+high. the driver only runs while there is traffic, an idle bus costs no callbacks.
+"""
+
+from collections import deque
+
+import cocotb
+from cocotb.triggers import Event, FallingEdge, RisingEdge
+
+from profiler import profiled
+
+
+class AxiLiteMaster:
+
+    def __init__(self, dut, clk=None, prefix="S_AXI_"):
+        self.dut = dut
+        self.clk = clk if clk is not None else getattr(dut, prefix + "ACLK")
+        for name in ("AWVALID", "AWREADY", "AWADDR", "WVALID", "WREADY", "WDATA", "WSTRB",
+                     "BVALID", "BREADY", "ARVALID", "ARREADY", "ARADDR", "RVALID", "RREADY",
+                     "RDATA"):
+            setattr(self, "_" + name.lower(), getattr(dut, prefix + name))
+        self._awvalid.value = 0
+        self._wvalid.value = 0
+        self._arvalid.value = 0
+        self._bready.value = 1
+        self._rready.value = 1
+        self._wstrb.value = 2**len(self._wstrb) - 1
+        for name in ("AWPROT", "ARPROT"):
+            if hasattr(dut, prefix + name):
+                getattr(dut, prefix + name).value = 0
+
+        self.writes = 0     # completed transactions
+        self.reads = 0
+
+        self._aw_queue = deque()
+        self._w_queue = deque()
+        self._ar_queue = deque()
+        self._b_pending = deque()   # events of the writes waiting for their response
+        self._r_pending = deque()   # events of the reads waiting for their data
+        self._aw = self._w = self._ar = None    # beats on the bus
+        self._wake = Event()
+        self._b_wake = Event()
+        self._tasks = [cocotb.start_soon(self._run()), cocotb.start_soon(self._run_b())]
+
+    def stop(self):
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+
+    # ------------------------------------------------------------------ api
+    def write_nowait(self, addr, data):
+        """Queue a write, returns an event set (with the response) when it completes."""
+        done = Event()
+        self._aw_queue.append(addr)
+        self._w_queue.append(data)
+        self._b_pending.append(done)
+        self._wake.set()
+        self._b_wake.set()
+        return done
+
+    def read_nowait(self, addr):
+        """Queue a read, returns an event set (with the data) when it completes."""
+        done = Event()
+        self._ar_queue.append(addr)
+        self._r_pending.append(done)
+        self._wake.set()
+        return done
+
+    async def write(self, addr, data):
+        done = self.write_nowait(addr, data)
+        await done.wait()
+
+    async def read(self, addr):
+        done = self.read_nowait(addr)
+        await done.wait()
+        return done.data
+
+    async def burst_write(self, writes):
+        """Issue all the (addr, data) writes back to back and wait for all of them."""
+        events = [self.write_nowait(addr, data) for addr, data in writes]
+        for done in events:
+            await done.wait()
+
+    async def burst_read(self, addrs):
+        """Issue all the reads back to back, returns the data read."""
+        events = [self.read_nowait(addr) for addr in addrs]
+        data = []
+        for done in events:
+            await done.wait()
+            data.append(done.data)
+        return data
+
+    # -------------------------------------------------------------- channels
+    def _busy(self):
+        return (self._aw is not None or self._w is not None or self._ar is not None
+                or self._aw_queue or self._w_queue or self._ar_queue or self._r_pending)
+
+    def _present(self):
+        if self._aw is None and self._aw_queue:
+            self._aw = self._aw_queue.popleft()
+            self._awaddr.value = self._aw
+        self._awvalid.value = self._aw is not None
+        if self._w is None and self._w_queue:
+            self._w = self._w_queue.popleft()
+            self._wdata.value = self._w
+        self._wvalid.value = self._w is not None
+        if self._ar is None and self._ar_queue:
+            self._ar = self._ar_queue.popleft()
+            self._araddr.value = self._ar
+        self._arvalid.value = self._ar is not None
+
+    @profiled
+    async def _run(self):
+        edge = RisingEdge(self.clk)
+        while True:
+            self._present()
+            if not self._busy():
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            await edge
+            # handshakes of this edge (values from before the edge)
+            if self._aw is not None and self._awready.value:
+                self._aw = None
+            if self._w is not None and self._wready.value:
+                self._w = None
+            if self._ar is not None and self._arready.value:
+                self._ar = None
+            if self._r_pending and self._rvalid.value:
+                done = self._r_pending.popleft()
+                self.reads += 1
+                done.set(int(self._rdata.value))
+
+    @profiled
+    async def _run_b(self):
+        # responses are sampled on the falling edge, so that a BVALID that only stays
+        # high for half a cycle is seen too; with BREADY held high every falling edge
+        # with BVALID high is followed by a handshake on the next rising edge
+        edge = FallingEdge(self.clk)
+        while True:
+            if not self._b_pending:
+                self._b_wake.clear()
+                await self._b_wake.wait()
+            await edge
+            if self._b_pending and self._bvalid.value:
+                done = self._b_pending.popleft()
+                self.writes += 1
+                done.set(0)
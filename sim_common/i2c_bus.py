@@ -0,0 +1,404 @@
+"""Pin-level i2c bus model shared by the testbenches.
+
+the model only looks at the bus pins of the controller (io_scl/io_sda) and answers
+through f_scl/f_sda, the serial clock and data lines as seen by the master. both are
+resolved as the wired-AND of every device on the bus: the controller, the targets
+(a target can stretch scl after every byte) and other masters (I2cMaster). it never
+waits on the system clock, so it costs a couple of simulator callbacks per scl bit
+instead of one per system clock. the frames it answered are kept in transactions
+(I2cTransaction, as decoded by I2cMonitor), for coverage without a monitor of its own
+on the bus.
+"""
+
+import random
+
+import cocotb
+from cocotb.triggers import Edge, Event, First, Timer
+from cocotb.utils import get_sim_time
+
+from i2c_monitor import I2cTransaction
+from profiler import profiled
+
+
+class I2cTarget:
+    """Memory-backed i2c target (slave) device.
+
+    the first byte written after the address is the register pointer
+    (pointer_size bytes, msbyte first), every following byte is stored at the pointer.
+    reads return the byte at the pointer. the pointer auto-increments after every
+    data byte and wraps around the memory.
+    stretch=(lo, hi) holds scl low for a random lo..hi ns after every byte (address
+    included) the target takes part in, as a slow device does.
+    """
+
+    def __init__(self, address, size=256, pointer_size=1, stretch=None):
+        self.address = address
+        self.mem = bytearray(size)
+        self.pointer = 0
+        self.pointer_size = pointer_size
+        self.stretch = stretch
+        self._pointer_bytes = 0
+
+    def stretch_ns(self):
+        return random.randint(*self.stretch) if self.stretch else 0
+
+    def begin(self, read):
+        # called once the target is addressed; a write always starts with the pointer
+        self._pointer_bytes = 0 if read else self.pointer_size
+
+    def write(self, value):
+        """Handle a byte written by the master, return True to ACK it."""
+        if self._pointer_bytes:
+            self._pointer_bytes -= 1
+            if self._pointer_bytes == self.pointer_size - 1:
+                self.pointer = value
+            else:
+                self.pointer = (self.pointer << 8) | value
+            if not self._pointer_bytes:
+                self.pointer %= len(self.mem)
+        else:
+            self.mem[self.pointer] = value
+            self.pointer = (self.pointer + 1) % len(self.mem)
+        return True
+
+    def read(self):
+        value = self.mem[self.pointer]
+        self.pointer = (self.pointer + 1) % len(self.mem)
+        return value
+
+
+class I2cBus:
+    """Edge-triggered model of the i2c bus with any number of targets.
+
+    every START the bus decodes the address byte and hands the rest of the frame to
+    the target with that address; addresses without a target are NACKed.
+    f_scl/f_sda are resolved as the wired-AND of the master (io_scl/io_sda), the
+    targets and the other masters (drive()), so the master also observes its own
+    START/STOP symbols and written bits on the bus, clock stretching and the bits of
+    a master it competes with. scl/sda are the resolved levels.
+    """
+
+    def __init__(self, dut, targets=()):
+        self.dut = dut
+        self.targets = {}
+        for target in targets:
+            self.add_target(target)
+
+        # number of times the model was woken up by the simulator
+        self.wakeups = 0
+        self.transactions = []
+        self._frame = None
+        self.busy = False           # between a START and a STOP
+        self.stretches = 0          # scl stretched by a target, times and total ns
+        self.stretch_ns = 0
+
+        self._scl = dut.io_scl
+        self._sda = dut.io_sda
+        self._f_scl = dut.f_scl
+        self._f_sda = dut.f_sda
+        self.scl = None
+        self.sda = None
+        self._drive = 1             # sda of the targets
+        self._scl_drive = 1         # scl of the targets (stretching)
+        self._others = {}           # other masters: device -> (scl, sda)
+        self._masters = set()       # masters that drove scl in the current frame
+        self._changed = None
+        self._tasks = []
+        self._release = None
+
+        self._target = None         # target addressed in the current frame
+        self._addr_phase = False    # first byte after (repeated) START
+        self._reading = False
+        self._bit = 0               # scl rising edges seen in the current byte (9 = ack)
+        self._shift = 0
+        self._tx = 0xff
+        self._nack = 1
+        self._sending = False       # a byte of the target is on the bus (reads)
+
+    def add_target(self, target):
+        self.targets[target.address] = target
+        return target
+
+    def start(self):
+        self.scl = self.sda = None
+        self._update()
+        self._tasks = [cocotb.start_soon(self._scl_edges()),
+                       cocotb.start_soon(self._sda_edges())]
+
+    def stop(self):
+        for task in self._tasks + ([self._release] if self._release else []):
+            task.kill()
+        self._tasks = []
+        self._release = None
+        self._scl_drive = 1
+        self._set_drive(1)
+
+    # ------------------------------------------------------------------ bus
+    def drive(self, device, scl, sda):
+        """Levels driven by another master (1 releases the line)."""
+        self._others[device] = (scl, sda)
+        self._update()
+
+    def changed(self):
+        """Trigger that fires on the next change of scl or sda."""
+        if self._changed is None:
+            self._changed = Event()
+        return self._changed.wait()
+
+    async def wait_for(self, condition, timeout_ns=None):
+        """Wait until condition() holds on the bus, returns False on timeout."""
+        end = None if timeout_ns is None else get_sim_time(units="ns") + timeout_ns
+        while not condition():
+            if end is None:
+                await self.changed()
+                continue
+            left = end - get_sim_time(units="ns")
+            if left <= 0:
+                return False
+            await First(Timer(left, units="ns"), self.changed())
+        return True
+
+    def _update(self):
+        dut_scl = int(self._scl.value)
+        scl = dut_scl & self._scl_drive
+        sda = int(self._sda.value) & self._drive
+        for device, (device_scl, device_sda) in self._others.items():
+            scl &= device_scl
+            sda &= device_sda
+            if self.busy and not device_scl:
+                self._masters.add(device)
+        if self.busy and not dut_scl:
+            self._masters.add("dut")
+        old_scl, old_sda = self.scl, self.sda
+        if scl == old_scl and sda == old_sda:
+            return
+        self.scl, self.sda = scl, sda
+        if scl != old_scl:
+            self._f_scl.value = scl
+        if sda != old_sda:
+            self._f_sda.value = sda
+        if old_scl is not None:
+            # sda changing while scl is high is a START (falling) or STOP (rising)
+            if sda != old_sda and scl and old_scl:
+                if sda:
+                    self._on_stop()
+                else:
+                    self._on_start()
+            if scl != old_scl:
+                if scl:
+                    self._on_rise()
+                else:
+                    self._on_fall()
+        if self._changed is not None:
+            event, self._changed = self._changed, None
+            event.set()
+
+    def _set_drive(self, value):
+        if value != self._drive:
+            self._drive = value
+            self._update()
+
+    def _stretch(self, ns):
+        # hold scl low, the byte is done on the falling edge
+        self.stretches += 1
+        self.stretch_ns += ns
+        if self._frame is not None:
+            self._frame.stretched = True
+        self._scl_drive = 0
+        self._release = cocotb.start_soon(self._release_scl(ns))
+
+    async def _release_scl(self, ns):
+        await Timer(ns, units="ns")
+        self._release = None
+        self._scl_drive = 1
+        self._update()
+
+    @profiled
+    async def _scl_edges(self):
+        scl = self._scl
+        while True:
+            await Edge(scl)
+            self.wakeups += 1
+            self._update()
+
+    @profiled
+    async def _sda_edges(self):
+        sda = self._sda
+        while True:
+            await Edge(sda)
+            self.wakeups += 1
+            self._update()
+
+    # ------------------------------------------------------------- protocol
+    def _on_start(self):
+        now = get_sim_time(units="ns")
+        if self._frame is not None:
+            self._frame.end = now
+        self._frame = I2cTransaction(now, repeated=self._frame is not None)
+        self.transactions.append(self._frame)
+        self.busy = True
+        self._masters = set()
+        self._addr_phase = True
+        self._target = None
+        self._reading = False
+        self._sending = False
+        self._bit = 0
+        self._shift = 0
+        self._set_drive(1)
+
+    def _on_stop(self):
+        if self._frame is not None:
+            self._frame.end = get_sim_time(units="ns")
+            self._frame.stop = True
+            self._frame = None
+        self.busy = False
+        self._addr_phase = False
+        self._target = None
+        self._reading = False
+        self._sending = False
+        self._set_drive(1)
+
+    def _on_rise(self):
+        if not (self._addr_phase or self._target):
+            return
+        if self._bit < 8:
+            self._shift = ((self._shift << 1) | self.sda) & 0xff
+            self._bit += 1
+        elif self._bit == 8:
+            # ack slot, driven by the master when it reads from a target
+            self._nack = self.sda
+            self._bit = 9
+
+    def _on_fall(self):
+        if len(self._masters) > 1 and self._frame is not None:
+            # two masters clocked this frame, one of them lost the arbitration
+            self._frame.arbitration = True
+        if not (self._addr_phase or self._target):
+            return
+        if self._bit == 8:
+            if self._addr_phase:
+                self._addr_phase = False
+                self._target = self.targets.get(self._shift >> 1)
+                self._reading = bool(self._shift & 1)
+                if self._target:
+                    self._target.begin(self._reading)
+                if self._frame is not None:
+                    self._frame.address, self._frame.read = self._shift >> 1, self._reading
+                    self._frame.addr_ack = bool(self._target)
+                self._set_drive(0 if self._target else 1)
+            elif self._reading:
+                # leave the ack slot to the master
+                self._set_drive(1)
+            else:
+                ack = self._target.write(self._shift)
+                if self._frame is not None:
+                    self._frame.data.append(self._shift)
+                    self._frame.acks.append(bool(ack))
+                self._set_drive(0 if ack else 1)
+            if self._target and self._target.stretch:
+                self._stretch(self._target.stretch_ns())
+        elif self._bit == 9:
+            self._bit = 0
+            self._shift = 0
+            if self._sending and self._frame is not None:
+                self._frame.data.append(self._tx)
+                self._frame.acks.append(self._nack == 0)
+            if self._reading and self._nack == 0:
+                self._tx = self._target.read()
+                self._sending = True
+                self._set_drive((self._tx >> 7) & 1)
+            else:
+                if self._reading:
+                    # master nacked, wait for STOP or repeated START
+                    self._target = None
+                    self._reading = False
+                self._sending = False
+                self._set_drive(1)
+        elif self._reading:
+            self._set_drive((self._tx >> (7 - self._bit)) & 1)
+
+
+class I2cMaster:
+    """Second master on the bus, bit-banged open-drain through I2cBus.drive.
+
+    scl is synchronised with the other masters as in the i2c specification: a low phase
+    lasts at least low_ns (longer while another device holds scl low), a high phase ends
+    after high_ns or as soon as another device pulls scl low. every bit sent is checked
+    against the bus, a master that releases sda and reads it low lost the arbitration:
+    it releases the bus, waits for the STOP of the winner and starts over.
+    """
+
+    def __init__(self, bus, low_ns=700, high_ns=500):
+        self.bus = bus
+        self.low_ns = low_ns
+        self.high_ns = high_ns
+        self.frames = 0
+        self.lost = 0               # arbitrations lost
+        self.retry_ns = []          # arbitration lost to the START of the retry
+        self._scl = 1
+        self._sda = 1
+        bus.drive(self, 1, 1)
+
+    def _set(self, scl=None, sda=None):
+        self._scl = self._scl if scl is None else scl
+        self._sda = self._sda if sda is None else sda
+        self.bus.drive(self, self._scl, self._sda)
+
+    async def _bit(self, value):
+        # one scl cycle with value on sda, returns the level of sda on the bus
+        bus = self.bus
+        self._set(scl=0)
+        await Timer(self.low_ns // 2, units="ns")
+        self._set(sda=value)
+        await Timer(self.low_ns - self.low_ns // 2, units="ns")
+        self._set(scl=1)
+        await bus.wait_for(lambda: bus.scl)
+        level = bus.sda
+        await bus.wait_for(lambda: not bus.scl, self.high_ns)
+        return level
+
+    async def _byte(self, value):
+        # None if the arbitration was lost, else True if the byte was acknowledged
+        for i in range(7, -1, -1):
+            bit = (value >> i) & 1
+            if await self._bit(bit) != bit:
+                return None
+        return not await self._bit(1)
+
+    async def _stop(self):
+        bus = self.bus
+        self._set(scl=0)
+        await Timer(self.low_ns // 2, units="ns")
+        self._set(sda=0)
+        await Timer(self.low_ns - self.low_ns // 2, units="ns")
+        self._set(scl=1)
+        await bus.wait_for(lambda: bus.scl)
+        await Timer(self.high_ns, units="ns")
+        self._set(sda=1)
+
+    async def write(self, address, data):
+        """Write data to the target at address once the bus is free, retried until the
+        arbitration is won. returns True if every byte was acknowledged."""
+        bus = self.bus
+        lost_at = None
+        while True:
+            await bus.wait_for(lambda: not bus.busy and bus.scl and bus.sda)
+            if lost_at is not None:
+                self.retry_ns.append(get_sim_time(units="ns") - lost_at)
+            self._set(sda=0)
+            # hold the START long enough for a master that started along with us to
+            # finish its START symbol (it pulls scl low first then)
+            await bus.wait_for(lambda: not bus.scl, 2 * (self.low_ns + self.high_ns))
+            ack = True
+            for byte in [address << 1] + list(data):
+                ack = await self._byte(byte)
+                if not ack:
+                    break
+            if ack is None:
+                self.lost += 1
+                lost_at = get_sim_time(units="ns")
+                self._set(scl=1, sda=1)
+                continue
+            await self._stop()
+            self.frames += 1
+            return ack
@@ -0,0 +1,192 @@
+"""Register-level host of the i2c controller, shared by the testbenches of both tops.
+
+I2cHost runs the programming sequences of the core (setup, one command per byte
+transfers, fifo mode bursts, sequencer descriptors, interrupt handling) over a
+register port, anything with
+
+    await write(addr, data)
+    await read(addr)
+    await burst_write([(addr, data), ...])
+    await burst_read([addr, ...])
+
+StrobeRegisters is the port of i2c_controller (i_stb/i_we/i_addr/i_data, o_data),
+AxiLiteMaster (axil_master.py) the one of i2c_controller_axi.
+"""
+
+from cocotb.triggers import ClockCycles, RisingEdge
+from cocotb.utils import get_sim_time
+
+
+class StrobeRegisters:
+    """Register port of i2c_controller: one access per strobe of a clock."""
+
+    def __init__(self, dut, clk=None):
+        self.dut = dut
+        self.clk = clk if clk is not None else dut.i_clk
+
+    async def write(self, addr, data):
+        dut = self.dut
+        dut.i_addr.value = addr
+        dut.i_stb.value = 1
+        dut.i_we.value = 1
+        dut.i_data.value = data
+        await RisingEdge(self.clk)
+        dut.i_stb.value = 0
+        dut.i_we.value = 0
+
+    async def read(self, addr):
+        dut = self.dut
+        dut.i_addr.value = addr
+        dut.i_stb.value = 1
+        dut.i_we.value = 0
+        await RisingEdge(self.clk)
+        dut.i_stb.value = 0
+        await RisingEdge(self.clk)
+        return int(dut.o_data.value)
+
+    async def burst_write(self, writes):
+        for addr, data in writes:
+            await self.write(addr, data)
+
+    async def burst_read(self, addrs):
+        return [await self.read(addr) for addr in addrs]
+
+
+class I2cHost:
+    """Programming sequences of the core over a register port.
+
+    latency is the clocks the host takes to react to a completion (interrupt/polling
+    latency), a new host (one per test) starts with none.
+
+    register map: 0/1 scl clock cycles (lsbyte/msbyte), 2 ctr (bit 7 enable, bit 6 fifo
+    mode), 3 txr/rxr, 4 cr, 5 bytes to read in a fifo burst, 6/7 tx/rx fifo level, 8/9
+    tx/rx fifo threshold, 10 sequencer descriptors, 11 status, 12/13 interrupt
+    enable/flags.
+    """
+
+    def __init__(self, dut, regs, clk):
+        self.dut = dut
+        self.regs = regs
+        self.clk = clk
+        self.latency = 0
+
+    async def write_reg(self, addr, data):
+        await self.regs.write(addr, data)
+
+    async def read_reg(self, addr):
+        return (await self.regs.read(addr)) & 255        # o_data/RDATA(7:0)
+
+    async def delay(self):
+        if self.latency:
+            await ClockCycles(self.clk, self.latency)
+
+    async def wait_irq(self):
+        """Sleep until the core raises its interrupt, then read and clear the interrupt flags"""
+        if not self.dut.o_irq.value:
+            await RisingEdge(self.dut.o_irq)
+        flags = await self.read_reg(13)
+        await self.write_reg(13, flags)
+        return flags
+
+    async def issue_cmd(self, cmd):
+        """Write cr and wait for the command to be done, returns the interrupt flags"""
+        # the command bits are cleared by the core once the byte controller has picked them up
+        await self.write_reg(4, cmd)
+        flags = await self.wait_irq()
+        await self.delay()
+        return flags
+
+    async def setup_core(self, scl_cycles=20):
+        await self.write_reg(0, scl_cycles & 255)   # lsbyte of scl clock cycles (e.g Fsys = 100 MHz Fi2c = 1MHz, F = 100/(5*1) = 20)
+        await self.write_reg(1, scl_cycles >> 8)    # msbyte of scl clock cycles
+        await self.write_reg(2, 128)                # enable the core (wen for bit_controller) (x80)
+        await self.write_reg(12, 3)                 # interrupt on transfer done and arbitration lost
+
+    async def i2c_write(self, address, pointer, payload):
+        await self.write_reg(3, address << 1)       # 7 bit address, '0' (write to slave)
+        await self.issue_cmd(144)                   # (x90) START condition, WRITE condition
+        await self.write_reg(3, pointer)            # set in-slave register/memory address
+        await self.issue_cmd(16 if payload else 80)
+        for i, byte in enumerate(payload):
+            await self.write_reg(3, byte)
+            await self.issue_cmd(80 if i == len(payload)-1 else 16)     # (x50) WRITE, STOP / (x10) WRITE
+
+    async def i2c_read(self, address, pointer, length):
+        await self.write_reg(3, address << 1)
+        await self.issue_cmd(144)                   # (x90) START condition, WRITE condition
+        await self.write_reg(3, pointer)
+        await self.issue_cmd(16)                    # (x10) WRITE condition
+        await self.write_reg(3, (address << 1) | 1)     # 7 bit address, '1' (read from slave)
+        await self.issue_cmd(144)                   # (x90) repeated START condition, WRITE condition
+        data = []
+        for i in range(length):
+            await self.issue_cmd(104 if i == length-1 else 32)     # (x68) READ, NACK, STOP / (x20) READ, ACK
+            data.append(await self.read_reg(3))
+        return data
+
+    async def fifo_write(self, address, pointer, payload):
+        """Write transaction as a single fifo mode burst (address, pointer and payload must fit the tx fifo)"""
+        await self.regs.burst_write([(3, byte) for byte in [address << 1, pointer] + payload])
+        await self.write_reg(4, 208)                # (xd0) START condition, WRITE the tx fifo, STOP condition
+        await self.wait_irq()
+        await self.delay()
+
+    async def fifo_read(self, address, pointer, length):
+        """Pointer write and repeated START read of length bytes as two fifo mode bursts"""
+        await self.write_reg(3, address << 1)
+        await self.write_reg(3, pointer)
+        await self.write_reg(4, 144)                # (x90) START condition, WRITE the tx fifo
+        await self.wait_irq()
+        await self.delay()
+        await self.write_reg(3, (address << 1) | 1)
+        await self.write_reg(5, length)             # bytes to read
+        await self.write_reg(4, 248)                # (xf8) repeated START, WRITE the tx fifo, READ length bytes, NACK the last one, STOP
+        await self.wait_irq()
+        await self.delay()
+        return [x & 255 for x in await self.regs.burst_read([3]*length)]
+
+    async def seq_transfer(self, address, pointer, payload, length):
+        """Register transaction run by the command sequencer (fifo mode): write the pointer and payload,
+        then read length bytes after a repeated START. pointer and payload must fit the tx fifo"""
+        # descriptor: address, pointer length, write length, read length
+        await self.regs.burst_write([(3, byte) for byte in pointer + payload]
+                                    + [(10, byte) for byte in (address, len(pointer), len(payload), length)])
+        await self.wait_irq()
+        await self.delay()
+        return [x & 255 for x in await self.regs.burst_read([3]*length)]
+
+    async def probe(self, address):
+        """Address a device and return True if it acknowledged"""
+        await self.write_reg(3, address << 1)
+        await self.issue_cmd(208)                   # (xd0) START condition, WRITE condition, STOP condition
+        return not (await self.read_reg(11)) & 128  # RxACK of the status register
+
+    async def wait_bus_free(self):
+        """Poll the busy bit of the status register until the bus is free (STOP of the master that owns it)"""
+        while (await self.read_reg(11)) & 64:
+            await ClockCycles(self.clk, 10)
+
+    async def i2c_write_arb(self, address, pointer, payload, recovery):
+        """i2c_write on a multi-master bus: when the core loses the arbitration it releases the bus, the
+        host waits for the bus to be free and starts over. the recovery times (ns) of every lost
+        arbitration go to recovery: lost_to_free, free_to_retry and lost_to_retry (AL seen by the host
+        to the START command of the retry)"""
+        frame = [(address << 1, 144), (pointer, 16 if payload else 80)]
+        frame += [(byte, 80 if i == len(payload)-1 else 16) for i, byte in enumerate(payload)]
+        lost = free = None
+        while True:
+            for byte, cmd in frame:
+                await self.write_reg(3, byte)
+                if lost is not None:
+                    now = get_sim_time(units="ns")
+                    recovery["free_to_retry"].append(now - free)
+                    recovery["lost_to_retry"].append(now - lost)
+                    lost = None
+                if (await self.issue_cmd(cmd)) & 2:     # AL interrupt flag
+                    lost = get_sim_time(units="ns")
+                    break
+            else:
+                return
+            await self.wait_bus_free()
+            free = get_sim_time(units="ns")
+            recovery["lost_to_free"].append(free - lost)
@@ -0,0 +1,429 @@
+"""Python reference model of the i2c master core (i2c_byte_controller + i2c_bit_controller).
+
+the model can be used in two ways:
+- cycle-accurate: I2cCoreModel.step() evaluates one rising edge of i_clk with the same
+  register semantics as the rtl (every register is updated from the values before the
+  edge). Lockstep runs it next to the dut and reports every cycle where the bus pins,
+  o_cmd_done, o_busy, o_al, o_msg_done ... of the two differ.
+- transaction-level: message_ticks()/message_cycles() give the duration of whole
+  messages directly from the structure of the fsms, vectorised with NumPy, for
+  throughput what-if studies without a simulator.
+
+the register block is not modelled, the model takes the command (cr), transmit (txr)
+and control (ctr) registers and the scl divider as inputs.
+"""
+
+import numpy as np
+
+from profiler import profiled
+
+CMD_NOP = 0
+CMD_START = 1
+CMD_STOP = 2
+CMD_WRITE = 4
+CMD_READ = 8
+
+# cr fields
+CR_START = 0x80
+CR_STOP = 0x40
+CR_READ = 0x20
+CR_WRITE = 0x10
+CR_ACK = 0x08
+
+(IDLE, START1, START2, START3, START4, START5, STOP1, STOP2, STOP3, STOP4,
+ READ1, READ2, READ3, READ4, WRITE1, WRITE2, WRITE3, WRITE4) = range(18)
+
+BIT_STATES = ("IDLE", "START1", "START2", "START3", "START4", "START5",
+              "STOP1", "STOP2", "STOP3", "STOP4", "READ1", "READ2", "READ3", "READ4",
+              "WRITE1", "WRITE2", "WRITE3", "WRITE4")
+
+_CMD_STATE = {CMD_START: START1, CMD_STOP: STOP1, CMD_READ: READ1, CMD_WRITE: WRITE1}
+
+_KEEP = -1      # leave the output unchanged
+_RX = 2         # drive sda with the bit to transmit
+
+# state -> (next state, scl_en_n, sda_en_n, sda_check, cmd_done), see gen_scl_sda
+_BIT_STEPS = {
+    START1: (START2, _KEEP, 1, 0, 0),
+    START2: (START3, 1, _KEEP, 0, 0),
+    START3: (START4, _KEEP, 0, 0, 0),
+    START4: (START5, 1, _KEEP, 0, 0),
+    START5: (IDLE, 0, _KEEP, 0, 1),
+    STOP1: (STOP2, 0, 0, 0, 0),
+    STOP2: (STOP3, 1, _KEEP, 0, 0),
+    STOP3: (STOP4, _KEEP, _KEEP, 0, 0),
+    STOP4: (IDLE, _KEEP, 1, 0, 1),
+    READ1: (READ2, 0, 1, 0, 0),
+    READ2: (READ3, 1, _KEEP, 0, 0),
+    READ3: (READ4, 1, _KEEP, 0, 0),
+    READ4: (IDLE, 0, _KEEP, 0, 1),
+    WRITE1: (WRITE2, 0, _RX, 0, 0),
+    WRITE2: (WRITE3, 1, _KEEP, 1, 0),
+    WRITE3: (WRITE4, 1, _KEEP, 1, 0),
+    WRITE4: (IDLE, 0, _KEEP, 0, 1),
+}
+
+
+class BitControllerModel:
+    """Cycle-accurate model of i2c_bit_controller."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # register_inputs / delayed_scl_en
+        self.scl = self.sda = self.scl_r = self.sda_r = 1
+        self.scl_en_n_r = 0
+        # gen_scl
+        self.scl_cnt = 0
+        self.edge_rdy = 1
+        # detect_start_stop / identifier / arbitration
+        self.start = self.stop = 0
+        self.busy = 0
+        self.stop_issued_r = 0
+        self.al = 0
+        # gen_scl_sda
+        self.state = IDLE
+        self.scl_en_n = 1
+        self.sda_en_n = 1
+        self.cmd_done = 0
+        self.sda_check = 0
+        self.stop_issued = 0
+        # tx_sda (not reset in the rtl)
+        self.tx = 0
+
+    @property
+    def io_scl(self):
+        return 0 if self.scl_en_n == 0 else 1
+
+    @property
+    def io_sda(self):
+        return 0 if self.sda_en_n == 0 else 1
+
+    @property
+    def wait(self):
+        return self.scl_en_n_r & (self.scl ^ 1)
+
+    def step(self, rx, scl_cycles, en, cmd, scl_in, sda_in):
+        # gen_scl
+        if self.scl_cnt == (scl_cycles - 1) & 0xffff or not en:
+            scl_cnt, edge_rdy = 0, 1
+        elif self.wait:
+            scl_cnt, edge_rdy = self.scl_cnt, 0
+        else:
+            scl_cnt, edge_rdy = (self.scl_cnt + 1) & 0xffff, 0
+
+        start = (self.sda ^ 1) & self.sda_r & self.scl
+        stop = self.sda & (self.sda_r ^ 1) & self.scl
+        busy = (self.start | self.busy) & (self.stop ^ 1)
+        stop_issued_r = int(cmd == CMD_STOP)
+        al = int((self.sda_check and self.sda == 0 and self.sda_en_n == 1)
+                 or (self.state != IDLE and not self.stop_issued and self.stop))
+
+        # gen_scl_sda
+        state, scl_en_n, sda_en_n = self.state, self.scl_en_n, self.sda_en_n
+        stop_issued = self.stop_issued
+        cmd_done = sda_check = 0
+        if self.al:
+            state, scl_en_n, sda_en_n, stop_issued = IDLE, 1, 1, 0
+        elif self.edge_rdy:
+            if state == IDLE:
+                state = _CMD_STATE.get(cmd, IDLE)
+            else:
+                state, scl_en, sda_en, sda_check, cmd_done = _BIT_STEPS[state]
+                if scl_en != _KEEP:
+                    scl_en_n = scl_en
+                if sda_en == _RX:
+                    sda_en_n = rx
+                elif sda_en != _KEEP:
+                    sda_en_n = sda_en
+                if cmd_done:
+                    stop_issued = self.stop_issued_r
+
+        # tx_sda
+        if self.scl and not self.scl_r:
+            self.tx = self.sda
+
+        self.scl_r, self.sda_r = self.scl, self.sda
+        self.scl, self.sda = scl_in, sda_in
+        self.scl_en_n_r = self.scl_en_n
+        self.scl_cnt, self.edge_rdy = scl_cnt, edge_rdy
+        self.start, self.stop, self.busy = start, stop, busy
+        self.stop_issued_r, self.al = stop_issued_r, al
+        self.state, self.scl_en_n, self.sda_en_n = state, scl_en_n, sda_en_n
+        self.cmd_done, self.sda_check, self.stop_issued = cmd_done, sda_check, stop_issued
+
+
+BYTE_STATES = ("IDLE", "START", "STOP", "READ", "WRITE", "ACK")
+B_IDLE, B_START, B_STOP, B_READ, B_WRITE, B_ACK = range(6)
+
+
+class ByteControllerModel:
+    """Cycle-accurate model of i2c_byte_controller."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.state = B_IDLE
+        self.cmd = CMD_NOP
+        self.load = self.shift = 0
+        self.tx = 0
+        self.msg_done = 0
+        self.ack = 0
+        self.tip = 0
+        self.wr_done = 0
+        self.sr = 0
+        self.cnt = 0
+        self.r_start = self.r_stop = self.r_read = self.r_write = 0
+        # not reset in the rtl ('U' never compares equal to '1')
+        self.w_start = self.w_stop = self.w_read = self.w_write = 0
+
+    def _reload(self):
+        self.w_start, self.w_stop = self.r_start, self.r_stop
+        self.w_read, self.w_write = self.r_read, self.r_write
+
+    def step(self, start, stop, read, write, ack, data, al, cmd_done, rx):
+        # manage_data_flow_proc / cnt_progr
+        if self.load:
+            sr, cnt = data, 7
+        elif self.shift:
+            sr, cnt = ((self.sr << 1) | rx) & 0xff, (self.cnt - 1) & 7
+        else:
+            sr, cnt = self.sr, self.cnt
+        cnt_done = self.cnt == 0
+
+        # byte_ctrl_FSM, the w_* flags are reloaded from the old r_* values
+        if al:
+            self.state, self.cmd = B_IDLE, CMD_NOP
+            self.load = self.shift = self.tx = 0
+            self.msg_done = self.tip = self.ack = self.wr_done = 0
+        else:
+            state = self.state
+            self.tx = self.sr >> 7
+            self.load = self.shift = self.msg_done = self.wr_done = 0
+            if state == B_IDLE:
+                if self.w_start:
+                    self.state, self.cmd, self.tip = B_START, CMD_START, 1
+                elif self.w_read:
+                    self.state, self.cmd, self.tip = B_READ, CMD_READ, 1
+                elif self.w_write:
+                    self.state, self.cmd, self.tip = B_WRITE, CMD_WRITE, 1
+                else:
+                    self._reload()
+                self.load = 1
+            elif state == B_START:
+                if cmd_done:
+                    if self.w_read:
+                        self.state, self.cmd = B_READ, CMD_READ
+                    else:
+                        self.state, self.cmd = B_WRITE, CMD_WRITE
+                    self.load = 1
+            elif state == B_WRITE:
+                if cmd_done:
+                    if cnt_done:
+                        self.state, self.cmd, self.wr_done = B_ACK, CMD_READ, 1
+                    else:
+                        self.shift = 1
+            elif state == B_READ:
+                if cmd_done:
+                    if cnt_done:
+                        self.state, self.cmd = B_ACK, CMD_WRITE
+                    self.shift = 1
+                    self.tx = ack
+            elif state == B_ACK:
+                self.tx = ack
+                if cmd_done:
+                    if self.w_stop:
+                        self.state, self.cmd = B_STOP, CMD_STOP
+                    else:
+                        self.state, self.cmd = B_IDLE, CMD_NOP
+                        self.msg_done, self.tip = 1, 0
+                        self._reload()
+                    self.ack = rx
+                    self.tx = 1
+            elif state == B_STOP:
+                if cmd_done:
+                    self.state, self.cmd = B_IDLE, CMD_NOP
+                    self.msg_done, self.tip = 1, 0
+                    self._reload()
+
+        self.sr, self.cnt = sr, cnt
+        self.r_start, self.r_stop, self.r_read, self.r_write = start, stop, read, write
+
+
+class I2cCoreModel:
+    """Byte and bit controller wired as in i2c_controller.
+
+    step() takes the command and data at the byte controller inputs (cr/txr of the registers,
+    or the messages of a fifo burst), the enable bit of ctr, the scl divider
+    and the serial data line as seen by the master (f_sda). scl_in is the serial clock line
+    as seen by the master (f_scl, i_scl => f_scl in i2c_controller), it defaults to the scl
+    driven by the master itself (no clock stretching, no other master).
+    """
+
+    def __init__(self):
+        self.byte = ByteControllerModel()
+        self.bit = BitControllerModel()
+        self.cycles = 0
+
+    def reset(self):
+        self.byte.reset()
+        self.bit.reset()
+
+    @property
+    def io_scl(self):
+        return self.bit.io_scl
+
+    @property
+    def io_sda(self):
+        return self.bit.io_sda
+
+    def step(self, cr, txr, en, scl_cycles, sda_in, scl_in=None):
+        byte, bit = self.byte, self.bit
+        if scl_in is None:
+            scl_in = bit.io_scl
+        # both controllers see each other's outputs from before the edge
+        byte_tx, byte_cmd = byte.tx, byte.cmd
+        byte.step((cr >> 7) & 1, (cr >> 6) & 1, (cr >> 5) & 1, (cr >> 4) & 1, (cr >> 3) & 1,
+                  txr, bit.al, bit.cmd_done, bit.tx)
+        bit.step(byte_tx, scl_cycles, en, byte_cmd, scl_in, sda_in)
+        self.cycles += 1
+
+    def outputs(self):
+        """Observable outputs, named after the signals of i2c_controller."""
+        byte, bit = self.byte, self.bit
+        return {
+            "w_cmd": byte.cmd,
+            "w_tx": byte.tx,
+            "w_msg_done": byte.msg_done,
+            "w_tip": byte.tip,
+            "w_ack": byte.ack,
+            "w_rd_data": byte.sr,
+            "w_cmd_done": bit.cmd_done,
+            "w_busy": bit.busy,
+            "w_al": bit.al,
+            "w_scl_en_n": bit.scl_en_n,
+            "w_sda_en_n": bit.sda_en_n,
+            "io_scl": bit.io_scl,
+            "io_sda": bit.io_sda,
+        }
+
+
+def _bit(handle):
+    # an undriven line reads high thanks to the pull-up
+    value = handle.value
+    return int(value) if value.is_resolvable else 1
+
+
+def _int(handle):
+    # the head of an empty fifo is uninitialised
+    value = handle.value
+    return int(value) if value.is_resolvable else 0
+
+
+class Lockstep:
+    """Run an I2cCoreModel in lock-step with i2c_controller/i2c_controller_axi.
+
+    every rising edge of the clock the outputs of the model are compared with the
+    signals of the dut (both hold the values after the previous edge), then the model
+    is stepped with the inputs of the dut sampled at that edge.
+    """
+
+    def __init__(self, dut, clk=None, arstn=None, model=None, log=None, max_logged=10):
+        self.dut = dut
+        self.clk = clk if clk is not None else dut.i_clk
+        self.arstn = arstn if arstn is not None else dut.i_arstn
+        self.model = model or I2cCoreModel()
+        self.log = log or dut._log
+        self.max_logged = max_logged
+        self.mismatches = []    # (sim time ns, signal, expected, actual)
+        self.cycles = 0
+        self._task = None
+        self._handles = {name: getattr(dut, name) for name in self.model.outputs()}
+
+    def start(self):
+        import cocotb
+        self._task = cocotb.start_soon(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.kill()
+            self._task = None
+
+    def _compare(self):
+        from cocotb.utils import get_sim_time
+
+        for name, expected in self.model.outputs().items():
+            value = self._handles[name].value
+            if not value.is_resolvable:
+                continue
+            actual = int(value)
+            if actual != expected:
+                self.mismatches.append((get_sim_time(units="ns"), name, expected, actual))
+                if len(self.mismatches) <= self.max_logged:
+                    self.log.error("model mismatch on %s: expected %d, actual %d (bit fsm %s)",
+                                   name, expected, actual, BIT_STATES[self.model.bit.state])
+
+    def _command(self):
+        # cr as seen by the byte controller, the host's cr or a message of a fifo burst
+        dut = self.dut
+        return (_int(dut.w_start) << 7 | _int(dut.w_stop) << 6 | _int(dut.w_rd) << 5
+                | _int(dut.w_wr) << 4 | _int(dut.w_ack_cr) << 3)
+
+    @profiled
+    async def _run(self):
+        from cocotb.triggers import RisingEdge
+
+        dut, model = self.dut, self.model
+        edge = RisingEdge(self.clk)
+        while True:
+            await edge
+            if not _bit(self.arstn):
+                model.reset()
+                continue
+            self._compare()
+            model.step(self._command(), _int(dut.w_tx_data), int(dut.w_en.value),
+                       int(dut.w_clk_cycles.value), _bit(dut.f_sda), _bit(dut.f_scl))
+            self.cycles += 1
+
+
+# ---------------------------------------------------------------- transaction level
+
+# ticks (periods of the scl divider) the bit controller spends per symbol, including
+# the tick in IDLE that picks the command up
+START_TICKS = 6
+STOP_TICKS = 5
+BIT_TICKS = 5
+
+# clocks from cr holding a command to the byte controller issuing it to the bit
+# controller, and from the last tick of a message to o_msg_done
+CR_TO_CMD = 3
+DONE_TO_MSG = 2
+
+
+def message_ticks(cr):
+    """Scl divider periods taken by the message(s) in cr (a byte with ack + START/STOP)."""
+    cr = np.asarray(cr, dtype=np.int64)
+    start = (cr >> 7) & 1
+    stop = (cr >> 6) & 1
+    return 9 * BIT_TICKS + START_TICKS * start + STOP_TICKS * stop
+
+
+def message_cycles(cr, scl_cycles, phase=0):
+    """System clocks from cr holding a command to o_msg_done (vectorised).
+
+    phase is the number of clocks the command waits for the next tick of the free
+    running scl divider (0 .. scl_cycles-1), which depends on when the host wrote cr.
+    """
+    scl_cycles = np.asarray(scl_cycles, dtype=np.int64)
+    return CR_TO_CMD + np.asarray(phase) + (message_ticks(cr) - 1) * scl_cycles + DONE_TO_MSG
+
+
+def bus_bytes_per_second(scl_cycles, f_clk, overhead_cycles=0):
+    """Data bytes/s of back-to-back single byte messages (without START/STOP).
+
+    overhead_cycles is the host/handshake time spent between two messages.
+    """
+    cycles = message_cycles(CR_WRITE, scl_cycles) + np.asarray(overhead_cycles)
+    return f_clk / cycles
@@ -0,0 +1,205 @@
+"""Passive pin-level i2c monitor.
+
+I2cDecoder is a pure decoder: feed() it the levels of scl/sda with a time stamp every
+time one of them changes and it rebuilds the transactions on the bus (START, repeated
+START, address, R/W, data, ACK/NACK, STOP) and the timing of the bus (scl frequency,
+duty cycle, setup/hold margins, throughput). I2cMonitor is the cocotb adapter that
+feeds it from the dut.
+"""
+
+import statistics
+
+import cocotb
+from cocotb.triggers import Edge
+from cocotb.utils import get_sim_time
+
+from profiler import profiled
+
+
+class I2cTransaction:
+    """Bus activity from a (repeated) START to the next START or STOP, times in ns."""
+
+    def __init__(self, start, repeated=False):
+        self.start = start
+        self.end = None
+        self.repeated = repeated    # started by a repeated START
+        self.stop = False           # ended by a STOP
+        self.address = None
+        self.read = None
+        self.addr_ack = None
+        self.data = []              # data bytes
+        self.acks = []              # ACK (True)/NACK (False) of every data byte
+        self.stretched = False      # scl stretched by the target (bus model only)
+        self.arbitration = False    # two masters competed for the frame (bus model only)
+
+    def __repr__(self):
+        return (f"I2cTransaction({'Sr' if self.repeated else 'S'} @{self.start}ns, "
+                f"addr=0x{self.address if self.address is not None else 0:02x}"
+                f"{' R' if self.read else ' W'}{'' if self.addr_ack else ' NACK'}, "
+                f"data={[hex(d) for d in self.data]}{', P' if self.stop else ''})")
+
+
+class I2cDecoder:
+    """Rebuild transactions and bus timing from scl/sda levels."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transactions = []
+        self.periods = []           # scl rising to rising edge, within a byte (ns)
+        self.high_times = []        # scl high time (ns)
+        self.low_times = []         # scl low time, within a byte (ns)
+        self.setup = {"master": [], "target": []}   # sda change to scl rising edge (ns)
+        self.hold = {"master": [], "target": []}    # scl falling edge to sda change (ns)
+        self._scl = 1
+        self._sda = 1
+        self._current = None
+        self._bits = []
+        self._last_rise = None
+        self._last_fall = None
+        self._last_sda_change = None
+        self._hold_pending = False
+
+    def _driver(self, previous=False):
+        # who drives sda for the next bit (or the one just transferred)
+        t = self._current
+        nbytes = (t.address is not None) + len(t.data)
+        if previous and not self._bits:
+            index, bit = nbytes - 1, 8
+        else:
+            index, bit = nbytes, len(self._bits) - 1 if previous else len(self._bits)
+        ack_slot = bit == 8
+        if index <= 0:
+            return "target" if ack_slot else "master"
+        return "master" if t.read == ack_slot else "target"
+
+    def feed(self, time, scl, sda):
+        """Process the levels of the lines at time (ns), call it whenever one changes."""
+        if sda != self._sda:
+            if scl and self._scl:
+                if sda:
+                    self._on_stop(time)
+                else:
+                    self._on_start(time)
+            elif not scl:
+                if self._hold_pending and self._current is not None:
+                    # the bit sampled on the last rising edge was held until now
+                    self.hold[self._driver(previous=True)].append(time - self._last_fall)
+                self._hold_pending = False
+                self._last_sda_change = time
+        if scl != self._scl:
+            if scl:
+                self._on_rise(time, sda)
+            else:
+                self._on_fall(time)
+        self._scl, self._sda = scl, sda
+
+    def _on_start(self, time):
+        repeated = self._current is not None
+        if repeated:
+            self._current.end = time
+        self._current = I2cTransaction(time, repeated)
+        self.transactions.append(self._current)
+        self._bits = []
+
+    def _on_stop(self, time):
+        if self._current is not None:
+            self._current.end = time
+            self._current.stop = True
+        self._current = None
+        self._bits = []
+
+    def _on_rise(self, time, sda):
+        if self._current is None:
+            return
+        if self._bits and self._last_rise is not None:
+            self.periods.append(time - self._last_rise)
+            self.low_times.append(time - self._last_fall)
+        if self._last_sda_change is not None and self._last_fall is not None \
+                and self._last_sda_change >= self._last_fall:
+            self.setup[self._driver()].append(time - self._last_sda_change)
+        self._last_rise = time
+        self._bits.append(sda)
+        if len(self._bits) == 9:
+            self._on_byte()
+
+    def _on_fall(self, time):
+        if self._current is not None and self._last_rise is not None:
+            self.high_times.append(time - self._last_rise)
+        self._last_fall = time
+        self._hold_pending = True
+
+    def _on_byte(self):
+        value = 0
+        for bit in self._bits[:8]:
+            value = (value << 1) | bit
+        ack = self._bits[8] == 0
+        self._bits = []
+        t = self._current
+        if t.address is None:
+            t.address, t.read, t.addr_ack = value >> 1, bool(value & 1), ack
+        else:
+            t.data.append(value)
+            t.acks.append(ack)
+
+    def stats(self):
+        """Timing and throughput of the bus over the decoded transactions."""
+        done = [t for t in self.transactions if t.end is not None]
+        if not done or not self.periods:
+            return {}
+        period = statistics.median(self.periods)
+        span = (done[-1].end - done[0].start) * 1e-9
+        data_bytes = sum(len(t.data) for t in done)
+        wire_bytes = data_bytes + sum(1 for t in done if t.address is not None)
+        stats = {
+            "transactions": len(done),
+            "scl_hz": 1e9 / period,
+            "scl_hz_max": 1e9 / min(self.periods),
+            "duty": statistics.mean(self.high_times) / period,
+            "high_min_ns": min(self.high_times),
+            "low_min_ns": min(self.low_times),
+            "bytes": wire_bytes,
+            "data_bytes": data_bytes,
+            "bytes_per_s": wire_bytes / span if span else 0.0,
+            "data_bytes_per_s": data_bytes / span if span else 0.0,
+        }
+        for driver in ("master", "target"):
+            if self.setup[driver]:
+                stats[f"setup_min_ns_{driver}"] = min(self.setup[driver])
+            if self.hold[driver]:
+                stats[f"hold_min_ns_{driver}"] = min(self.hold[driver])
+        return stats
+
+
+class I2cMonitor(I2cDecoder):
+    """Watch the bus lines of the dut and decode them.
+
+    scl/sda default to f_scl/f_sda, the lines as resolved on the bus (masters and targets).
+    """
+
+    def __init__(self, dut, scl=None, sda=None):
+        super().__init__()
+        self._scl_handle = scl if scl is not None else dut.f_scl
+        self._sda_handle = sda if sda is not None else dut.f_sda
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [cocotb.start_soon(self._watch(self._scl_handle)),
+                       cocotb.start_soon(self._watch(self._sda_handle))]
+
+    def stop(self):
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+
+    def _level(self, handle):
+        value = handle.value
+        return int(value) if value.is_resolvable else 1
+
+    @profiled
+    async def _watch(self, handle):
+        while True:
+            await Edge(handle)
+            self.feed(get_sim_time(units="ns"), self._level(self._scl_handle),
+                      self._level(self._sda_handle))
@@ -0,0 +1,139 @@
+"""Command latency and bus idle accounting for i2c_controller/i2c_controller_axi.
+
+LatencyProbe only wakes up on the signals it measures (never on the clock) and records,
+in system clock cycles:
+- cmd_to_done: from a command being written to cr (cr(7:4) going from zero to non-zero)
+  to o_msg_done of the byte controller,
+- done_to_cmd: from o_msg_done to the next command written by the host,
+- txn_cycles: length of every bus transaction (o_busy, START to STOP),
+- txn_scl_idle: cycles of each transaction in which scl was held low longer than its
+  shortest low phase in that transaction, i.e the time the bus waits on the core/host.
+"""
+
+import csv
+import json
+
+import numpy as np
+
+import cocotb
+from cocotb.triggers import Edge, RisingEdge
+from cocotb.utils import get_sim_time
+
+from profiler import profiled
+
+PERCENTILES = (50, 90, 99)
+METRICS = ("cmd_to_done", "done_to_cmd", "txn_cycles", "txn_scl_idle")
+
+
+class LatencyProbe:
+
+    def __init__(self, dut, period_ns):
+        self.dut = dut
+        self.period_ns = period_ns
+        self.samples = {name: [] for name in METRICS}
+        self._pending = []          # times of commands waiting for o_msg_done
+        self._last_done = None
+        self._txn_start = None
+        self._low_start = None
+        self._low_times = []
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [cocotb.start_soon(coro()) for coro in
+                       (self._watch_cr, self._watch_done, self._watch_busy, self._watch_scl)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+
+    def _now(self):
+        return get_sim_time(units="ns") / self.period_ns
+
+    @profiled
+    async def _watch_cr(self):
+        cr = self.dut.w_cr
+        cmd = 0
+        while True:
+            await Edge(cr)
+            new = int(cr.value) & 0xf0 if cr.value.is_resolvable else 0
+            if new and not cmd:
+                now = self._now()
+                if self._last_done is not None and not self._pending:
+                    self.samples["done_to_cmd"].append(now - self._last_done)
+                self._pending.append(now)
+            cmd = new
+
+    @profiled
+    async def _watch_done(self):
+        done = RisingEdge(self.dut.w_msg_done)
+        while True:
+            await done
+            now = self._now()
+            if self._pending:
+                self.samples["cmd_to_done"].append(now - self._pending.pop(0))
+                self._last_done = now
+
+    @profiled
+    async def _watch_busy(self):
+        busy = self.dut.w_busy
+        while True:
+            await Edge(busy)
+            now = self._now()
+            if busy.value.is_resolvable and int(busy.value):
+                self._txn_start = now
+                self._low_times = []
+            elif self._txn_start is not None:
+                self.samples["txn_cycles"].append(now - self._txn_start)
+                if self._low_times:
+                    shortest = min(self._low_times)
+                    self.samples["txn_scl_idle"].append(sum(t - shortest for t in self._low_times))
+                self._txn_start = None
+
+    @profiled
+    async def _watch_scl(self):
+        scl = self.dut.io_scl
+        while True:
+            await Edge(scl)
+            now = self._now()
+            if not scl.value.is_resolvable or int(scl.value) == 0:
+                self._low_start = now
+            elif self._low_start is not None and self._txn_start is not None:
+                self._low_times.append(now - self._low_start)
+
+    def arrays(self):
+        return {name: np.asarray(values, dtype=float) for name, values in self.samples.items()}
+
+    def summary(self):
+        """count/mean/min/max and percentiles of every metric, in clock cycles."""
+        summary = {}
+        for name, values in self.arrays().items():
+            if not values.size:
+                summary[name] = {"count": 0}
+                continue
+            summary[name] = {"count": int(values.size), "mean": float(values.mean()),
+                             "min": float(values.min()), "max": float(values.max())}
+            for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                summary[name][f"p{p}"] = float(v)
+        return summary
+
+    def histograms(self, bins=20):
+        """(counts, bin edges) of every metric."""
+        return {name: np.histogram(values, bins=bins) for name, values in self.arrays().items()
+                if values.size}
+
+    def dump_json(self, path, bins=20):
+        data = {"period_ns": self.period_ns, "summary": self.summary(), "histograms": {}}
+        for name, (counts, edges) in self.histograms(bins).items():
+            data["histograms"][name] = {"counts": counts.tolist(), "edges": edges.tolist()}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def dump_csv(self, path):
+        """One row per sample: metric, index, cycles."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["metric", "index", "cycles"])
+            for name, values in self.samples.items():
+                for i, value in enumerate(values):
+                    writer.writerow([name, i, value])
@@ -0,0 +1,277 @@
+"""Pin-level trace recording and simulator-free offline checking.
+
+TraceRecorder logs only the value changes of the bus pins (io_scl, io_sda, f_scl, f_sda), the
+register bus and o_data, plus one "access" event per clock the register strobe is
+high (we, address and data as the core sampled them). a trace is a directory of
+columns, each a .npy file that np.load can memory-map:
+
+    time.npy    int64, ps
+    signal.npy  uint8, index into the signal names of meta.json
+    value.npy   int64, -1 for a value with X/Z bits
+
+check_trace() replays a trace without a simulator: the bus goes through I2cDecoder,
+the frames are checked against a model of memory-backed targets (I2cTarget: every
+read from a target that acknowledged returns what was last written there) and the
+coverage of the data written and the command to START latency are computed again,
+so an archived run can be re-analysed in seconds:
+
+    $ python sim_common/pin_trace.py cocotb_sim/sim_build/traces/trace_000 ...
+
+the testbenches record a trace of every test with I2C_TRACE=1.
+"""
+
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+from i2c_bus import I2cTarget
+from i2c_monitor import I2cDecoder
+from scoreboard import StreamingComparator
+from txn_coverage import TransactionCoverage
+
+SIGNALS = ("io_scl", "io_sda", "f_scl", "f_sda", "i_we", "i_stb", "i_addr", "i_data", "o_data", "o_irq",
+           "S_AXI_AWVALID", "S_AXI_AWREADY", "S_AXI_AWADDR", "S_AXI_WVALID", "S_AXI_WREADY",
+           "S_AXI_WDATA", "S_AXI_ARVALID", "S_AXI_ARREADY", "S_AXI_ARADDR", "S_AXI_RVALID",
+           "S_AXI_RDATA")
+ACCESS = "access"           # we << 12 | addr << 8 | data, every clock i_stb is high
+UNKNOWN = -1
+
+
+class TraceRecorder:
+    """Record the value changes of the signals of dut (the ones of SIGNALS it has).
+
+    the trace is written to path when the recorder is stopped or its test ends.
+    """
+
+    def __init__(self, dut, path, signals=SIGNALS, clock="i_clk"):
+        self.dut = dut
+        self.path = path
+        self.handles = [(name, getattr(dut, name)) for name in signals if hasattr(dut, name)]
+        self.names = [name for name, _ in self.handles] + [ACCESS]
+        self._clock = getattr(dut, clock) if hasattr(dut, clock) and hasattr(dut, "i_stb") else None
+        self._time = array("q")
+        self._signal = array("B")
+        self._value = array("q")
+        self._tasks = []
+        self._saved = False
+
+    def start(self):
+        import cocotb
+
+        for index, (_, handle) in enumerate(self.handles):
+            self._record(index, handle)
+            self._tasks.append(cocotb.start_soon(self._watch(index, handle)))
+        if self._clock is not None:
+            self._tasks.append(cocotb.start_soon(self._watch_strobe()))
+        self._tasks.append(cocotb.start_soon(self._keep()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+        self.save()
+
+    def _record(self, index, handle, now=None):
+        from cocotb.utils import get_sim_time
+
+        value = handle.value
+        self._time.append(int(get_sim_time(units="ps")) if now is None else now)
+        self._signal.append(index)
+        self._value.append(int(value) if value.is_resolvable else UNKNOWN)
+
+    async def _watch(self, index, handle):
+        from cocotb.triggers import Edge
+
+        while True:
+            await Edge(handle)
+            self._record(index, handle)
+
+    async def _watch_strobe(self):
+        from cocotb.triggers import RisingEdge
+        from cocotb.utils import get_sim_time
+
+        dut = self.dut
+        stb = dut.i_stb
+        edge = RisingEdge(self._clock)
+        access = len(self.names) - 1
+        while True:
+            await RisingEdge(stb)
+            while True:
+                # the values the core samples on this edge
+                await edge
+                if not (stb.value.is_resolvable and int(stb.value)):
+                    break
+                self._time.append(int(get_sim_time(units="ps")))
+                self._signal.append(access)
+                self._value.append(_int(dut.i_we.value) << 12 | _int(dut.i_addr.value) << 8
+                                   | _int(dut.i_data.value))
+
+    async def _keep(self):
+        # killed with the other tasks at the end of the test, saves the trace
+        from cocotb.triggers import Event
+
+        try:
+            await Event().wait()
+        finally:
+            self.save()
+
+    def save(self):
+        if self._saved:
+            return
+        self._saved = True
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, "time.npy"), np.frombuffer(self._time, dtype=np.int64))
+        np.save(os.path.join(self.path, "signal.npy"), np.frombuffer(self._signal, dtype=np.uint8))
+        np.save(os.path.join(self.path, "value.npy"), np.frombuffer(self._value, dtype=np.int64))
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"signals": self.names, "time_unit": "ps"}, f)
+
+
+def _int(value):
+    return int(value) if value.is_resolvable else 0
+
+
+_recorders = 0
+_recorder = None
+
+
+def record(dut, directory="traces"):
+    """Start a recorder on dut when I2C_TRACE is set, one per test (traces/trace_NNN, in test order).
+
+    a test that resets the core again keeps its recorder.
+    """
+    global _recorders, _recorder
+    if not int(os.environ.get("I2C_TRACE", 0)):
+        return None
+    if _recorder is not None and not _recorder._saved:
+        return _recorder
+    _recorder = TraceRecorder(dut, os.path.join(directory, f"trace_{_recorders:03d}"))
+    _recorders += 1
+    _recorder.start()
+    return _recorder
+
+
+class Trace:
+    """A recorded trace, its columns memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.names = self.meta["signals"]
+        self.time = np.load(os.path.join(path, "time.npy"), mmap_mode="r")
+        self.signal = np.load(os.path.join(path, "signal.npy"), mmap_mode="r")
+        self.value = np.load(os.path.join(path, "value.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.time)
+
+    def index(self, name):
+        return self.names.index(name) if name in self.names else None
+
+    def changes(self, name):
+        """(times ps, values) of one signal."""
+        mask = self.signal == self.index(name)
+        return np.asarray(self.time[mask]), np.asarray(self.value[mask])
+
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
+
+
+def decode(trace, sda="f_sda"):
+    """Run the scl/sda changes of trace through an I2cDecoder (f_scl, or io_scl in the
+    traces recorded before the core had it)."""
+    decoder = I2cDecoder()
+    scl_index = trace.index("f_scl") if trace.index("f_scl") is not None else trace.index("io_scl")
+    sda_index = trace.index(sda)
+    mask = (trace.signal == scl_index) | (trace.signal == sda_index)
+    scl = sda_level = 1
+    for time, signal, value in zip(trace.time[mask].tolist(), trace.signal[mask].tolist(),
+                                   trace.value[mask].tolist()):
+        level = 1 if value == UNKNOWN else value
+        if signal == scl_index:
+            scl = level
+        else:
+            sda_level = level
+        decoder.feed(time / 1000, scl, sda_level)
+    return decoder
+
+
+def check_memory(transactions, comparator=None):
+    """Check the read data of the frames against memory-backed targets, returns the comparator."""
+    now = [0.0]                 # start of the frame being checked, ns
+    comparator = comparator or StreamingComparator("target memory", now=lambda: now[0])
+    targets = {}
+    for t in transactions:
+        if t.address is None or not t.addr_ack:
+            continue
+        now[0] = t.start
+        target = targets.setdefault(t.address, I2cTarget(t.address))
+        target.begin(t.read)
+        for byte in t.data:
+            if t.read:
+                comparator.add_expected((t.address, target.read()))
+                comparator.add_actual((t.address, byte))
+            else:
+                target.write(byte)
+    return comparator
+
+
+def check_trace(path, bins=range(2**4, 2**5)):
+    """Decode, check and analyse a trace, returns a summary dict."""
+    trace = Trace(path)
+    decoder = decode(trace)
+    memory = check_memory(decoder.transactions)
+    summary = {"trace": path, "events": len(trace), "bytes": trace.size(),
+               "transactions": len(decoder.transactions), "bus": decoder.stats(),
+               "memory": memory.summary(), "first_mismatch": memory.first_mismatch}
+
+    # coverage of the frames, the goal is the payload bytes written over bins
+    coverage = TransactionCoverage(goal_bins=bins)
+    coverage.sample_transactions(decoder.transactions)
+    summary["coverage"] = coverage.cover_percentage
+
+    # clocks from a command with START written to cr to the START on the bus
+    if trace.index(ACCESS) is not None:
+        times, values = trace.changes(ACCESS)
+        starts = [t for t, v in zip(times.tolist(), values.tolist())
+                  if v >> 12 & 1 and (v >> 8) & 15 == 4 and v & 0x80]
+        bus_starts = [t.start * 1000 for t in decoder.transactions]
+        latencies, i = [], 0
+        for t in starts:
+            while i < len(bus_starts) and bus_starts[i] < t:
+                i += 1
+            if i < len(bus_starts):
+                latencies.append((bus_starts[i] - t) / 1000)
+        if latencies:
+            summary["cmd_to_start_ns"] = {"count": len(latencies), "p50": float(np.percentile(latencies, 50)),
+                                          "max": max(latencies)}
+    summary["passed"] = not memory.mismatches
+    return summary
+
+
+def main(argv=None):
+    paths = (argv if argv is not None else sys.argv[1:])
+    passed = True
+    for path in paths:
+        summary = check_trace(path)
+        memory = summary["memory"]
+        print(f"{path}: {summary['events']} events ({summary['bytes']/1e3:.1f} kB), "
+              f"{summary['transactions']} transactions, {memory['compared']} bytes read checked, "
+              f"{memory['mismatches']} mismatches, coverage {summary['coverage']:.1f} %"
+              + (f", scl {summary['bus']['scl_hz']/1e3:.1f} kHz" if summary["bus"] else "")
+              + (f", command to START p50 {summary['cmd_to_start_ns']['p50']:.0f} ns"
+                 if "cmd_to_start_ns" in summary else ""))
+        if summary["first_mismatch"]:
+            time, expected, actual = summary["first_mismatch"]
+            print(f"  first mismatch in the frame at {time:.0f} ns: read {actual[1]:#04x} from "
+                  f"{actual[0]:#04x}, expected {expected[1]:#04x}")
+        passed &= summary["passed"]
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
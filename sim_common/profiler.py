@@ -0,0 +1,206 @@
+"""Per-coroutine profiling of the testbench components.
+
+the long-running coroutines of the bus models, monitors and drivers are decorated with
+@profiled. with I2C_PROFILE=1 each of them runs through a wrapper that counts, per
+coroutine: wake-ups, the triggers it awaited (by type), python cpu time per wake-up and
+the signal reads/writes it made (anything outside a profiled coroutine, e.g the test
+body, is accounted to "(test)"). at the end of every test a table sorted by cpu time is
+logged and the samples are appended to profile.folded (I2C_PROFILE_OUT), one
+"test;coroutine;trigger cpu_us" line per stack, as read by flamegraph.pl/speedscope:
+
+    $ flamegraph.pl cocotb_sim/profile.folded > profile.svg
+
+without I2C_PROFILE the decorated coroutines are returned as they are (and cocotb is only
+imported once profiling, so the offline models can be decorated too).
+"""
+
+import functools
+import os
+import time
+import types
+
+OUTSIDE = "(test)"
+
+
+class CoroutineStats:
+
+    def __init__(self, name):
+        self.name = name
+        self.tasks = 0
+        self.wakeups = 0
+        self.cpu_s = 0.0
+        self.max_wake_s = 0.0
+        self.reads = 0
+        self.writes = 0
+        self.triggers = {}      # trigger type -> [awaits, cpu s of the wake-ups after it]
+
+
+class Profiler:
+    """The stats of the profiled coroutines of one test."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = {}
+        self.current = self.stats[OUTSIDE] = CoroutineStats(OUTSIDE)
+        self.reported = False
+
+    def get(self, name):
+        if name not in self.stats:
+            self.stats[name] = CoroutineStats(name)
+        return self.stats[name]
+
+    def table(self):
+        rows = sorted(self.stats.values(), key=lambda s: s.cpu_s, reverse=True)
+        total = sum(s.cpu_s for s in rows) or 1.0
+        lines = [f"{'coroutine':<36}{'tasks':>6}{'wakeups':>10}{'cpu s':>9}{'%':>6}{'us/wake':>9}"
+                 f"{'max us':>9}{'reads':>10}{'writes':>10}  triggers"]
+        for s in rows:
+            if not (s.wakeups or s.reads or s.writes):
+                continue
+            triggers = ", ".join(f"{name} {n}" for name, (n, _) in
+                                 sorted(s.triggers.items(), key=lambda item: -item[1][0]))
+            lines.append(f"{s.name:<36}{s.tasks:>6}{s.wakeups:>10}{s.cpu_s:>9.3f}{100*s.cpu_s/total:>6.1f}"
+                         f"{1e6*s.cpu_s/s.wakeups if s.wakeups else 0:>9.1f}{1e6*s.max_wake_s:>9.1f}"
+                         f"{s.reads:>10}{s.writes:>10}  {triggers}")
+        return "\n".join(lines)
+
+    def folded(self):
+        """flamegraph stacks (test;coroutine;trigger) weighted by cpu us."""
+        test = self.name.replace(";", ":").replace(" ", "_")
+        lines = []
+        for s in self.stats.values():
+            for trigger, (_, cpu_s) in s.triggers.items():
+                if cpu_s:
+                    lines.append(f"{test};{s.name};{trigger} {round(1e6*cpu_s)}")
+        return lines
+
+    def report(self, log=None, path=None):
+        if self.reported:
+            return
+        import cocotb
+
+        self.reported = True
+        (log or cocotb.log).info(f"coroutine profile of {self.name}:\n{self.table()}")
+        path = path or os.environ.get("I2C_PROFILE_OUT", "profile.folded")
+        with open(path, "a") as f:
+            f.writelines(line + "\n" for line in self.folded())
+
+
+_profiler = None
+_tests = 0
+
+
+def enabled():
+    return bool(int(os.environ.get("I2C_PROFILE", 0)))
+
+
+def _test_name():
+    import cocotb
+
+    test = getattr(cocotb.regression_manager, "_test", None)
+    return getattr(test, "__qualname__", None) or f"test {_tests}"
+
+
+def profiler():
+    """The profiler of the running test, started (with its report at the end of the test) on first use."""
+    global _profiler, _tests
+    import cocotb
+
+    if _profiler is None or _profiler.reported:
+        _tests += 1
+        _count_signal_access()
+        _profiler = Profiler(_test_name())
+        cocotb.start_soon(_report_at_end(_profiler))
+    return _profiler
+
+
+async def _report_at_end(prof):
+    # killed with the other tasks of the test
+    from cocotb.triggers import Event
+
+    try:
+        await Event().wait()
+    finally:
+        prof.report()
+
+
+@types.coroutine
+def _await(trigger):
+    return (yield trigger)
+
+
+async def _run(name, coro):
+    prof = profiler()
+    stats = prof.get(name)
+    stats.tasks += 1
+    trigger_stats = None
+    send, error = None, None
+    try:
+        while True:
+            outer, prof.current = prof.current, stats
+            start = time.process_time()
+            try:
+                trigger = coro.throw(error) if error is not None else coro.send(send)
+            except StopIteration as e:
+                return e.value
+            finally:
+                cpu = time.process_time() - start
+                prof.current = outer
+                stats.wakeups += 1
+                stats.cpu_s += cpu
+                stats.max_wake_s = max(stats.max_wake_s, cpu)
+                if trigger_stats is not None:
+                    trigger_stats[1] += cpu
+            kind = type(trigger).__name__
+            trigger_stats = stats.triggers.setdefault(kind, [0, 0.0])
+            trigger_stats[0] += 1
+            try:
+                send, error = await _await(trigger), None
+            except GeneratorExit:
+                raise
+            except BaseException as e:
+                send, error = None, e
+    finally:
+        coro.close()
+
+
+def profiled(fn):
+    """Profile every coroutine of the async function/method fn when I2C_PROFILE is set."""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        coro = fn(*args, **kwargs)
+        return _run(name, coro) if enabled() else coro
+    return wrapper
+
+
+_counting = False
+
+
+def _count_signal_access():
+    # wrap the value property of the simulator handles once, the reads and writes go to
+    # the profiled coroutine running when they happen
+    global _counting
+    if _counting:
+        return
+    from cocotb import handle
+
+    _counting = True
+    for cls in (handle.ConstantObject, handle.NonHierarchyIndexableObject, handle.ModifiableObject,
+                handle.RealObject, handle.EnumObject, handle.IntegerObject, handle.StringObject):
+        prop = cls.__dict__.get("value")
+        if prop is None:
+            continue
+
+        def getter(self, _get=prop.fget):
+            if _profiler is not None:
+                _profiler.current.reads += 1
+            return _get(self)
+
+        def setter(self, value, _set=prop.fset):
+            if _profiler is not None:
+                _profiler.current.writes += 1
+            _set(self, value)
+
+        setattr(cls, "value", property(getter, setter if prop.fset else None, doc=prop.__doc__))
@@ -0,0 +1,339 @@
+"""Run the cocotb/pyuvm testbenches without the Makefiles.
+
+the design is analysed and elaborated once per top level into a build directory that
+is shared by all simulations; every simulation then runs in its own directory (with its
+own results.xml/coverage.xml), so that any number of seeds can run in parallel.
+
+builds are cached under a hash of everything that goes into them (vhdl sources,
+generics, --std, simulator and its version), so a testbench-only change never
+re-analyses the design:
+
+    $ python ../sim_common/runner.py testbench [--seed N] [--testcase NAME] [-- SIM_ARGS]
+
+the simulator (any ghdl backend or nvc, see simulators.py) is picked with --simulator
+or I2C_SIMULATOR; auto chooses from the --expected-cycles of the run.
+
+waves are off by default (see waves.py for I2C_WAVES/I2C_WAVE_WINDOW). a failing seed
+is run again with every signal dumped for the I2C_WAVE_REPLAY_NS (0: no replay) before
+the failure, into the replay directory of the run.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from xml.etree import ElementTree
+
+import simulators
+from waves import FULL, WavePolicy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RTL = os.path.join(ROOT, "rtl")
+SIM_COMMON = os.path.join(ROOT, "sim_common")
+
+STD = "08"
+LIBRARY = "work"
+
+CACHE = os.environ.get("I2C_SIM_CACHE", os.path.join(ROOT, ".sim_cache"))
+REPLAY_NS = int(os.environ.get("I2C_WAVE_REPLAY_NS", 100000))
+
+# analysis order is resolved by ghdl -i/-m, the lists follow the Makefiles
+SOURCES = {
+    "i2c_controller": ["i2c_registers.vhd", "i2c_fifo.vhd", "i2c_bit_controller.vhd",
+                       "i2c_byte_controller.vhd", "i2c_burst_controller.vhd",
+                       "i2c_controller.vhd"],
+    "i2c_controller_axi": ["axil_regs.vhd", "i2c_registers.vhd", "i2c_fifo.vhd",
+                           "i2c_bit_controller.vhd", "i2c_byte_controller.vhd",
+                           "i2c_burst_controller.vhd", "i2c_controller.vhd",
+                           "i2c_controller_axi.vhd"],
+}
+
+# python test module -> (directory of the module, top level)
+TESTBENCHES = {
+    "testbench": ("cocotb_sim", "i2c_controller"),
+    "testbench_axi": ("cocotb_sim", "i2c_controller_axi"),
+    "testbench_pyuvm": ("pyuvm_sim", "i2c_controller"),
+}
+
+
+class SimulationError(Exception):
+    pass
+
+
+def have_simulator():
+    return bool(simulators.available())
+
+
+def sources(toplevel):
+    return [os.path.join(RTL, name) for name in SOURCES[toplevel]]
+
+
+def _call(cmd, cwd, env=None, log=None):
+    """Run cmd, returns the resource usage of the process (see os.wait4)."""
+    out = open(log, "a") if log else None
+    try:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out,
+                                stderr=subprocess.STDOUT if out else None)
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        proc.returncode = ret = os.waitstatus_to_exitcode(status)
+    finally:
+        if out:
+            out.close()
+    if ret:
+        raise SimulationError(f"{' '.join(cmd)} failed with exit code {ret}"
+                              + (f" (see {log})" if log else ""))
+    return usage
+
+
+def build(toplevel, build_dir, simulator=None, generics=None):
+    """Analyse and elaborate toplevel into build_dir."""
+    simulator = simulator or simulators.get()
+    os.makedirs(build_dir, exist_ok=True)
+    log = os.path.join(build_dir, "build.log")
+    for cmd in simulator.build_commands(toplevel, sources(toplevel), build_dir, STD, LIBRARY, generics):
+        _call(cmd, build_dir, log=log)
+    return build_dir
+
+
+def simulator_version(simulator=None):
+    return (simulator or simulators.get()).version()
+
+
+def build_key(toplevel, generics=None, simulator=None):
+    """Hash of everything the analysed library and the elaborated design depend on."""
+    simulator = simulator or simulators.get()
+    h = hashlib.sha256()
+    for item in (toplevel, STD, simulator.name, simulator.version(),
+                 repr(sorted((generics or {}).items()))):
+        h.update(item.encode())
+        h.update(b"\0")
+    for path in sources(toplevel):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def _build_dir(toplevel, generics, cache, simulator):
+    return os.path.join(cache, f"{toplevel}-{simulator.name}-{build_key(toplevel, generics, simulator)}")
+
+
+def build_cached(toplevel, generics=None, cache=None, simulator=None, expected_cycles=None):
+    """Return the build directory of toplevel, building it only on a cache miss.
+
+    the simulator is picked by simulators.get (I2C_SIMULATOR, auto by default) for a run
+    of expected_cycles clocks unless one is given. safe to call from any number of
+    processes at once, the first one builds and the others wait for it on a lock file.
+    """
+    cache = cache or CACHE
+    if simulator is None:
+        cached = [name for name, sim in simulators.available().items()
+                  if os.path.exists(os.path.join(_build_dir(toplevel, generics, cache, sim), ".complete"))]
+        simulator = simulators.get(expected_cycles=expected_cycles, cached=cached)
+    build_dir = _build_dir(toplevel, generics, cache, simulator)
+    stamp = os.path.join(build_dir, ".complete")
+    if os.path.exists(stamp):
+        return build_dir
+    os.makedirs(cache, exist_ok=True)
+    with open(build_dir + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(stamp):
+            # drop the leftovers of an interrupted/failed build
+            shutil.rmtree(build_dir, ignore_errors=True)
+            start = time.perf_counter()
+            build(toplevel, build_dir, simulator, generics)
+            with open(stamp, "w") as f:
+                json.dump({"simulator": simulator.name, "build_s": time.perf_counter() - start}, f)
+    return build_dir
+
+
+def build_info(build_dir):
+    """Simulator and build time (s) of a cached build."""
+    with open(os.path.join(build_dir, ".complete")) as f:
+        return json.load(f)
+
+
+def simulate(module, build_dir, run_dir, seed=None, testcase=None, sim_args=(), env=None,
+             generics=None, quiet=True, waves=None, logger=print, stats=None):
+    """Run the tests of module in run_dir against the design elaborated in build_dir
+    (by the simulator that built it).
+
+    the simulator output goes to run_dir/sim.log when quiet, else to the console.
+    waves is a WavePolicy (default from the environment), the wall time and the size of
+    the dump are logged. the wall time, cpu time and peak rss of the simulator process
+    are stored in the stats dict when one is given. returns the path of the results file.
+    """
+    import find_libpython
+
+    directory, toplevel = TESTBENCHES[module]
+    os.makedirs(run_dir, exist_ok=True)
+    results = os.path.join(run_dir, "results.xml")
+    if os.path.exists(results):
+        os.remove(results)
+
+    sim_env = dict(os.environ)
+    sim_env.update(env or {})
+    sim_env.update({
+        "MODULE": module,
+        "TOPLEVEL": toplevel,
+        "TOPLEVEL_LANG": "vhdl",
+        "COCOTB_RESULTS_FILE": results,
+        "LIBPYTHON_LOC": find_libpython.find_libpython(),
+        "PYGPI_PYTHON_BIN": sys.executable,
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.join(ROOT, directory), SIM_COMMON,
+                                                    os.environ.get("PYTHONPATH")])),
+    })
+    if seed is not None:
+        sim_env["RANDOM_SEED"] = str(seed)
+    if testcase is not None:
+        sim_env["TESTCASE"] = testcase
+
+    log = os.path.join(run_dir, "sim.log") if quiet else None
+    if log and os.path.exists(log):
+        os.remove(log)
+    simulator = simulators.get(build_info(build_dir)["simulator"])
+    waves = waves if waves is not None else WavePolicy.from_env(sim_env)
+    capture = waves.capture(run_dir, toplevel, simulator)
+    cmd = simulator.run_command(toplevel, build_dir, STD, LIBRARY, list(sim_args) + capture.args, generics)
+    start = time.perf_counter()
+    try:
+        usage = _call(cmd, run_dir, env=sim_env, log=log)
+    finally:
+        wave = capture.close()
+        wall = time.perf_counter() - start
+        if stats is not None:
+            stats["wall_s"] = wall
+        size = f", {os.path.getsize(wave)/1e6:.1f} MB in {wave}" if wave else ""
+        logger(f"{module}: {simulator.name}, waves {waves}, {wall:.2f} s{size}")
+    if not os.path.isfile(results):
+        raise SimulationError("simulation terminated abnormally, no results file"
+                              + (f" (see {log})" if log else ""))
+    if stats is not None:
+        # the python testbench runs inside the simulator process
+        stats["cpu_s"] = usage.ru_utime + usage.ru_stime
+        stats["max_rss_mb"] = usage.ru_maxrss / 1024
+    return results
+
+
+def failures(results):
+    """Names of the failed test cases in a cocotb results file."""
+    failed = []
+    for case in ElementTree.parse(results).getroot().iter("testcase"):
+        if case.find("failure") is not None or case.find("error") is not None:
+            failed.append(case.get("name"))
+    return failed
+
+
+def case_times(results):
+    """Test case name -> (wall time s, sim time ns) from a cocotb results file."""
+    return {case.get("name"): (float(case.get("time", 0)), float(case.get("sim_time_ns", 0)))
+            for case in ElementTree.parse(results).getroot().iter("testcase")}
+
+
+def results_seed(results):
+    """The random seed cocotb used for a run (random_seed property of its results file)."""
+    for prop in ElementTree.parse(results).getroot().iter("property"):
+        if prop.get("name") == "random_seed":
+            return int(prop.get("value"))
+    return None
+
+
+def failure_time(results):
+    """Sim time (ns) at the end of the first failed test case, None if there is none.
+
+    the test cases of a module run one after the other in a single simulation, so it
+    is the sum of the sim times of the cases up to the failed one.
+    """
+    elapsed = 0.0
+    for case in ElementTree.parse(results).getroot().iter("testcase"):
+        elapsed += float(case.get("sim_time_ns", 0))
+        if case.find("failure") is not None or case.find("error") is not None:
+            return int(elapsed)
+    return None
+
+
+def replay(module, build_dir, run_dir, results, seed=None, before_ns=None, logger=print, **kwargs):
+    """Run a failed simulation again, dumping every signal in a window up to the failure.
+
+    the replay runs in run_dir/replay with the same seed (so the same stimulus, the one
+    of results when seed is None), returns the wave file or None when there was no failure
+    or the replay is disabled.
+    """
+    before_ns = REPLAY_NS if before_ns is None else before_ns
+    end = failure_time(results)
+    if end is None or not before_ns:
+        return None
+    if seed is None:
+        seed = results_seed(results)
+    replay_dir = os.path.join(run_dir, "replay")
+    waves = WavePolicy(FULL, window=(max(0, end - before_ns), end))
+    try:
+        simulate(module, build_dir, replay_dir, seed=seed, waves=waves, logger=logger, **kwargs)
+    except SimulationError:
+        pass
+    wave = os.path.join(replay_dir, "wave.vcd")
+    return wave if os.path.isfile(wave) else None
+
+
+def merge_coverage(files, merged_file, logger=print):
+    """Merge coverage.xml databases, returns the merged top level coverage (%)."""
+    from txn_coverage import merge_xml
+
+    files = [f for f in files if os.path.isfile(f)]
+    if not files:
+        return None
+    coverage = merge_xml(files, merged_file)
+    logger(f"merged {len(files)} coverage databases into {merged_file}")
+    return coverage
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a testbench against a cached build of the design")
+    parser.add_argument("module", choices=sorted(TESTBENCHES))
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--testcase")
+    parser.add_argument("--run-dir", default=os.getcwd())
+    parser.add_argument("--simulator", default=os.environ.get("I2C_SIMULATOR", "auto"),
+                        help="auto (default), ghdl, ghdl-mcode, ghdl-llvm, ghdl-gcc or nvc")
+    parser.add_argument("--expected-cycles", type=float, default=os.environ.get("I2C_EXPECTED_CYCLES"),
+                        help="expected length of the run (system clocks), for --simulator auto")
+    parser.add_argument("--waves", default=os.environ.get("I2C_WAVES"),
+                        help="off (default), full or comma separated instances/signals")
+    parser.add_argument("--wave-window", default=os.environ.get("I2C_WAVE_WINDOW"),
+                        help="start:end (ns) of the dump")
+    parser.add_argument("--replay-ns", type=int, default=REPLAY_NS,
+                        help="window (ns) before a failure dumped by the replay, 0 for no replay")
+    parser.add_argument("sim_args", nargs=argparse.REMAINDER, help="-- followed by simulator arguments")
+    args = parser.parse_args(argv)
+    sim_args = args.sim_args[1:] if args.sim_args[:1] == ["--"] else args.sim_args
+
+    toplevel = TESTBENCHES[args.module][1]
+    simulator = None if args.simulator == "auto" else simulators.get(args.simulator)
+    expected = float(args.expected_cycles) if args.expected_cycles else None
+    build_dir = build_cached(toplevel, simulator=simulator, expected_cycles=expected)
+    results = simulate(args.module, build_dir, args.run_dir, seed=args.seed,
+                       testcase=args.testcase, sim_args=sim_args, quiet=False,
+                       waves=WavePolicy.parse(args.waves, args.wave_window))
+    failed = failures(results)
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        wave = replay(args.module, build_dir, args.run_dir, results, seed=args.seed,
+                      before_ns=args.replay_ns, testcase=args.testcase, sim_args=sim_args)
+        if wave:
+            print(f"waves of the failure: {wave}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
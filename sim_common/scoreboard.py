@@ -0,0 +1,102 @@
+"""Online comparison of expected and actual transactions.
+
+StreamingComparator checks every transaction as soon as both its expected and its
+actual value are there (in order) instead of buffering everything until the end of
+the test: only the transactions in flight are kept, a mismatch is reported with its
+sim time right away (and can end the test there) and the counters/rates are running
+ones, so memory stays bounded however long the test runs.
+"""
+
+import time
+from collections import deque
+
+
+class ScoreboardMismatch(AssertionError):
+    """Raised on a mismatch when the comparator stops on the first failure."""
+
+
+class StreamingComparator:
+
+    def __init__(self, name="scoreboard", compare=None, stop_on_fail=False, window=None,
+                 log=None, max_logged=10, now=None):
+        self.name = name
+        self.compare = compare or (lambda expected, actual: expected == actual)
+        self.stop_on_fail = stop_on_fail
+        self.window = window            # most transactions allowed in flight (None: no limit)
+        self.log = log
+        self.max_logged = max_logged
+        self._now = now or _sim_time_ns
+        self._expected = deque()
+        self._actual = deque()
+        self.matches = 0
+        self.mismatches = 0
+        self.first_mismatch = None      # (sim time ns, expected, actual)
+        self.max_in_flight = 0
+        self._start = None              # (sim time ns, wall time s) of the first transaction
+
+    def add_expected(self, item):
+        if self._actual:
+            self._check(item, self._actual.popleft())
+        else:
+            self._push(self._expected, item)
+
+    def add_actual(self, item):
+        if self._expected:
+            self._check(self._expected.popleft(), item)
+        else:
+            self._push(self._actual, item)
+
+    def _push(self, queue, item):
+        if self._start is None:
+            self._start = (self._now(), time.perf_counter())
+        queue.append(item)
+        self.max_in_flight = max(self.max_in_flight, len(queue))
+        if self.window is not None and len(queue) > self.window:
+            self._fail(f"{self.name}: {len(queue)} transactions in flight, more than {self.window}")
+
+    def _check(self, expected, actual):
+        if self._start is None:
+            self._start = (self._now(), time.perf_counter())
+        if self.compare(expected, actual):
+            self.matches += 1
+            return
+        now = self._now()
+        self.mismatches += 1
+        if self.first_mismatch is None:
+            self.first_mismatch = (now, expected, actual)
+        message = f"{self.name}: mismatch @{now}ns, expected {expected}, actual {actual}"
+        if self.log and self.mismatches <= self.max_logged:
+            self.log.error(message)
+        if self.stop_on_fail:
+            raise ScoreboardMismatch(message)
+
+    def _fail(self, message):
+        if self.log:
+            self.log.error(message)
+        raise ScoreboardMismatch(message)
+
+    @property
+    def compared(self):
+        return self.matches + self.mismatches
+
+    @property
+    def pending(self):
+        """(expected, actual) transactions still waiting for their counterpart."""
+        return len(self._expected), len(self._actual)
+
+    def summary(self):
+        summary = {"compared": self.compared, "matches": self.matches, "mismatches": self.mismatches,
+                   "pending_expected": len(self._expected), "pending_actual": len(self._actual),
+                   "max_in_flight": self.max_in_flight}
+        if self._start is not None:
+            sim_s = (self._now() - self._start[0]) * 1e-9
+            wall_s = time.perf_counter() - self._start[1]
+            summary["per_sim_s"] = self.compared / sim_s if sim_s else 0.0
+            summary["per_wall_s"] = self.compared / wall_s if wall_s else 0.0
+        return summary
+
+
+def _sim_time_ns():
+    from cocotb.utils import get_sim_time
+
+    return get_sim_time(units="ns")
@@ -0,0 +1,206 @@
+"""VHDL simulators the testbenches can run on.
+
+every ghdl backend (mcode, llvm, gcc) and nvc, selected per run by name:
+
+    I2C_SIMULATOR=auto|ghdl|ghdl-mcode|ghdl-llvm|ghdl-gcc|nvc
+
+the ghdl on PATH is found with its backend (read from ghdl --version), other installs
+through I2C_GHDL_MCODE/I2C_GHDL_LLVM/I2C_GHDL_GCC (path of their ghdl executable). nvc
+is taken from PATH or I2C_NVC and needs a cocotb with nvc support (>= 1.8).
+
+the backends trade elaboration for run speed: mcode compiles in memory at every start
+and runs slower, llvm/gcc build an executable once (cached with the design) and run
+faster. auto picks the one with the lowest expected wall time for the run length,
+from the startup time, build time and cycles/s of every simulator measured by the
+benchmark suite (benchmark/bench.py). without benchmark numbers (or without a run
+length) it keeps to the ghdl on PATH.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = [os.path.join(ROOT, "benchmark", "results.json"),
+              os.path.join(ROOT, "benchmark", "baseline.json")]
+
+GHDL_BACKENDS = ("mcode", "llvm", "gcc")
+
+
+class Ghdl:
+    std = {"93": "--std=93", "08": "--std=08"}
+    wave_file = "wave.ghw"
+
+    def __init__(self, executable, backend):
+        self.executable = executable
+        self.backend = backend
+        self.name = f"ghdl-{backend}"
+        self._version = None
+
+    @staticmethod
+    def detect_backend(executable):
+        # e.g "llvm 14.0.0 code generator", "GCC back-end code generator"
+        text = subprocess.run([executable, "--version"], capture_output=True, text=True).stdout.lower()
+        for backend in GHDL_BACKENDS:
+            if backend in text:
+                return backend
+        return "mcode"
+
+    def version(self):
+        if self._version is None:
+            self._version = subprocess.run([self.executable, "--version"], capture_output=True, text=True).stdout
+        return self._version
+
+    def _args(self, std, library, build_dir):
+        return [self.std[std], f"--workdir={build_dir}", f"-P{build_dir}", f"--work={library}"]
+
+    def build_commands(self, toplevel, sources, build_dir, std, library, generics=None):
+        # generics are given at run time
+        args = self._args(std, library, build_dir)
+        return [[self.executable, "-i"] + args + sources,
+                [self.executable, "-m"] + args + [toplevel]]
+
+    def run_command(self, toplevel, build_dir, std, library, sim_args, generics=None):
+        from cocotb import config
+
+        vpi = "--vpi=" + str(config.lib_name_path("vpi", "ghdl"))
+        generics = [f"-g{name}={value}" for name, value in sorted((generics or {}).items())]
+        # the llvm/gcc backends leave an executable next to the library, mcode does not
+        exe = os.path.join(build_dir, toplevel)
+        if os.path.isfile(exe) and os.access(exe, os.X_OK):
+            return [exe, vpi] + list(sim_args) + generics
+        return ([self.executable, "-r"] + self._args(std, library, build_dir) + [toplevel, vpi]
+                + list(sim_args) + generics)
+
+    def wave_args(self, path, vcd, signals, run_dir):
+        args = [f"--vcd={path}" if vcd else f"--wave={path}"]
+        if signals:
+            opt = os.path.join(run_dir, "wave.opt")
+            with open(opt, "w") as f:
+                f.write("$ version 1.1\n")
+                f.writelines(signal + "\n" for signal in signals)
+            args.append(f"--read-wave-opt={opt}")
+        return args
+
+
+class Nvc:
+    name = "nvc"
+    std = {"93": "--std=1993", "08": "--std=2008"}
+    wave_file = "wave.fst"
+
+    def __init__(self, executable):
+        self.executable = executable
+        self._version = None
+
+    @staticmethod
+    def vhpi_library():
+        """The cocotb vhpi library for nvc, None if this cocotb has none."""
+        try:
+            from cocotb import config
+
+            path = str(config.lib_name_path("vhpi", "nvc"))
+        except Exception:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def version(self):
+        if self._version is None:
+            self._version = subprocess.run([self.executable, "--version"], capture_output=True, text=True).stdout
+        return self._version
+
+    def _args(self, std, library, build_dir):
+        return [self.std[std], f"--work={library}:{os.path.join(build_dir, library)}", "-L", build_dir]
+
+    def build_commands(self, toplevel, sources, build_dir, std, library, generics=None):
+        # generics are given at elaboration (part of the build)
+        args = self._args(std, library, build_dir)
+        generics = [f"-g{name}={value}" for name, value in sorted((generics or {}).items())]
+        return [[self.executable] + args + ["-a"] + sources,
+                [self.executable] + args + ["-e", toplevel] + generics]
+
+    def run_command(self, toplevel, build_dir, std, library, sim_args, generics=None):
+        return ([self.executable] + self._args(std, library, build_dir)
+                + ["-r", toplevel, f"--load={self.vhpi_library()}"] + list(sim_args))
+
+    def wave_args(self, path, vcd, signals, run_dir):
+        args = [f"--wave={path}", f"--format={'vcd' if vcd else 'fst'}"]
+        # ghdl wave option paths (/top/instance/*) to nvc globs (:top:instance:*)
+        args += [f"--include={signal.replace('/', ':')}" for signal in signals]
+        return args
+
+
+def available():
+    """The simulators found on this machine, by name."""
+    found = {}
+    for backend in GHDL_BACKENDS:
+        path = os.environ.get(f"I2C_GHDL_{backend.upper()}")
+        if path and os.access(path, os.X_OK):
+            found[f"ghdl-{backend}"] = Ghdl(path, backend)
+    ghdl = shutil.which("ghdl")
+    if ghdl:
+        backend = Ghdl.detect_backend(ghdl)
+        found.setdefault(f"ghdl-{backend}", Ghdl(ghdl, backend))
+    nvc = os.environ.get("I2C_NVC") or shutil.which("nvc")
+    if nvc and Nvc.vhpi_library():
+        found["nvc"] = Nvc(nvc)
+    return found
+
+
+def profiles(files=None):
+    """Per simulator medians of the benchmark records: build_s, startup_s and cycles_per_s."""
+    samples = {}
+    for path in files or BENCHMARKS:
+        if not os.path.isfile(path):
+            continue
+        with open(path) as f:
+            records = json.load(f).get("results", [])
+        for r in records:
+            if "simulator" in r and r.get("passed") and r.get("cycles_per_s"):
+                samples.setdefault(r["simulator"], []).append(r)
+    return {name: {"build_s": statistics.median(r.get("build_s", 0.0) for r in records),
+                   "startup_s": statistics.median(r["wall_s"] - r["test_wall_s"] for r in records),
+                   "cycles_per_s": statistics.median(r["cycles_per_s"] for r in records)}
+            for name, records in samples.items()}
+
+
+def expected_wall(profile, cycles, cached=False):
+    """Wall time (s) of a run of cycles system clocks, without the build when it is cached."""
+    return (0.0 if cached else profile["build_s"]) + profile["startup_s"] + cycles / profile["cycles_per_s"]
+
+
+def choose(expected_cycles=None, cached=(), found=None, files=None):
+    """Simulator with the lowest expected wall time for a run of expected_cycles clocks.
+
+    cached is the names of the simulators that already have a build of the design.
+    simulators without benchmark numbers are only picked when none has any.
+    """
+    found = available() if found is None else found
+    if not found:
+        return None
+    measured = {name: p for name, p in profiles(files).items() if name in found}
+    if expected_cycles is None or not measured:
+        ghdl = shutil.which("ghdl")
+        for sim in found.values():
+            if getattr(sim, "executable", None) == ghdl:
+                return sim
+        return next(iter(found.values()))
+    best = min(measured, key=lambda name: expected_wall(measured[name], expected_cycles, name in cached))
+    return found[best]
+
+
+def get(name=None, expected_cycles=None, cached=()):
+    """Simulator by name ("auto" or None: see choose, "ghdl": the ghdl on PATH)."""
+    name = name or os.environ.get("I2C_SIMULATOR", "auto")
+    found = available()
+    if name == "auto":
+        sim = choose(expected_cycles, cached, found)
+    elif name == "ghdl":
+        ghdl = shutil.which("ghdl")
+        sim = next((s for s in found.values() if isinstance(s, Ghdl) and s.executable == ghdl), None)
+    else:
+        sim = found.get(name)
+    if sim is None:
+        raise ValueError(f"simulator {name} not found (available: {', '.join(sorted(found)) or 'none'})")
+    return sim
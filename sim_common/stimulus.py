@@ -0,0 +1,115 @@
+"""Stimulus generation helpers shared by the testbenches."""
+
+import random
+from collections import namedtuple
+
+import numpy as np
+
+
+class CoverageDirectedGenerator:
+    """Draw stimulus directly from the bins that are not covered yet.
+
+    instead of drawing random values and rejecting the ones already covered (which
+    gets slower and slower as coverage closes), the generator keeps the uncovered
+    bins in a list with a bin -> position index. drawing a bin and retiring a covered
+    one are both O(1), whatever the number of bins.
+
+    bins are whatever the cover item uses as keys of its detailed coverage, i.e bin
+    values (or labels) for a CoverPoint and tuples of bins for a CoverCross; mapping a
+    drawn bin to a transaction is up to the caller.
+    """
+
+    def __init__(self, bins, at_least=1, hits=None, rng=None):
+        self.rng = rng if rng is not None else random
+        self._bins = []
+        self._index = {}
+        self._needed = {}
+        hits = hits if hits is not None else {}
+        for bin in bins:
+            needed = at_least - hits.get(bin, 0)
+            if needed > 0 and bin not in self._index:
+                self._index[bin] = len(self._bins)
+                self._bins.append(bin)
+                self._needed[bin] = needed
+
+    @classmethod
+    def from_cover_item(cls, item, rng=None):
+        """Build a generator for a cocotb-coverage CoverPoint/CoverCross."""
+        hits = item.detailed_coverage
+        return cls(list(hits), at_least=item.at_least, hits=hits, rng=rng)
+
+    def __len__(self):
+        return len(self._bins)
+
+    @property
+    def done(self):
+        return not self._bins
+
+    def draw(self):
+        """Return a random uncovered bin."""
+        return self._bins[self.rng.randrange(len(self._bins))]
+
+    def sample(self, bin):
+        """Account for one hit of bin, retiring it once it is covered."""
+        if bin not in self._index:
+            return
+        self._needed[bin] -= 1
+        if self._needed[bin] > 0:
+            return
+        # swap the covered bin with the last one and pop it
+        pos = self._index.pop(bin)
+        del self._needed[bin]
+        last = self._bins.pop()
+        if last != bin:
+            self._bins[pos] = last
+            self._index[last] = pos
+
+
+# one planned START...STOP frame; data is empty for reads
+Transfer = namedtuple("Transfer", "address read length data scl_cycles")
+
+
+class StimulusPlan:
+    """Constrained-random transfers pre-generated in batches as numpy arrays.
+
+    every field is drawn for a whole batch at once (ranges are inclusive): target
+    address, direction (read with probability read_ratio), payload length, the data
+    bytes (one row of max length per transfer) and the scl_cycles (prescaler) setting.
+    iterating over the plan hands the transfers out one at a time and only draws the
+    next batch when the current one is used up, so the per-transfer cost is a list
+    index instead of a constraint solve. the same seed gives the same transfers.
+    """
+
+    def __init__(self, seed=None, batch=1024, address=(8, 119), read_ratio=0.25, length=(1, 32),
+                 data=(0, 255), scl_cycles=(20, 20)):
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch
+        self.address = address
+        self.read_ratio = read_ratio
+        self.length = length
+        self.data = data
+        self.scl_cycles = scl_cycles
+
+    def _draw(self, bounds, n):
+        return self.rng.integers(bounds[0], bounds[1], size=n, endpoint=True)
+
+    def batch(self, n=None):
+        """Draw n transfers, as a dict of arrays (data is n x longest length)."""
+        n = n or self.batch_size
+        return {
+            "address": self._draw(self.address, n),
+            "read": self.rng.random(n) < self.read_ratio,
+            "length": self._draw(self.length, n),
+            "data": self.rng.integers(self.data[0], self.data[1], size=(n, self.length[1]),
+                                      endpoint=True, dtype=np.uint8),
+            "scl_cycles": self._draw(self.scl_cycles, n),
+        }
+
+    def __iter__(self):
+        while True:
+            b = self.batch()
+            # to python ints once per batch, not per field access
+            rows = zip(b["address"].tolist(), b["read"].tolist(), b["length"].tolist(),
+                       b["data"].tolist(), b["scl_cycles"].tolist())
+            for address, read, length, data, scl_cycles in rows:
+                yield Transfer(address, read, length, [] if read else data[:length], scl_cycles)
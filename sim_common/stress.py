@@ -0,0 +1,114 @@
+"""Clock stretching and multi-master stress scenarios, run by the testbenches of both tops.
+
+every scenario takes the dut (with its clock running and just reset), an I2cHost of the
+core and sample, called with the bus model before it is stopped (coverage of its
+frames).
+"""
+
+import os
+import random
+
+import cocotb
+from cocotb.triggers import Timer
+from cocotb.utils import get_sim_time
+
+from i2c_bus import I2cBus, I2cMaster, I2cTarget
+
+
+async def clock_stretching(dut, host, sample=None):
+    """The same random register writes/reads to a target that answers at once and to one that stretches scl
+    by a random time after every byte (I2C_STRETCH_NS=lo,hi ns): checks the data and reports the throughput
+    lost to the stretching"""
+    fast, slow = 80, 81         # (x50, x51)
+    lo, hi = (int(x) for x in os.environ.get("I2C_STRETCH_NS", "200,2000").split(","))
+    transactions = int(os.environ.get("I2C_TRANSACTIONS", 20))
+
+    bus = I2cBus(dut, [I2cTarget(fast), I2cTarget(slow, stretch=(lo, hi))])
+    bus.start()
+    await host.setup_core()
+    expected = {address: bytearray(256) for address in (fast, slow)}
+
+    traffic = []
+    for _ in range(transactions):
+        length = random.randint(1, 4)
+        traffic.append((random.random() < 0.5, random.randrange(256), [random.randrange(256) for _ in range(length)]))
+
+    bytes_per_s = {}
+    for address in (fast, slow):
+        sim_start = get_sim_time(units="ns")
+        for read, pointer, payload in traffic:
+            if read:
+                rx_data = await host.i2c_read(address, pointer, len(payload))
+                exp_data = [expected[address][(pointer+i) % 256] for i in range(len(payload))]
+                assert not (rx_data != exp_data), "Different expected to actual read data"
+            else:
+                await host.i2c_write(address, pointer, payload)
+                for i, byte in enumerate(payload):
+                    expected[address][(pointer+i) % 256] = byte
+        elapsed = (get_sim_time(units="ns") - sim_start)*1e-9
+        bytes_per_s[address] = sum(len(payload) for _, _, payload in traffic)/elapsed
+
+    for address in (fast, slow):
+        assert not (bus.targets[address].mem != expected[address]), "Different expected to actual target memory"
+    assert not (bus.stretches == 0), "The target did not stretch scl"
+    assert not (any(t.stretched != (t.address == slow) for t in bus.transactions)), "Stretched frames of the wrong target"
+    dut._log.info("%.0f data bytes/s without and %.0f with clock stretching (%d stretches, mean %.0f ns): "
+                  "%.1f %% throughput loss", bytes_per_s[fast], bytes_per_s[slow], bus.stretches,
+                  bus.stretch_ns/bus.stretches, 100*(1 - bytes_per_s[slow]/bytes_per_s[fast]))
+    if sample:
+        sample(bus)
+    bus.stop()
+
+
+async def _delayed_write(master, delay, address, data):
+    await Timer(delay, units="ns")
+    return await master.write(address, data)
+
+
+def _p50_max(values):
+    values = sorted(values)
+    return values[len(values)//2], values[-1]
+
+
+async def arbitration(dut, host, sample=None):
+    """Multi-master bus: the core writes to a target while a second master writes to another one a few
+    hundred ns later, to x48 (the core loses the arbitration) or x51 (the core wins). the loser retries once
+    the bus is free: checks every target memory and reports the time from arbitration lost to the retry"""
+    addresses = [72, 80, 81]    # (x48, x50, x51) the core writes to x50
+    rounds = int(os.environ.get("I2C_ARB_ROUNDS", 20))
+
+    bus = I2cBus(dut, [I2cTarget(address) for address in addresses])
+    bus.start()
+    other = I2cMaster(bus)
+    await host.setup_core()
+    expected = {address: bytearray(256) for address in addresses}
+    recovery = {"lost_to_free": [], "free_to_retry": [], "lost_to_retry": []}
+
+    for _ in range(rounds):
+        pointer = random.randrange(256)
+        payload = [random.randrange(256) for _ in range(random.randint(1, 4))]
+        other_address = random.choice([72, 81])
+        other_data = [random.randrange(256) for _ in range(random.randint(2, 5))]    # pointer and payload
+        task = cocotb.start_soon(_delayed_write(other, random.randint(1, 800), other_address, other_data))
+        await host.i2c_write_arb(80, pointer, payload, recovery)
+        assert not (not await task), "The target did not acknowledge the other master"
+
+        for i, byte in enumerate(payload):
+            expected[80][(pointer+i) % 256] = byte
+        for i, byte in enumerate(other_data[1:]):
+            expected[other_address][(other_data[0]+i) % 256] = byte
+
+    for address in addresses:
+        assert not (bus.targets[address].mem != expected[address]), "Different expected to actual target memory"
+    arbitrated = sum(t.arbitration for t in bus.transactions)
+    assert not (arbitrated == 0), "No arbitration on the bus"
+    dut._log.info("%d rounds, %d arbitrated frames: the core lost %d times, the other master %d times",
+                  rounds, arbitrated, len(recovery["lost_to_free"]), other.lost)
+    for name, values in recovery.items():
+        if values:
+            dut._log.info("%s: %d samples, p50 %.0f ns, max %.0f ns", name, len(values), *_p50_max(values))
+    if other.retry_ns:
+        dut._log.info("other master, lost to retry: p50 %.0f ns, max %.0f ns", *_p50_max(other.retry_ns))
+    if sample:
+        sample(bus)
+    bus.stop()
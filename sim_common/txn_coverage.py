@@ -0,0 +1,290 @@
+"""Functional coverage of the i2c transaction space, with array-backed counters.
+
+TransactionCoverage covers every frame on the bus: target address, R/W, payload length
+(buckets), payload data (0..255), address ACK/NACK, scl_cycles (buckets), clock
+stretching and arbitration events, and the crosses read x length, read x ack,
+scl_cycles x length, read x stretch and read x arbitration. sample() only appends the
+values of a frame to python lists, they are counted with np.bincount a batch at a time
+(every `batch` frames, or when the coverage is read), so sampling costs next to nothing
+per transaction whatever the number of bins.
+
+coverage.xml is written in the cocotb-coverage format (the top element first, so the ci
+grep of its cover_percentage keeps working). only the points with a weight count for the
+top level coverage: the goal point (the written data bytes against the bins the tests
+close, e.g 16..31 as top.i_data), every other point and cross is reported with weight 0.
+merge_xml() merges any number of such files (cocotb-coverage ones included).
+"""
+
+import itertools
+from xml.etree import ElementTree
+
+import numpy as np
+
+UNSAMPLED = -1      # value of a field that was not sampled (e.g scl_cycles unknown)
+
+
+class Axis:
+    """Bins of one field: exact values, or [edge, next edge) buckets."""
+
+    def __init__(self, values=None, edges=None, labels=None):
+        if values is not None:
+            self.values = list(values)
+            self._lut = np.full(max(self.values) + 2, -1, dtype=np.int64)
+            self._lut[self.values] = np.arange(len(self.values))
+            self.edges = None
+        else:
+            self.values = None
+            self.edges = np.asarray(edges)
+        self.labels = list(labels) if labels is not None else (
+            self.values if self.values is not None else [f"{lo}-{hi}" for lo, hi in zip(edges, edges[1:])])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def index(self, x):
+        """Bin index of every value of x, -1 outside of the bins."""
+        x = np.asarray(x, dtype=np.int64)
+        if self.edges is not None:
+            idx = np.searchsorted(self.edges, x, side="right") - 1
+            idx[(x < self.edges[0]) | (x >= self.edges[-1])] = -1
+            return idx
+        inside = (x >= 0) & (x < len(self._lut))
+        idx = np.full(x.shape, -1, dtype=np.int64)
+        idx[inside] = self._lut[x[inside]]
+        return idx
+
+
+class Point:
+    """Hits of the bins of a point (one field) or a cross (several fields)."""
+
+    def __init__(self, name, fields, axes, weight=0, at_least=1):
+        self.name = name
+        self.fields = fields
+        self.axes = axes
+        self.weight = weight
+        self.at_least = at_least
+        self.hits = np.zeros(int(np.prod([len(a) for a in axes])), dtype=np.int64)
+
+    @property
+    def bins(self):
+        if len(self.axes) == 1:
+            return self.axes[0].labels
+        return list(itertools.product(*(a.labels for a in self.axes)))
+
+    @property
+    def covered(self):
+        return int(np.count_nonzero(self.hits >= self.at_least))
+
+    @property
+    def size(self):
+        return self.weight * len(self.hits)
+
+    @property
+    def coverage(self):
+        return self.weight * self.covered
+
+    @property
+    def cover_percentage(self):
+        return 100 * self.covered / len(self.hits)
+
+    @property
+    def detailed_coverage(self):
+        """bin -> hits, as a cocotb-coverage item (see CoverageDirectedGenerator.from_cover_item)."""
+        return dict(zip(self.bins, self.hits.tolist()))
+
+    def count(self, columns):
+        idx = [axis.index(columns[field]) for field, axis in zip(self.fields, self.axes)]
+        valid = np.logical_and.reduce([i >= 0 for i in idx])
+        if len(idx) == 1:
+            flat = idx[0][valid]
+        else:
+            flat = np.ravel_multi_index([i[valid] for i in idx], [len(a) for a in self.axes])
+        self.hits += np.bincount(flat, minlength=len(self.hits))
+
+
+class CoverageModel:
+    """Points and crosses over named fields, sampled in batches."""
+
+    def __init__(self, name="top", batch=1024):
+        self.name = name
+        self.batch = batch
+        self.points = {}
+        self._buffer = {}
+        self._pending = 0
+
+    def add_point(self, name, field, axis, weight=0, at_least=1):
+        self.points[name] = Point(name, (field,), (axis,), weight, at_least)
+        self._buffer.setdefault(field, [])
+
+    def add_cross(self, name, *points, weight=0, at_least=1):
+        parts = [self.points[p] for p in points]
+        self.points[name] = Point(name, tuple(p.fields[0] for p in parts), tuple(p.axes[0] for p in parts),
+                                  weight, at_least)
+
+    def _append(self, field, value):
+        self._buffer[field].append(value)
+
+    def _extend(self, field, values):
+        self._buffer[field].extend(values)
+
+    def _sampled(self):
+        self._pending += 1
+        if self._pending >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        columns = {field: np.asarray(values, dtype=np.int64) for field, values in self._buffer.items()}
+        for point in self.points.values():
+            if len({len(columns[f]) for f in point.fields}) > 1:
+                raise ValueError(f"{point.name}: fields {point.fields} sampled a different number of times")
+            point.count(columns)
+        for values in self._buffer.values():
+            values.clear()
+        self._pending = 0
+
+    def __getitem__(self, name):
+        self.flush()
+        return self.points[name]
+
+    @property
+    def size(self):
+        return sum(p.size for p in self.points.values())
+
+    @property
+    def coverage(self):
+        self.flush()
+        return sum(p.coverage for p in self.points.values())
+
+    @property
+    def cover_percentage(self):
+        """Coverage of the goals (points with a weight), in %."""
+        size = self.size
+        return 100 * self.coverage / size if size else 0.0
+
+    def report(self, log=print, bins=False):
+        self.flush()
+        log(f"{self.name}: {self.cover_percentage:.2f} % of the goals covered")
+        for p in self.points.values():
+            log(f"  {p.name}: {p.covered} of {len(p.hits)} bins ({p.cover_percentage:.1f} %)"
+                + ("" if p.weight else ", not a goal"))
+            if bins:
+                for bin, hits in p.detailed_coverage.items():
+                    log(f"    {bin}: {hits}")
+
+    def export_xml(self, filename="coverage.xml"):
+        self.flush()
+        root = ElementTree.Element(self.name, abs_name=self.name, size=str(self.size),
+                                   coverage=str(self.coverage),
+                                   cover_percentage=str(round(self.cover_percentage, 2)))
+        for p in self.points.values():
+            abs_name = f"{self.name}.{p.name}"
+            elem = ElementTree.SubElement(root, p.name, size=str(p.size), coverage=str(p.coverage),
+                                          cover_percentage=str(round(p.cover_percentage, 2)),
+                                          abs_name=abs_name, weight=str(p.weight), at_least=str(p.at_least))
+            for i, (bin, hits) in enumerate(zip(p.bins, p.hits.tolist())):
+                ElementTree.SubElement(elem, f"bin{i}", bin=str(bin), hits=str(hits),
+                                       abs_name=f"{abs_name}.bin{i}")
+        ElementTree.indent(root)
+        ElementTree.ElementTree(root).write(filename)
+
+
+LENGTH = Axis(edges=[0, 1, 2, 4, 8, 16, 32, 2**16], labels=["0", "1", "2-3", "4-7", "8-15", "16-31", "32+"])
+SCL_CYCLES = Axis(edges=[1, 10, 20, 50, 100, 200, 2**16],
+                  labels=["1-9", "10-19", "20-49", "50-99", "100-199", "200+"])
+FLAG = Axis(values=(0, 1))
+
+
+class TransactionCoverage(CoverageModel):
+    """Coverage of the i2c frames, see the module docstring.
+
+    goal names the point of the written payload bytes that counts for the top level
+    coverage, over goal_bins.
+    """
+
+    def __init__(self, goal="i_data", goal_bins=range(2**4, 2**5), at_least=1, name="top", batch=1024):
+        super().__init__(name, batch)
+        self.goal = goal
+        self.add_point(goal, "written", Axis(values=goal_bins), weight=1, at_least=at_least)
+        self.add_point("address", "address", Axis(values=range(128)))
+        self.add_point("read", "read", Axis(values=(0, 1), labels=("write", "read")))
+        self.add_point("length", "length", LENGTH)
+        self.add_point("data", "data", Axis(values=range(256)))
+        self.add_point("ack", "ack", Axis(values=(0, 1), labels=("nack", "ack")))
+        self.add_point("scl_cycles", "scl_cycles", SCL_CYCLES)
+        self.add_point("stretch", "stretch", FLAG)
+        self.add_point("arbitration", "arbitration", FLAG)
+        self.add_cross("read_x_length", "read", "length")
+        self.add_cross("read_x_ack", "read", "ack")
+        self.add_cross("scl_cycles_x_length", "scl_cycles", "length")
+        self.add_cross("read_x_stretch", "read", "stretch")
+        self.add_cross("read_x_arbitration", "read", "arbitration")
+
+    def sample(self, address, read, data=(), ack=True, scl_cycles=None, stretch=False, arbitration=False):
+        """One frame: data is its payload (the bytes after the address, pointer excluded)."""
+        self._append("address", address)
+        self._append("read", int(read))
+        self._append("length", len(data))
+        self._append("ack", int(ack))
+        self._append("scl_cycles", UNSAMPLED if scl_cycles is None else scl_cycles)
+        self._append("stretch", int(stretch))
+        self._append("arbitration", int(arbitration))
+        self._extend("data", data)
+        if not read:
+            self._extend("written", data)
+        self._sampled()
+
+    def sample_transactions(self, transactions, scl_cycles=None, pointer_size=1, **events):
+        """Every complete I2cTransaction (of an I2cBus or an I2cMonitor), the first pointer_size
+        bytes of a write to a target that acknowledged are its register pointer. stretch and
+        arbitration are taken from the frames (as the bus model marks them) unless given."""
+        for t in transactions:
+            if t.end is None or t.address is None:
+                continue
+            data = t.data if t.read or not t.addr_ack else t.data[pointer_size:]
+            self.sample(t.address, t.read, data, t.addr_ack, scl_cycles,
+                        stretch=events.get("stretch", t.stretched),
+                        arbitration=events.get("arbitration", t.arbitration))
+
+
+def _recount(elem):
+    bins = [child for child in elem if child.tag.startswith("bin")]
+    if bins:
+        weight, at_least = int(elem.get("weight", 1)), int(elem.get("at_least", 1))
+        covered = sum(1 for b in bins if int(b.get("hits")) >= at_least)
+        size, coverage = weight * len(bins), weight * covered
+        percentage = 100 * covered / len(bins)
+    else:
+        size = coverage = 0
+        for child in elem:
+            child_size, child_coverage = _recount(child)
+            size += child_size
+            coverage += child_coverage
+        percentage = 100 * coverage / size if size else 0.0
+    elem.set("size", str(size))
+    elem.set("coverage", str(coverage))
+    elem.set("cover_percentage", str(round(percentage, 2)))
+    return size, coverage
+
+
+def merge_xml(files, merged_file):
+    """Merge coverage.xml files (summing the hits of every bin), returns the top level coverage (%)."""
+    roots = [ElementTree.parse(f).getroot() for f in files]
+    merged = roots[0]
+    elements = {e.get("abs_name"): e for e in merged.iter()}
+    for root in roots[1:]:
+        for elem in root.iter():
+            name = elem.get("abs_name")
+            if name in elements:
+                if elem.tag.startswith("bin") and "hits" in elem.attrib:
+                    ours = elements[name]
+                    ours.set("hits", str(int(ours.get("hits")) + int(elem.get("hits"))))
+                continue
+            parent = elements[name.rpartition(".")[0]]
+            copy = ElementTree.SubElement(parent, elem.tag, attrib=dict(elem.attrib))
+            elements[name] = copy
+    _recount(merged)
+    ElementTree.indent(merged)
+    ElementTree.ElementTree(merged).write(merged_file)
+    return float(merged.get("cover_percentage"))
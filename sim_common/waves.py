@@ -0,0 +1,164 @@
+"""Waveform dumping policy of the simulations.
+
+dumping every signal for the whole simulation is most of the wall time (and disk) of a
+long regression, so waves are off unless asked for:
+
+    I2C_WAVES=full                              every signal (wave.ghw, wave.fst with nvc)
+    I2C_WAVES=i2c_bit_controller,/i2c_controller/o_irq
+                                                only that instance and o_irq
+    I2C_WAVE_WINDOW=200000:400000               only between 200 us and 400 us (ns)
+
+filters are ghdl wave option paths (see --read-wave-opt, turned into --include globs
+for nvc); a path that does not start with / is an instance below the top level and
+selects everything in it, unless it has a wildcard of its own (i2c_byte_controller/w_*).
+a window needs a start time the simulators do not have, so windowed waves are dumped
+as vcd into a pipe and trimmed on the fly: only the window (with the values at its
+start) ever reaches the disk.
+"""
+
+import itertools
+import os
+import threading
+
+OFF = "off"
+FULL = "full"
+SELECT = "select"
+
+
+class WavePolicy:
+
+    def __init__(self, mode=OFF, signals=(), window=None):
+        self.mode = SELECT if signals and mode != OFF else mode
+        self.signals = list(signals)
+        self.window = window        # (start, end) in ns, either can be None
+
+    @classmethod
+    def parse(cls, spec=None, window=None):
+        """Policy from the I2C_WAVES/I2C_WAVE_WINDOW strings (None: off)."""
+        spec = (spec or OFF).strip()
+        if window:
+            start, _, end = window.partition(":")
+            window = (int(start) if start else None, int(end) if end else None)
+        if spec in (OFF, FULL):
+            return cls(spec, window=window)
+        return cls(SELECT, signals=[s for s in spec.split(",") if s], window=window)
+
+    @classmethod
+    def from_env(cls, env=None):
+        env = os.environ if env is None else env
+        return cls.parse(env.get("I2C_WAVES"), env.get("I2C_WAVE_WINDOW"))
+
+    def __str__(self):
+        text = self.mode if self.mode != SELECT else ",".join(self.signals)
+        if self.window:
+            text += f" [{self.window[0] or 0}:{'' if self.window[1] is None else self.window[1]}] ns"
+        return text
+
+    def capture(self, run_dir, toplevel, simulator):
+        """Set up the dump of one simulation in run_dir, see WaveCapture."""
+        return WaveCapture(self, run_dir, toplevel, simulator)
+
+
+class WaveCapture:
+    """The simulator arguments of one simulation and the trimming of its window.
+
+    close() once the simulator is done, it returns the wave file (None when off).
+    """
+
+    def __init__(self, policy, run_dir, toplevel, simulator):
+        self.args = []
+        self.path = None
+        self._thread = None
+        self._pipe = None
+        if policy.mode == OFF:
+            return
+        signals = [_wave_opt_path(signal, toplevel) for signal in policy.signals]
+        if policy.window:
+            self.path = os.path.join(run_dir, "wave.vcd")
+            self._pipe = os.path.join(run_dir, "wave.vcd.pipe")
+            if os.path.exists(self._pipe):
+                os.remove(self._pipe)
+            os.mkfifo(self._pipe)
+            self.args = simulator.wave_args(self._pipe, True, signals, run_dir)
+            self._thread = threading.Thread(target=self._trim, args=(policy.window,), daemon=True)
+            self._thread.start()
+        else:
+            self.path = os.path.join(run_dir, simulator.wave_file)
+            self.args = simulator.wave_args(self.path, False, signals, run_dir)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._thread is not None:
+            while self._thread.is_alive():
+                # the simulator never opened the pipe (or died): unblock the reader
+                try:
+                    os.close(os.open(self._pipe, os.O_WRONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+                self._thread.join(0.1)
+            os.remove(self._pipe)
+            self._thread = None
+        if self.path and os.path.exists(self.path):
+            return self.path
+        return None
+
+    def _trim(self, window):
+        with open(self._pipe) as src, open(self.path, "w") as dst:
+            trim_vcd(src, dst, *window)
+
+
+def _wave_opt_path(signal, toplevel):
+    path = signal if signal.startswith("/") else f"/{toplevel}/{signal}"
+    if not signal.startswith("/") and "*" not in path:
+        path += "/*"
+    return path
+
+
+_UNITS = {"fs": 1e-6, "ps": 1e-3, "ns": 1, "us": 1e3, "ms": 1e6, "s": 1e9}
+
+
+def trim_vcd(src, dst, start_ns=None, end_ns=None):
+    """Copy the vcd in src to dst keeping only the changes within [start_ns, end_ns].
+
+    the values of all the variables at the start of the window are written as its
+    first time step, the rest of src is read (and dropped) after the window.
+    """
+    header = []
+    for line in src:
+        header.append(line)
+        if line.startswith("$enddefinitions"):
+            break
+    text = "".join(header)
+    dst.write(text)
+    scale = 1.0                 # ns per vcd time unit
+    if "$timescale" in text:
+        value = text.split("$timescale", 1)[1].split("$end", 1)[0].split()
+        number = "".join(c for c in value[0] if c.isdigit()) or "1"
+        scale = int(number) * _UNITS[value[-1].lstrip("0123456789")]
+
+    rest = src
+    if start_ns is not None:
+        start = int(start_ns / scale)
+        values = {}             # id -> last change before the window
+        rest = iter(())
+        for line in src:
+            if line.startswith("#"):
+                if int(line[1:]) >= start:
+                    dst.write(f"#{start}\n$dumpvars\n")
+                    dst.writelines(values.values())
+                    dst.write("$end\n")
+                    rest = itertools.chain([] if int(line[1:]) == start else [line], src)
+                    break
+            elif line[:1] in ("b", "B", "r", "R"):
+                values[line.split()[-1]] = line
+            elif line[:1] in ("0", "1", "x", "X", "z", "Z"):
+                # scalar change, keywords ($dumpvars, $end, $comment ...) are not values
+                values[line.strip()[1:]] = line
+    end = None if end_ns is None else end_ns / scale
+    for line in rest:
+        if end is not None and line.startswith("#") and int(line[1:]) > end:
+            break
+        dst.write(line)
+    for line in src:
+        pass